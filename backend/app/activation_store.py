@@ -0,0 +1,160 @@
+"""
+激活码使用记录存储
+嵌入式 SQLite（WAL 模式）：按激活码主键查找，使用次数用单条 UPSERT 原子累加，
+多协程、多线程与多个 uvicorn worker 并发激活时不会丢失计数，进程崩溃也不会留下半截文件。
+
+旧版 `activations.json` 在首次打开时导入（幂等：已存在的激活码不覆盖），之后不再写入。
+调用方在事件循环中应通过 `asyncio.to_thread` 调用，避免阻塞。
+"""
+
+import json
+import logging
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from itertools import islice
+from pathlib import Path
+from typing import Any, Dict, Iterable, Optional
+
+log = logging.getLogger("app.activation")
+
+_DATA_DIR = Path(__file__).resolve().parent / "data"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS activations (
+    code         TEXT PRIMARY KEY,
+    device_id    TEXT,
+    ip           TEXT,
+    used_at      TEXT,
+    last_used_at TEXT,
+    uses         INTEGER NOT NULL DEFAULT 0
+) WITHOUT ROWID
+"""
+
+# 首次使用插入 uses=1；已有记录原子 +1。uses=0 的预置记录首次使用时补上 used_at，不算“再次使用”
+_RECORD_USE = """
+INSERT INTO activations (code, device_id, ip, used_at, uses) VALUES (?, ?, ?, ?, 1)
+ON CONFLICT (code) DO UPDATE SET
+    uses = uses + 1,
+    used_at = COALESCE(used_at, excluded.used_at),
+    last_used_at = CASE WHEN uses > 0 THEN excluded.used_at ELSE last_used_at END,
+    device_id = COALESCE(excluded.device_id, device_id),
+    ip = COALESCE(excluded.ip, ip)
+RETURNING uses, used_at, last_used_at
+"""
+
+_COLUMNS = ("code", "device_id", "ip", "used_at", "last_used_at", "uses")
+
+
+def activation_db_path() -> Path:
+    return Path(os.getenv("ACTIVATION_DB") or _DATA_DIR / "activations.db")
+
+
+class ActivationStore:
+    """激活码记录表；每个线程一个连接，写入由 SQLite 自身加锁串行化。"""
+
+    def __init__(self, path: Path, legacy_json: Optional[Path] = None):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(_SCHEMA)
+        if legacy_json is not None:
+            self.import_json(legacy_json)
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # autocommit：每条语句自成事务；多进程写冲突时最多等待 busy_timeout
+            conn = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    def record_use(self, code: str, device_id: Optional[str] = None, ip: Optional[str] = None) -> Dict[str, Any]:
+        """记录一次激活，返回累加后的 `uses` 与时间戳。"""
+        now = datetime.now().isoformat()
+        uses, used_at, last_used_at = self._conn().execute(
+            _RECORD_USE, (code, device_id or None, ip or None, now)
+        ).fetchone()
+        return {"uses": uses, "used_at": used_at, "last_used_at": last_used_at}
+
+    def get(self, code: str) -> Optional[Dict[str, Any]]:
+        row = self._conn().execute(
+            f"SELECT {', '.join(_COLUMNS)} FROM activations WHERE code = ?", (code,)
+        ).fetchone()
+        return dict(zip(_COLUMNS, row)) if row else None
+
+    def import_json(self, path: Path) -> int:
+        """导入旧版 activations.json；已存在的激活码保持不变，可重复执行。返回新增条数。"""
+        path = Path(path)
+        if not path.exists():
+            return 0
+        try:
+            data = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError) as e:
+            log.error("[activation] legacy json unreadable, skipped: %s", e)
+            return 0
+        rows = [
+            (
+                str(code),
+                rec.get("device_id"),
+                rec.get("ip"),
+                rec.get("used_at"),
+                rec.get("last_used_at"),
+                int(rec.get("uses", 1)),
+            )
+            for code, rec in data.items()
+            if isinstance(rec, dict)
+        ]
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            before = conn.total_changes
+            conn.executemany(
+                f"INSERT INTO activations ({', '.join(_COLUMNS)}) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (code) DO NOTHING",
+                rows,
+            )
+            imported = conn.total_changes - before
+        if imported:
+            log.info("[activation] imported %s codes from %s", imported, path)
+        return imported
+
+    def preload(self, codes: Iterable[str], batch: int = 10000) -> int:
+        """预置已发放的激活码（uses=0，尚未使用）；已存在的码不变。返回新增条数。"""
+        conn = self._conn()
+        imported = 0
+        codes = iter(codes)
+        while True:
+            rows = [(code,) for code in islice(codes, batch)]
+            if not rows:
+                return imported
+            with conn:
+                conn.execute("BEGIN IMMEDIATE")
+                before = conn.total_changes
+                conn.executemany("INSERT INTO activations (code) VALUES (?) ON CONFLICT (code) DO NOTHING", rows)
+                imported += conn.total_changes - before
+
+    def stats(self) -> Dict[str, int]:
+        codes, used, uses = self._conn().execute(
+            "SELECT COUNT(*), COUNT(*) FILTER (WHERE uses > 0), COALESCE(SUM(uses), 0) FROM activations"
+        ).fetchone()
+        return {"codes": codes, "used": used, "uses": uses}
+
+
+_store_lock = threading.Lock()
+_store: Optional[ActivationStore] = None
+
+
+def get_activation_store() -> ActivationStore:
+    """进程内单例；首次打开时导入同目录下的旧版 activations.json。"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ActivationStore(activation_db_path(), legacy_json=_DATA_DIR / "activations.json")
+    return _store
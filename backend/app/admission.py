@@ -0,0 +1,157 @@
+"""
+模型调用准入控制
+每个进程对快速模型（问道选择）与主模型（最终解读）分别限制同时进行的上游调用数；
+名额用尽时进入有界等待队列，队列已满或等待超过期限即拒绝（`AdmissionRejected`），
+由 API 层转为带 `Retry-After` 的 429，而不是让请求无限堆积直到上游限流。
+"""
+
+import asyncio
+import math
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+
+
+class AdmissionRejected(Exception):
+    """准入被拒绝：队列已满或排队超时。"""
+
+    def __init__(self, pool: str, reason: str, retry_after: float):
+        self.pool = pool
+        self.reason = reason
+        self.retry_after = retry_after
+        super().__init__(f"模型调用繁忙（{pool}: {reason}），请 {self.retry_after_seconds} 秒后重试")
+
+    @property
+    def retry_after_seconds(self) -> int:
+        return max(1, math.ceil(self.retry_after))
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+class AdmissionTicket:
+    """一个已占用的名额；`release()` 幂等。"""
+
+    __slots__ = ("_pool", "_acquired_at", "_released")
+
+    def __init__(self, pool: "AdmissionPool"):
+        self._pool = pool
+        self._acquired_at = time.monotonic()
+        self._released = False
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self._pool._release(time.monotonic() - self._acquired_at)
+
+
+class AdmissionPool:
+    """单个模型的准入池：`limit` 个并发名额 + 最多 `max_queue` 个排队者，排队最长 `max_wait` 秒。"""
+
+    # 等待/占用时长的指数滑动平均系数
+    _ALPHA = 0.2
+
+    def __init__(self, name: str, limit: int, max_queue: int, max_wait: float):
+        self.name = name
+        self.limit = max(limit, 1)
+        self.max_queue = max(max_queue, 0)
+        self.max_wait = max_wait
+        self._sem = asyncio.Semaphore(self.limit)
+        self.active = 0
+        self.queued = 0
+        self.admitted = 0
+        self.rejected_full = 0
+        self.rejected_timeout = 0
+        self._wait_avg = 0.0
+        self._wait_max = 0.0
+        self._hold_avg = 0.0
+
+    def _retry_after(self) -> float:
+        # 预计排到所需的时间：队列长度 × 平均占用时长 / 并发名额
+        return max(1.0, self._hold_avg * (self.queued + 1) / self.limit)
+
+    async def acquire(self) -> AdmissionTicket:
+        start = time.monotonic()
+        if not self._sem.locked():
+            # 有空闲名额时 acquire 同步完成，不会挂起
+            await self._sem.acquire()
+        else:
+            if self.queued >= self.max_queue:
+                self.rejected_full += 1
+                raise AdmissionRejected(self.name, "queue_full", self._retry_after())
+            self.queued += 1
+            try:
+                await asyncio.wait_for(self._sem.acquire(), timeout=self.max_wait)
+            except asyncio.TimeoutError:
+                self.rejected_timeout += 1
+                raise AdmissionRejected(self.name, "wait_timeout", self._retry_after()) from None
+            finally:
+                self.queued -= 1
+        waited = time.monotonic() - start
+        self._wait_avg += self._ALPHA * (waited - self._wait_avg)
+        self._wait_max = max(self._wait_max, waited)
+        self.active += 1
+        self.admitted += 1
+        return AdmissionTicket(self)
+
+    async def try_acquire(self) -> Optional[AdmissionTicket]:
+        """有空闲名额时立即取得，否则返回 None（不排队）。"""
+        if self._sem.locked():
+            return None
+        await self._sem.acquire()
+        self.active += 1
+        self.admitted += 1
+        return AdmissionTicket(self)
+
+    def _release(self, held: float) -> None:
+        self.active -= 1
+        self._hold_avg += self._ALPHA * (held - self._hold_avg)
+        self._sem.release()
+
+    @asynccontextmanager
+    async def slot(self):
+        ticket = await self.acquire()
+        try:
+            yield ticket
+        finally:
+            ticket.release()
+
+    def stats(self) -> Dict:
+        return {
+            "limit": self.limit,
+            "active": self.active,
+            "queued": self.queued,
+            "max_queue": self.max_queue,
+            "max_wait": self.max_wait,
+            "admitted": self.admitted,
+            "rejected_full": self.rejected_full,
+            "rejected_timeout": self.rejected_timeout,
+            "wait_ms_avg": round(self._wait_avg * 1000, 1),
+            "wait_ms_max": round(self._wait_max * 1000, 1),
+            "hold_ms_avg": round(self._hold_avg * 1000, 1),
+        }
+
+
+class AdmissionController:
+    """快速模型与主模型各一个准入池。"""
+
+    def __init__(self, fast_limit: int, main_limit: int, max_queue: int, max_wait: float):
+        self.fast = AdmissionPool("fast", fast_limit, max_queue, max_wait)
+        self.main = AdmissionPool("main", main_limit, max_queue, max_wait)
+
+    @classmethod
+    def from_env(cls) -> "AdmissionController":
+        return cls(
+            fast_limit=int(os.getenv("LLM_FAST_CONCURRENCY", "100")),
+            main_limit=int(os.getenv("LLM_MAIN_CONCURRENCY", "200")),
+            max_queue=int(os.getenv("LLM_ADMISSION_QUEUE", "1000")),
+            max_wait=_env_float("LLM_ADMISSION_MAX_WAIT", 10.0),
+        )
+
+    def stats(self) -> Dict:
+        return {"fast": self.fast.stats(), "main": self.main.stats()}
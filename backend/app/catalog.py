@@ -0,0 +1,188 @@
+"""
+航天器数据目录服务
+统一负责 starships.json 的定位、加载与热更新，向各模块提供不可变快照。
+
+- 进程内只解析一次文件；请求路径上不再有文件 I/O 与 JSON 解析
+- 文件 mtime 变化（按 `STARSHIPS_RELOAD_INTERVAL` 秒节流检查）或管理端点触发时原子切换快照
+- 快照对象只读，调用方不得修改其中的航天器数据
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass, replace
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+try:
+    from app.starship import StarshipTable  # type: ignore
+except ModuleNotFoundError:
+    from starship import StarshipTable  # type: ignore
+
+log = logging.getLogger("app.catalog")
+
+
+def resolve_starships_path() -> Path:
+    """解析 starships.json 的实际路径。
+
+    解析顺序（存在即返回）：
+    1) 显式环境变量 `STARSHIPS_JSON`
+    2) 与后端根（backend）同级的 `data/starships.json`
+    3) 仓库根的 `data/starships.json`（当容器外本地运行且能访问到上一层目录时）
+    4) 当前工作目录下的 `data/starships.json`（兜底）
+    """
+    # 1) 显式环境变量
+    env_path = os.getenv("STARSHIPS_JSON")
+    if env_path:
+        p = Path(env_path)
+        if p.exists():
+            return p
+
+    # 基于文件位置定位 backend 根目录
+    backend_root = Path(__file__).resolve().parent.parent  # backend/
+
+    # 2) backend/data/starships.json（容器内常见路径）
+    candidate = backend_root / "data" / "starships.json"
+    if candidate.exists():
+        return candidate
+
+    # 3) 仓库根 data/starships.json（本地运行、Zeabur 非 Docker 情况）
+    repo_root_candidate = backend_root.parent / "data" / "starships.json"
+    if repo_root_candidate.exists():
+        return repo_root_candidate
+
+    # 4) 工作目录相对路径兜底
+    cwd_candidate = Path("data/starships.json").resolve()
+    if cwd_candidate.exists():
+        return cwd_candidate
+
+    # 均未找到
+    raise FileNotFoundError(
+        "未能定位到 starships.json。请确保以下任一路径存在:\n"
+        f"- 后端目录: {backend_root / 'data' / 'starships.json'}\n"
+        f"- 仓库根目录: {backend_root.parent / 'data' / 'starships.json'}\n"
+        f"- 或设置环境变量 STARSHIPS_JSON 指向有效文件路径"
+    )
+
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    """一次加载得到的航天器数据快照（只读）。"""
+
+    version: str                 # 文件内容 sha256 前 16 位，内容不变则版本不变
+    path: Path
+    mtime_ns: int
+    loaded_at: datetime
+    starships: StarshipTable       # 只读记录，支持按 archive_id O(1) 查找
+    meta: Tuple[Tuple[str, Any], ...]  # starships 以外的顶层字段（如 total）
+
+    @property
+    def count(self) -> int:
+        return len(self.starships)
+
+    def as_dict(self) -> Dict[str, Any]:
+        """还原为与 starships.json 相同结构的字典（航天器为只读记录，供响应渲染）。"""
+        data: Dict[str, Any] = dict(self.meta)
+        data["starships"] = list(self.starships)
+        return data
+
+
+def _read_snapshot(path: Path) -> CatalogSnapshot:
+    stat = path.stat()
+    raw = path.read_bytes()
+    data = json.loads(raw.decode("utf-8"))
+    starships = StarshipTable.from_dicts(data.get("starships", []))
+    meta = tuple((k, v) for k, v in data.items() if k != "starships")
+    return CatalogSnapshot(
+        version=hashlib.sha256(raw).hexdigest()[:16],
+        path=path,
+        mtime_ns=stat.st_mtime_ns,
+        loaded_at=datetime.now(),
+        starships=starships,
+        meta=meta,
+    )
+
+
+class StarshipCatalog:
+    """进程内航天器目录：持有当前快照，按需热更新。"""
+
+    def __init__(self, path: Optional[Path] = None, check_interval: Optional[float] = None):
+        self._path = path
+        if check_interval is None:
+            check_interval = float(os.getenv("STARSHIPS_RELOAD_INTERVAL", "2"))
+        # <= 0 表示关闭 mtime 自动检查，只能通过 reload() 更新
+        self._check_interval = check_interval
+        self._lock = threading.Lock()
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._next_check = 0.0
+        self._listeners: List[Callable[[CatalogSnapshot], None]] = []
+
+    def add_listener(self, callback: Callable[[CatalogSnapshot], None]) -> None:
+        """注册快照切换回调（内容版本变化时调用，参数为新快照）。"""
+        self._listeners.append(callback)
+
+    def _resolve_path(self) -> Path:
+        return self._path or resolve_starships_path()
+
+    def snapshot(self) -> CatalogSnapshot:
+        """返回当前快照；到达检查间隔时顺带检查文件是否变化。"""
+        snap = self._snapshot
+        if snap is None:
+            return self.reload()
+        if self._check_interval > 0:
+            now = time.monotonic()
+            if now >= self._next_check:
+                self._next_check = now + self._check_interval
+                try:
+                    changed = snap.path.stat().st_mtime_ns != snap.mtime_ns
+                except OSError as e:
+                    log.error("[catalog] stat failed: %s", e)
+                    changed = False
+                if changed:
+                    try:
+                        return self.reload()
+                    except Exception as e:
+                        # 热更新失败时继续使用旧快照，避免半写入的文件打断服务
+                        log.error("[catalog] reload failed, keep version=%s: %s", snap.version, e)
+        return self._snapshot or snap
+
+    def reload(self) -> CatalogSnapshot:
+        """重新读取文件并原子替换快照；内容未变则沿用旧快照。"""
+        with self._lock:
+            path = self._resolve_path()
+            fresh = _read_snapshot(path)
+            current = self._snapshot
+            if current is not None and current.version == fresh.version and current.path == fresh.path:
+                # 内容一致：仅刷新 mtime，沿用原 starships 元组（及其派生索引）
+                if current.mtime_ns != fresh.mtime_ns:
+                    current = replace(current, mtime_ns=fresh.mtime_ns)
+                    self._snapshot = current
+                return current
+            self._snapshot = fresh
+            self._next_check = time.monotonic() + self._check_interval
+            log.info("[catalog] loaded %s starships from %s version=%s", fresh.count, path, fresh.version)
+        if current is not None:
+            for callback in list(self._listeners):
+                try:
+                    callback(fresh)
+                except Exception as e:
+                    log.error("[catalog] reload listener failed: %s", e)
+        return fresh
+
+
+_catalog: Optional[StarshipCatalog] = None
+_catalog_lock = threading.Lock()
+
+
+def get_catalog() -> StarshipCatalog:
+    """获取进程内共享的航天器目录。"""
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                _catalog = StarshipCatalog()
+    return _catalog
@@ -0,0 +1,179 @@
+"""
+天时星舟按日缓存
+天时星舟只取决于提问当天的日期，按（目录版本, 日期）缓存匹配结果：
+
+- 启动时预计算当天结果，之后在 `CELESTIAL_TZ` 时区的每日零点刷新
+- 航天器目录热更新后整体失效并重新预计算
+- 可按需为一段日期预生成日历表（向量化批量计算）
+"""
+
+import asyncio
+import logging
+import os
+import threading
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+try:
+    from app.catalog import CatalogSnapshot, StarshipCatalog, get_catalog  # type: ignore
+    from app.oracle_algorithm import calculate_celestial_starships_batch  # type: ignore
+except ModuleNotFoundError:
+    from catalog import CatalogSnapshot, StarshipCatalog, get_catalog  # type: ignore
+    from oracle_algorithm import calculate_celestial_starships_batch  # type: ignore
+
+log = logging.getLogger("app.celestial")
+
+CelestialResult = Tuple[Optional[Dict[str, Any]], float]
+
+
+def _resolve_tz() -> Optional[ZoneInfo]:
+    """`CELESTIAL_TZ`（IANA 名称，如 Asia/Shanghai）；未设置时沿用服务器本地时间。"""
+    name = os.getenv("CELESTIAL_TZ", "").strip()
+    if not name:
+        return None
+    try:
+        return ZoneInfo(name)
+    except Exception as e:
+        log.error("[celestial] invalid CELESTIAL_TZ=%s, fallback to local time: %s", name, e)
+        return None
+
+
+class CelestialDayCache:
+    """天时星舟的按日缓存（键为日序数，随目录版本整体失效）。"""
+
+    def __init__(self, catalog: StarshipCatalog, tz: Optional[ZoneInfo] = None, max_days: Optional[int] = None):
+        self._catalog = catalog
+        self._tz = tz
+        if max_days is None:
+            max_days = int(os.getenv("CELESTIAL_CALENDAR_MAX_DAYS", "3660"))
+        self.max_days = max_days
+        self._lock = threading.Lock()
+        self._version: Optional[str] = None
+        self._entries: Dict[int, CelestialResult] = {}
+        self._refresh_task: Optional[asyncio.Task] = None
+        catalog.add_listener(self._on_catalog_reload)
+
+    # ---- 日期 ----
+    def now(self) -> datetime:
+        """配置时区下的当前时间（无时区信息，便于与发射日期直接比较）。"""
+        if self._tz is None:
+            return datetime.now()
+        return datetime.now(self._tz).replace(tzinfo=None)
+
+    def today(self) -> date:
+        return self.now().date()
+
+    # ---- 查询 ----
+    def _entries_for(self, snap: CatalogSnapshot) -> Dict[int, CelestialResult]:
+        if self._version != snap.version:
+            with self._lock:
+                if self._version != snap.version:
+                    self._entries = {}
+                    self._version = snap.version
+        return self._entries
+
+    def get(self, day: date) -> CelestialResult:
+        """返回某天的天时星舟及分数；未命中时计算并写入缓存。"""
+        snap = self._catalog.snapshot()
+        entries = self._entries_for(snap)
+        hit = entries.get(day.toordinal())
+        if hit is not None:
+            return hit
+        return self._fill(snap, [day])[0]
+
+    def get_today(self) -> CelestialResult:
+        return self.get(self.today())
+
+    def calendar(self, start: date, end: date) -> List[Tuple[date, Optional[Dict[str, Any]], float]]:
+        """预生成 [start, end] 闭区间内每天的天时星舟，返回日历表。"""
+        span = (end - start).days + 1
+        if span <= 0:
+            raise ValueError("结束日期不能早于开始日期")
+        if span > self.max_days:
+            raise ValueError(f"日期范围过大，最多 {self.max_days} 天")
+        days = [start + timedelta(days=i) for i in range(span)]
+        snap = self._catalog.snapshot()
+        known = dict(self._entries_for(snap))
+        missing = [d for d in days if d.toordinal() not in known]
+        if missing:
+            for d, result in zip(missing, self._fill(snap, missing)):
+                known[d.toordinal()] = result
+        return [(d, *known[d.toordinal()]) for d in days]
+
+    def _fill(self, snap: CatalogSnapshot, days: List[date]) -> List[CelestialResult]:
+        moments = [datetime(d.year, d.month, d.day) for d in days]
+        results = calculate_celestial_starships_batch(moments, snap.starships)
+        with self._lock:
+            if self._version != snap.version:
+                # 计算期间目录已切换：结果只返回给调用方，不写入
+                return results
+            if len(self._entries) + len(days) > self.max_days:
+                # 超出上限时只保留当天，避免日历请求让缓存无限增长
+                keep = self.today().toordinal()
+                self._entries = {k: v for k, v in self._entries.items() if k == keep}
+            for d, result in zip(days, results):
+                self._entries[d.toordinal()] = result
+        return results
+
+    # ---- 失效与刷新 ----
+    def invalidate(self) -> None:
+        with self._lock:
+            self._entries = {}
+            self._version = None
+
+    def precompute_today(self) -> CelestialResult:
+        result = self.get_today()
+        starship = result[0]
+        log.info("[celestial] precomputed day=%s result=%s", self.today(), starship and starship.get("archive_id"))
+        return result
+
+    def _on_catalog_reload(self, snap: CatalogSnapshot) -> None:
+        self.invalidate()
+        self.precompute_today()
+
+    def _seconds_until_midnight(self) -> float:
+        now = self.now()
+        tomorrow = datetime.combine(now.date() + timedelta(days=1), datetime.min.time())
+        return max((tomorrow - now).total_seconds(), 0.0)
+
+    async def _refresh_loop(self) -> None:
+        while True:
+            # 稍过零点再刷新，避免时钟抖动落在前一天
+            await asyncio.sleep(self._seconds_until_midnight() + 1)
+            try:
+                today = self.today().toordinal()
+                with self._lock:
+                    self._entries = {k: v for k, v in self._entries.items() if k >= today}
+                self.precompute_today()
+            except Exception as e:
+                log.error("[celestial] midnight refresh failed: %s", e)
+
+    def start(self) -> None:
+        """预计算当天结果并启动零点刷新任务（需在事件循环内调用）。"""
+        self.precompute_today()
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.get_running_loop().create_task(self._refresh_loop())
+
+    async def stop(self) -> None:
+        task, self._refresh_task = self._refresh_task, None
+        if task is not None:
+            task.cancel()
+            try:
+                await task
+            except asyncio.CancelledError:
+                pass
+
+
+_cache: Optional[CelestialDayCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_celestial_cache() -> CelestialDayCache:
+    """获取进程内共享的天时星舟缓存。"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = CelestialDayCache(get_catalog(), tz=_resolve_tz())
+    return _cache
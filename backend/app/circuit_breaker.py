@@ -0,0 +1,247 @@
+"""
+模型调用熔断
+每个模型一个熔断器，按最近若干次调用的失败率与慢调用率判断上游是否可用：
+超过阈值即打开，打开期间直接抛出 `CircuitOpen`，调用方不发网络请求、立即走预设回退；
+冷却结束后进入半开状态，放行少量探测调用，探测成功则恢复，失败则重新打开。
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, Optional, Tuple
+
+log = logging.getLogger("app.breaker")
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpen(Exception):
+    """熔断器打开（或半开且探测名额已满），本次调用未发出。"""
+
+    def __init__(self, name: str, retry_in: float):
+        self.name = name
+        self.retry_in = retry_in
+        super().__init__(f"模型 {name} 已熔断，约 {retry_in:.0f} 秒后探测恢复")
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+class BreakerCall:
+    """一次被放行的调用；`success()` / `failure()` / `abandon()` 只有第一次生效。"""
+
+    __slots__ = ("_breaker", "_probe", "_epoch", "_started", "_done")
+
+    def __init__(self, breaker: "CircuitBreaker", probe: bool, epoch: int):
+        self._breaker = breaker
+        self._probe = probe
+        self._epoch = epoch
+        self._started = time.monotonic()
+        self._done = False
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self._started
+
+    def success(self, latency: Optional[float] = None) -> None:
+        """调用成功；`latency` 缺省为从放行到现在的时长（流式调用可传入首字延迟）。"""
+        self._finish(False, self.elapsed() if latency is None else latency)
+
+    def failure(self) -> None:
+        self._finish(True, self.elapsed())
+
+    def abandon(self) -> None:
+        """调用方主动放弃（取消、被对冲淘汰）：已超过慢调用阈值的按慢调用记录，否则不计入。"""
+        if self._done:
+            return
+        elapsed = self.elapsed()
+        if elapsed >= self._breaker.slow_call:
+            self._finish(False, elapsed)
+        else:
+            self._done = True
+            self._breaker._abandon(self)
+
+    def _finish(self, failed: bool, latency: float) -> None:
+        if not self._done:
+            self._done = True
+            self._breaker._record(self, failed, latency >= self._breaker.slow_call)
+
+
+class CircuitBreaker:
+    """单个模型的熔断器：最近 `window` 次调用中至少 `min_calls` 次时，
+    失败率 >= `error_rate` 或慢调用（>= `slow_call` 秒）占比 >= `slow_rate` 即打开 `cooldown` 秒。
+    """
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        window: int = 20,
+        min_calls: int = 10,
+        error_rate: float = 0.5,
+        slow_call: float = 10.0,
+        slow_rate: float = 0.8,
+        cooldown: float = 30.0,
+        probes: int = 1,
+    ):
+        self.name = name
+        self.min_calls = max(min_calls, 1)
+        self.error_rate = error_rate
+        self.slow_call = slow_call
+        self.slow_rate = slow_rate
+        self.cooldown = cooldown
+        self.probes = max(probes, 1)
+        self._lock = threading.Lock()
+        # 最近调用的结果：(是否失败, 是否慢调用)
+        self._outcomes: Deque[Tuple[bool, bool]] = deque(maxlen=max(window, self.min_calls))
+        self._state = CLOSED
+        self._opened_at = 0.0
+        # 每次进入半开状态递增，用于忽略上一轮探测迟到的结果
+        self._epoch = 0
+        self._probes_inflight = 0
+        self._probe_successes = 0
+        self.calls = 0
+        self.failures = 0
+        self.slow_calls = 0
+        self.short_circuited = 0
+        self.trips = 0
+
+    def _refresh(self, now: float) -> None:
+        if self._state == OPEN and now - self._opened_at >= self.cooldown:
+            self._state = HALF_OPEN
+            self._epoch += 1
+            self._probes_inflight = 0
+            self._probe_successes = 0
+            log.info("[breaker] %s half-open, probing", self.name)
+
+    def _trip(self, now: float, reason: str) -> None:
+        self._state = OPEN
+        self._opened_at = now
+        self.trips += 1
+        log.warning("[breaker] %s open (%s) for %.0fs", self.name, reason, self.cooldown)
+
+    def _rejects(self) -> bool:
+        return self._state == OPEN or (self._state == HALF_OPEN and self._probes_inflight >= self.probes)
+
+    def allows(self) -> bool:
+        """当前是否会放行调用（不占用探测名额）。"""
+        with self._lock:
+            self._refresh(time.monotonic())
+            return not self._rejects()
+
+    def _short_circuit(self, now: float) -> CircuitOpen:
+        self.short_circuited += 1
+        retry_in = max(0.0, self.cooldown - (now - self._opened_at)) if self._state == OPEN else 0.0
+        return CircuitOpen(self.name, retry_in)
+
+    def check(self) -> None:
+        """熔断时抛出 `CircuitOpen`，不占用探测名额；用于排队等待准入名额之前快速失败。"""
+        now = time.monotonic()
+        with self._lock:
+            self._refresh(now)
+            if self._rejects():
+                raise self._short_circuit(now)
+
+    def begin(self) -> BreakerCall:
+        """放行一次调用，熔断时抛出 `CircuitOpen`。"""
+        now = time.monotonic()
+        with self._lock:
+            self._refresh(now)
+            if self._rejects():
+                raise self._short_circuit(now)
+            probe = self._state == HALF_OPEN
+            if probe:
+                self._probes_inflight += 1
+            return BreakerCall(self, probe, self._epoch)
+
+    def _record(self, call: BreakerCall, failed: bool, slow: bool) -> None:
+        now = time.monotonic()
+        with self._lock:
+            self.calls += 1
+            self.failures += failed
+            self.slow_calls += slow
+            if call._probe:
+                if self._state != HALF_OPEN or call._epoch != self._epoch:
+                    return
+                self._probes_inflight -= 1
+                if failed or slow:
+                    self._trip(now, "probe failed" if failed else "probe slow")
+                    return
+                self._probe_successes += 1
+                if self._probe_successes >= self.probes:
+                    self._state = CLOSED
+                    self._outcomes.clear()
+                    log.info("[breaker] %s closed", self.name)
+                return
+            if self._state != CLOSED:
+                # 打开前已放行的调用迟到的结果不影响当前状态
+                return
+            self._outcomes.append((failed, slow))
+            n = len(self._outcomes)
+            if n < self.min_calls:
+                return
+            error_rate = sum(f for f, _ in self._outcomes) / n
+            slow_rate = sum(s for _, s in self._outcomes) / n
+            if error_rate >= self.error_rate:
+                self._trip(now, f"error_rate={error_rate:.2f}")
+            elif slow_rate >= self.slow_rate:
+                self._trip(now, f"slow_rate={slow_rate:.2f}")
+
+    def _abandon(self, call: BreakerCall) -> None:
+        with self._lock:
+            if call._probe and self._state == HALF_OPEN and call._epoch == self._epoch:
+                self._probes_inflight -= 1
+
+    def stats(self) -> Dict:
+        with self._lock:
+            self._refresh(time.monotonic())
+            n = len(self._outcomes)
+            return {
+                "state": self._state,
+                "window_calls": n,
+                "error_rate": round(sum(f for f, _ in self._outcomes) / n, 4) if n else 0.0,
+                "slow_rate": round(sum(s for _, s in self._outcomes) / n, 4) if n else 0.0,
+                "calls": self.calls,
+                "failures": self.failures,
+                "slow_calls": self.slow_calls,
+                "short_circuited": self.short_circuited,
+                "trips": self.trips,
+            }
+
+
+class CircuitBreakers:
+    """按模型名懒创建熔断器，参数统一来自环境变量。"""
+
+    def __init__(self, **options):
+        self._options = options
+        self._lock = threading.Lock()
+        self._breakers: Dict[str, CircuitBreaker] = {}
+
+    @classmethod
+    def from_env(cls) -> "CircuitBreakers":
+        return cls(
+            window=int(os.getenv("LLM_BREAKER_WINDOW", "20")),
+            min_calls=int(os.getenv("LLM_BREAKER_MIN_CALLS", "10")),
+            error_rate=_env_float("LLM_BREAKER_ERROR_RATE", 0.5),
+            slow_call=_env_float("LLM_BREAKER_SLOW_CALL", 10.0),
+            slow_rate=_env_float("LLM_BREAKER_SLOW_RATE", 0.8),
+            cooldown=_env_float("LLM_BREAKER_COOLDOWN", 30.0),
+            probes=int(os.getenv("LLM_BREAKER_PROBES", "1")),
+        )
+
+    def get(self, model: str) -> CircuitBreaker:
+        breaker = self._breakers.get(model)
+        if breaker is None:
+            with self._lock:
+                breaker = self._breakers.setdefault(model, CircuitBreaker(model, **self._options))
+        return breaker
+
+    def stats(self) -> Dict:
+        return {name: breaker.stats() for name, breaker in list(self._breakers.items())}
@@ -3,15 +3,248 @@
 用于问题航天器匹配和神谕解读生成
 """
 
+import asyncio
+import hashlib
 import json
+import logging
 import os
-from typing import Dict, List, Optional
-from openai import OpenAI
-from .prompts import (
-    build_selection_user_prompt,
-    build_interpretation_user_prompt,
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import httpx
+from openai import AsyncOpenAI
+try:
+    from app.prompts import build_interpretation_user_prompt, build_selection_user_prompt  # type: ignore
+    from app.starship import find_starship  # type: ignore
+    from app.cache import LRUTTLCache  # type: ignore
+    from app.admission import AdmissionController, AdmissionRejected, AdmissionTicket  # type: ignore
+    from app.circuit_breaker import CircuitBreakers, CircuitOpen  # type: ignore
+    from app.metrics import LLM_SELECT_SECONDS, LLM_TTFT_SECONDS, observe_stream  # type: ignore
+    from app.log_setup import payload_log  # type: ignore
+except ModuleNotFoundError:
+    from prompts import build_interpretation_user_prompt, build_selection_user_prompt  # type: ignore
+    from starship import find_starship  # type: ignore
+    from cache import LRUTTLCache  # type: ignore
+    from admission import AdmissionController, AdmissionRejected, AdmissionTicket  # type: ignore
+    from circuit_breaker import CircuitBreakers, CircuitOpen  # type: ignore
+    from metrics import LLM_SELECT_SECONDS, LLM_TTFT_SECONDS, observe_stream  # type: ignore
+    from log_setup import payload_log  # type: ignore
+
+DASHSCOPE_BASE_URL = "https://dashscope.aliyuncs.com/compatible-mode/v1"
+
+
+def _base_url() -> str:
+    """OpenAI 兼容接口地址：默认百炼，可用 `ALIYUN_BAILIAN_BASE_URL` 指向本地 stub 做压测。"""
+    return os.getenv("ALIYUN_BAILIAN_BASE_URL") or DASHSCOPE_BASE_URL
+
+log = logging.getLogger("app.llm")
+
+# 影响服务实例与连接池的配置项；任一项变化时整体重建
+_CONFIG_ENV = (
+    "ALIYUN_BAILIAN_API_KEY",
+    "ALIYUN_BAILIAN_BASE_URL",
+    "ALIYUN_BAILIAN_MODEL",
+    "ALIYUN_BAILIAN_FAST_MODEL",
+    "LLM_CONNECT_TIMEOUT",
+    "LLM_READ_TIMEOUT",
+    "LLM_TOTAL_TIMEOUT",
+    "LLM_MAX_CONNECTIONS",
+    "LLM_MAX_KEEPALIVE",
+    "LLM_KEEPALIVE_EXPIRY",
+    "LLM_FAST_CONCURRENCY",
+    "LLM_MAIN_CONCURRENCY",
+    "LLM_ADMISSION_QUEUE",
+    "LLM_ADMISSION_MAX_WAIT",
+    "LLM_BREAKER_WINDOW",
+    "LLM_BREAKER_MIN_CALLS",
+    "LLM_BREAKER_ERROR_RATE",
+    "LLM_BREAKER_SLOW_CALL",
+    "LLM_BREAKER_SLOW_RATE",
+    "LLM_BREAKER_COOLDOWN",
+    "LLM_BREAKER_PROBES",
+)
+
+
+def _config_fingerprint() -> Tuple[Optional[str], ...]:
+    return (DASHSCOPE_BASE_URL,) + tuple(os.getenv(name) for name in _CONFIG_ENV)
+
+
+# 最终解读缓存：解读只取决于提示词与模型，键为二者的 sha256
+_interpretation_cache = LRUTTLCache(
+    maxsize=int(os.getenv("INTERPRETATION_CACHE_SIZE", "512")),
+    ttl=float(os.getenv("INTERPRETATION_CACHE_TTL", "3600")),
 )
 
+
+def interpretation_cache_key(prompt: str, model: str) -> str:
+    return hashlib.sha256(f"{model}\0{prompt}".encode("utf-8")).hexdigest()
+
+
+def interpretation_cache_stats() -> Dict:
+    return _interpretation_cache.stats()
+
+
+# 单飞合并计数：calls 为调用总数，upstream 为实际发出的上游请求，collapsed 为被合并的调用
+_coalescing_lock = threading.Lock()
+_coalescing_stats = {"calls": 0, "upstream": 0, "collapsed": 0}
+
+
+def coalescing_stats() -> Dict:
+    with _coalescing_lock:
+        stats = dict(_coalescing_stats)
+    service = _service
+    stats["inflight"] = len(service._inflight) if service is not None else 0
+    stats["collapse_rate"] = round(stats["collapsed"] / stats["calls"], 4) if stats["calls"] else 0.0
+    return stats
+
+
+def admission_stats() -> Optional[Dict]:
+    service = _service
+    return service.admission.stats() if service is not None else None
+
+
+def breaker_stats() -> Optional[Dict]:
+    service = _service
+    return service.breakers.stats() if service is not None else None
+
+
+def _hedge_budgets() -> Tuple[float, float]:
+    """首字延迟预算与硬截止时间（秒）；预算 <= 0 关闭对冲。"""
+    budget = _env_float("LLM_TTFT_BUDGET", 4.0)
+    deadline = _env_float("LLM_HARD_DEADLINE", 30.0)
+    return budget, max(deadline, 0.0)
+
+
+# 对冲计数：started 为发起的对冲请求，won_by_* 为对冲后胜出的一方，deadline_fallbacks 为两路都超时的回退
+_hedge_lock = threading.Lock()
+_hedge_stats = {"started": 0, "won_by_fast": 0, "won_by_main": 0, "deadline_fallbacks": 0}
+
+
+def _record_hedge(field: str) -> None:
+    with _hedge_lock:
+        _hedge_stats[field] += 1
+
+
+def hedge_stats() -> Dict:
+    budget, deadline = _hedge_budgets()
+    with _hedge_lock:
+        stats = dict(_hedge_stats)
+    stats.update({"ttft_budget": budget, "hard_deadline": deadline})
+    return stats
+
+
+def _replay_pacing() -> Tuple[int, float]:
+    """缓存命中时回放的分块大小（字符）与块间隔（秒）。"""
+    chunk = int(os.getenv("INTERPRETATION_REPLAY_CHUNK", "8"))
+    interval = _env_float("INTERPRETATION_REPLAY_INTERVAL", 0.02)
+    return max(chunk, 1), max(interval, 0.0)
+
+
+def _env_float(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+def _http_timeout() -> httpx.Timeout:
+    """单次 HTTP 请求的超时：连接 `LLM_CONNECT_TIMEOUT`、读取 `LLM_READ_TIMEOUT`（秒）。"""
+    connect = _env_float("LLM_CONNECT_TIMEOUT", 5.0)
+    read = _env_float("LLM_READ_TIMEOUT", 60.0)
+    return httpx.Timeout(read, connect=connect, pool=connect)
+
+
+def _http_limits() -> httpx.Limits:
+    return httpx.Limits(
+        max_connections=int(os.getenv("LLM_MAX_CONNECTIONS", "1000")),
+        max_keepalive_connections=int(os.getenv("LLM_MAX_KEEPALIVE", "20")),
+        keepalive_expiry=_env_float("LLM_KEEPALIVE_EXPIRY", 30.0),
+    )
+
+
+# 进程内共享的 HTTP 连接池（keep-alive），避免每次请求重新握手
+_async_http: Optional[httpx.AsyncClient] = None
+_async_http_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def _shared_async_http_client() -> httpx.AsyncClient:
+    """获取当前事件循环上的共享 AsyncClient（连接池与事件循环绑定）。"""
+    global _async_http, _async_http_loop
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        loop = None
+    if _async_http is None or _async_http.is_closed or (loop is not None and _async_http_loop is not loop):
+        _async_http = httpx.AsyncClient(timeout=_http_timeout(), limits=_http_limits())
+        _async_http_loop = loop
+    return _async_http
+
+
+async def close_http_clients() -> None:
+    """关闭共享连接池（服务关闭时调用）。"""
+    global _async_http
+    client, _async_http = _async_http, None
+    if client is not None and not client.is_closed:
+        await client.aclose()
+
+
+_retiring: set = set()
+
+
+def _retire_http_clients(grace: float) -> None:
+    """配置变化时摘下当前连接池，宽限 `grace` 秒（让进行中的调用完成）后再关闭。"""
+    global _async_http
+    client, _async_http = _async_http, None
+    if client is not None and not client.is_closed:
+        loop = _async_http_loop
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if loop is not None and loop is running:
+            def _close():
+                task = loop.create_task(client.aclose())
+                _retiring.add(task)
+                task.add_done_callback(_retiring.discard)
+            loop.call_later(grace, _close)
+
+
+def _chunk_delta(chunk) -> Optional[str]:
+    """取出流式响应块中的增量文本（兼容多种字段结构）。"""
+    try:
+        return chunk.choices[0].delta.content
+    except Exception:
+        try:
+            return chunk["choices"][0]["delta"]["content"]  # type: ignore[index]
+        except Exception:
+            return None
+
+
+class InterpretationStream:
+    """一条解读流的增量文本；迭代结束、出错或被关闭时归还准入名额。
+    从未开始迭代的流（如客户端在首个事件前断开）需由调用方显式 `release()`。
+    """
+
+    def __init__(self, chunks, ticket: Optional[AdmissionTicket] = None):
+        self._chunks = chunks
+        self._ticket = ticket
+
+    async def __aiter__(self):
+        try:
+            async for delta in self._chunks:
+                yield delta
+        finally:
+            try:
+                await self._chunks.aclose()
+            finally:
+                self.release()
+
+    def release(self) -> None:
+        if self._ticket is not None:
+            self._ticket.release()
+
+
 class LLMService:
     """阿里云百炼模型服务（统一命名：本命/天时/问道）"""
     
@@ -31,26 +264,68 @@ class LLMService:
         if not self.api_key:
             raise ValueError("ALIYUN_BAILIAN_API_KEY环境变量未设置")
         
-        # 创建OpenAI兼容客户端
+        self.fingerprint = _config_fingerprint()
+        # 超时：连接/读取作用于单次 HTTP 请求，总超时作用于一次完整的模型调用（含重试）
+        self.timeout = _http_timeout()
+        self.total_timeout = _env_float("LLM_TOTAL_TIMEOUT", 90.0)
+
+        # 创建OpenAI兼容异步客户端：用于选择与解读，不阻塞事件循环，共享进程级连接池。
         # 说明：旧版 openai SDK + httpx 兼容性问题已通过 pin httpx 解决
-        self.client = OpenAI(
+        self.base_url = _base_url()
+        self.http = _shared_async_http_client()
+        self.loop = _async_http_loop
+        self.async_client = AsyncOpenAI(
             api_key=self.api_key,
-            base_url="https://dashscope.aliyuncs.com/compatible-mode/v1"
+            base_url=self.base_url,
+            timeout=self.timeout,
+            http_client=self.http,
         )
+        # 上游并发准入：快速模型与主模型分别限流，排队有界
+        self.admission = AdmissionController.from_env()
+        # 每个模型一个熔断器：上游持续失败或过慢时不再发请求，直接走预设回退
+        self.breakers = CircuitBreakers.from_env()
+        for model in (self.model, self.fast_model):
+            self.breakers.get(model)
+        # 进行中的上游调用：(模型, system, 提示词) -> 任务，相同调用合并为一次
+        self._inflight: Dict[Tuple[str, Optional[str], str], asyncio.Future] = {}
 
         # 提示词不再放在服务内部，改由 prompts 模块集中管理
+
+    async def warm_up(self, connections: int) -> int:
+        """预先建立到模型服务的连接（TCP + TLS），使首批请求免去握手；返回成功数。
+        并发请求 `/models` 以打开多条连接，完成后留在连接池中复用。
+        """
+        url = f"{self.base_url.rstrip('/')}/models"
+        headers = {"Authorization": f"Bearer {self.api_key}"}
+        # 超过 keep-alive 上限的连接用完即关，预建没有意义
+        n = max(0, min(connections, _http_limits().max_keepalive_connections or connections))
+
+        async def _one() -> bool:
+            try:
+                response = await self.http.get(url, headers=headers)
+                await response.aread()
+                return True
+            except httpx.HTTPError as e:
+                log.warning("[llm] warm-up failed: %s: %s", type(e).__name__, e)
+                return False
+
+        ok = sum(await asyncio.gather(*(_one() for _ in range(n))))
+        log.info("[llm] warm-up connections=%s/%s url=%s", ok, n, url)
+        return ok
     
     async def select_question_starship(
         self, 
         question: str, 
-        starships_data: List[Dict]
+        starships_data: Sequence[Dict],
+        candidates: Optional[Sequence[Dict]] = None,
     ) -> Optional[Dict]:
         """
         使用大模型智能选择问题航天器
         
         Args:
             question: 用户问题
-            starships_data: 航天器数据列表
+            starships_data: 航天器数据列表（用于解析模型返回的 ID）
+            candidates: 放入提示词的候选航天器，缺省为全部
             
         Returns:
             匹配的航天器数据
@@ -59,29 +334,29 @@ class LLMService:
             return None
         
         # 构建航天器选择提示词（更严格、更可靠）
-        prompt = build_selection_user_prompt(question, starships_data)
+        prompt = build_selection_user_prompt(question, candidates or starships_data)
         
         try:
             # 使用低成本快速模型进行匹配
+            started = time.perf_counter()
             response = await self._call_bailian_model(
                 prompt,
                 model=self.fast_model,
             )
-            print('[LLM select_question_starship] raw:', (response[:200] + '...') if isinstance(response, str) else response)
+            LLM_SELECT_SECONDS.observe(time.perf_counter() - started, self.fast_model)
+            payload_log.debug("[llm] select_question_starship raw: %.200s", response)
             
             # 解析模型响应，提取选择的航天器ID
             selected_starship_id = self._parse_starship_selection(response)
             
             if selected_starship_id:
-                # 查找匹配的航天器
-                return next(
-                    (s for s in starships_data 
-                     if s.get("archive_id") == selected_starship_id), 
-                    None
-                )
+                # 查找匹配的航天器（目录记录按 archive_id 哈希索引）
+                return find_starship(starships_data, selected_starship_id)
             
+        except AdmissionRejected:
+            raise
         except Exception as e:
-            print(f"大模型选择航天器失败: {e}")
+            log.warning("[llm] 大模型选择航天器失败: %s", e)
             
         return None
     
@@ -91,7 +366,8 @@ class LLMService:
         celestial_starship: Optional[Dict], 
         inquiry_starship: Optional[Dict],
         question: Optional[str],
-        user_name: Optional[str] = None
+        user_name: Optional[str] = None,
+        prompt: Optional[str] = None,
     ) -> str:
         """
         使用大模型生成最终的神谕解读
@@ -101,30 +377,43 @@ class LLMService:
             timely_starship: 时运航天器数据
             question_starship: 问题航天器数据
             question: 用户问题
+            prompt: 调用方已构建好的解读提示词（缺省时在此构建）
             
         Returns:
             生成的智能解读文本
         """
         # 构建最终解读提示词（高质量、结构化、冷静风格）
-        prompt = build_interpretation_user_prompt(
-            origin_starship, celestial_starship, inquiry_starship, question, user_name
-        )
+        if prompt is None:
+            prompt = build_interpretation_user_prompt(
+                origin_starship, celestial_starship, inquiry_starship, question, user_name
+            )
+        cache_key = interpretation_cache_key(prompt, self.model)
+        cached = _interpretation_cache.get(cache_key)
+        if cached is not None:
+            return cached
+        if self._interpretation_degraded():
+            # 主模型与对冲模型均已熔断：不发请求、不排队，直接回退
+            return self._fallback_interpretation(
+                origin_starship, celestial_starship, inquiry_starship, question
+            )
         
         try:
-            # 调用百炼模型生成解读（高质量主模型）
-            response = await self._call_bailian_model(
-                prompt,
-                model=self.model,
-            )
-            return response.strip()
+            # 调用百炼模型生成解读（高质量主模型；首字超出预算时对冲到快速模型）
+            text, model = await self._coalesced(("interpretation", prompt), lambda: self._hedged_text(prompt))
+            # 只缓存主模型的真实输出，快速模型的对冲结果与回退文本不缓存
+            if model == self.model:
+                _interpretation_cache.set(cache_key, text or None)
+            return text
+        except AdmissionRejected:
+            raise
         except Exception as e:
-            print(f"大模型生成解读失败: {e}")
+            log.warning("[llm] 大模型生成解读失败: %s", e)
             # 失败时回退到预定义文本
             return self._fallback_interpretation(
                 origin_starship, celestial_starship, inquiry_starship, question
             )
 
-    def stream_final_interpretation(
+    async def astream_final_interpretation(
         self,
         origin_starship: Optional[Dict],
         celestial_starship: Optional[Dict],
@@ -132,54 +421,315 @@ class LLMService:
         question: Optional[str],
         user_name: Optional[str] = None
     ):
-        """流式生成神谕解读（OpenAI 兼容 streaming）。
-        返回一个同步生成器，逐块yield文本，适配 FastAPI StreamingResponse。
+        """流式生成神谕解读（异步生成器）。
+        全程运行在事件循环上，不占用线程池。
+        相同提示词与模型的解读命中缓存时不再调用模型，按配置的节奏分块回放缓存文本。
+        """
+        stream = await self.open_interpretation_stream(
+            origin_starship, celestial_starship, inquiry_starship, question, user_name
+        )
+        async for delta in stream:
+            yield delta
+
+    async def open_interpretation_stream(
+        self,
+        origin_starship: Optional[Dict],
+        celestial_starship: Optional[Dict],
+        inquiry_starship: Optional[Dict],
+        question: Optional[str],
+        user_name: Optional[str] = None
+    ) -> "InterpretationStream":
+        """打开一条解读流：命中缓存时回放；否则先取得主模型的准入名额（可能抛出 `AdmissionRejected`），
+        再读取上游。调用方可在发送响应头之前完成准入，拒绝时直接返回 429。
         """
         prompt = build_interpretation_user_prompt(
             origin_starship, celestial_starship, inquiry_starship, question, user_name
         )
+        payload_log.debug("[llm] interpretation prompt: %.800s", prompt)
+        cache_key = interpretation_cache_key(prompt, self.model)
+        cached = _interpretation_cache.get(cache_key)
+        if cached is not None:
+            return InterpretationStream(self._replay(cached))
+        fallback = self._fallback_interpretation(
+            origin_starship, celestial_starship, inquiry_starship, question
+        )
+        if self._interpretation_degraded():
+            # 已熔断：与上游失败时一样一次性给出回退文本，不占准入名额
+            return InterpretationStream(self._once(fallback))
+        ticket = await self.admission.main.acquire()
+        return InterpretationStream(self._upstream_interpretation(prompt, cache_key, fallback), ticket)
+
+    async def _once(self, text: str):
+        yield text
+
+    async def _replay(self, text: str):
+        chunk, interval = _replay_pacing()
+        for i in range(0, len(text), chunk):
+            if i and interval:
+                await asyncio.sleep(interval)
+            yield text[i:i + chunk]
+
+    async def _upstream_interpretation(self, prompt: str, cache_key: str, fallback: str):
         try:
-            stream = self.client.chat.completions.create(
-                model=self.model,
-                stream=True,
-                max_tokens=3000,  # 增加最大输出令牌数，允许更长的神谕解读
-                messages=[
-                    {"role": "user", "content": prompt}
-                ]
-            )
-            for chunk in stream:
-                delta = None
-                # 兼容多种字段结构
-                try:
-                    delta = chunk.choices[0].delta.content
-                except Exception:
-                    try:
-                        delta = chunk["choices"][0]["delta"]["content"]  # type: ignore[index]
-                    except Exception:
-                        delta = None
-                if delta:
-                    yield delta
+            parts: List[str] = []
+            outcome: Dict[str, str] = {}
+            async for delta in self._hedged_stream(prompt, outcome):
+                parts.append(delta)
+                yield delta
+            # 完整读到流结束才缓存（客户端中途断开时生成器被关闭，不会走到这里）；只缓存主模型输出
+            if outcome.get("model") == self.model:
+                _interpretation_cache.set(cache_key, "".join(parts).strip() or None)
         except Exception as e:
             # 失败时一次性回退
-            fallback = self._fallback_interpretation(
-                origin_starship, celestial_starship, inquiry_starship, question
-            )
+            log.warning("[llm] 大模型流式解读失败: %s: %s", type(e).__name__, e)
             yield fallback
+
+    def _interpretation_degraded(self) -> bool:
+        """主模型熔断且无法对冲到快速模型（未启用、同一模型或也已熔断）时为真。"""
+        if self.breakers.get(self.model).allows():
+            return False
+        budget, _ = _hedge_budgets()
+        return budget <= 0 or self.fast_model == self.model or not self.breakers.get(self.fast_model).allows()
+
+    async def _hedged_text(self, prompt: str) -> Tuple[str, str]:
+        """非流式解读：同样走对冲流，拼接为完整文本；返回（文本, 实际生成的模型）。"""
+        outcome: Dict[str, str] = {}
+        if self._interpretation_degraded():
+            # 主模型与对冲模型均已熔断：不排队等主模型名额，抛出 CircuitOpen 由调用方回退
+            self.breakers.get(self.model).check()
+        async with self.admission.main.slot():
+            # 整段读取受 LLM_TOTAL_TIMEOUT 约束（排队时长不计入）：首字之后上游持续慢速吐字时，
+            # 只有单次读取超时，没有总上限，会一直占着请求与主模型名额
+            try:
+                parts = await asyncio.wait_for(self._collect(self._hedged_stream(prompt, outcome)), timeout=self.total_timeout)
+            except asyncio.TimeoutError:
+                raise TimeoutError(f"模型调用超时（>{self.total_timeout}s）")
+        return "".join(parts).strip(), outcome.get("model", self.model)
+
+    @staticmethod
+    async def _collect(stream) -> List[str]:
+        # 超时取消时显式关闭流，立即归还上游连接与对冲名额
+        try:
+            return [delta async for delta in stream]
+        finally:
+            await stream.aclose()
+
+    async def _hedged_stream(self, prompt: str, outcome: Dict[str, str]):
+        """带首字延迟预算的解读流。
+
+        主模型在 `LLM_TTFT_BUDGET` 秒内没有产出首个片段（或提前失败）时，向快速模型发起对冲请求，
+        谁先产出首个片段就用谁，另一路立即取消。两路都没能在 `LLM_HARD_DEADLINE` 秒内产出首个片段时
+        抛出 TimeoutError，由调用方回退到预设解读。实际使用的模型写入 `outcome["model"]`。
+        """
+        budget, deadline = _hedge_budgets()
+        messages = [{"role": "user", "content": prompt}]
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        # 候选：任务 -> (模型, 流, 准入名额)
+        racers: Dict[asyncio.Future, Tuple[str, object, Optional[AdmissionTicket]]] = {}
+
+        def _start(model: str, ticket: Optional[AdmissionTicket] = None) -> None:
+            agen = self._astream_chat(messages, model=model, max_tokens=3000)
+            racers[asyncio.ensure_future(agen.__anext__())] = (model, agen, ticket)
+
+        async def _discard(task: asyncio.Future) -> None:
+            _, agen, ticket = racers.pop(task)
+            task.cancel()
+            try:
+                await task
+            except BaseException:
+                pass
+            try:
+                await agen.aclose()
+            finally:
+                if ticket is not None:
+                    ticket.release()
+
+        _start(self.model)
+        hedged = False
+        winner = None
+        try:
+            while racers and winner is None:
+                elapsed = loop.time() - started
+                if not hedged and budget > 0 and self.fast_model != self.model:
+                    timeout = min(budget, deadline) - elapsed
+                else:
+                    timeout = deadline - elapsed
+                done, _ = await asyncio.wait(set(racers), timeout=max(timeout, 0), return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.cancelled() or task.exception() is not None:
+                        # 这一路没能产出首个片段（出错、空响应或已熔断），放弃它
+                        error = None if task.cancelled() else task.exception()
+                        if not isinstance(error, CircuitOpen):
+                            log.warning("[llm] %s stream failed before first token: %r", racers[task][0], error)
+                        await _discard(task)
+                    elif winner is None:
+                        winner = task
+                if winner is not None:
+                    break
+                if not hedged and budget > 0 and self.fast_model != self.model and loop.time() - started < deadline:
+                    # 主模型超出首字预算或已失败：对冲到快速模型（快速模型名额不足时不等待，直接放弃对冲）
+                    hedged = True
+                    ticket = await self.admission.fast.try_acquire()
+                    if ticket is not None:
+                        _record_hedge("started")
+                        _start(self.fast_model, ticket)
+                    continue
+                if loop.time() - started >= deadline:
+                    break
+            if winner is None:
+                if racers or loop.time() - started >= deadline:
+                    _record_hedge("deadline_fallbacks")
+                    raise TimeoutError(f"解读首字超时（>{deadline}s）")
+                raise RuntimeError("解读模型均未能产出内容")
+            model, agen, ticket = racers.pop(winner)
+            # 取消落后的一路
+            for task in list(racers):
+                await _discard(task)
+        except BaseException:
+            for task in list(racers):
+                await _discard(task)
+            raise
+        if hedged:
+            _record_hedge("won_by_fast" if model == self.fast_model else "won_by_main")
+        outcome["model"] = model
+        try:
+            yield winner.result()
+            async for delta in agen:
+                yield delta
+        finally:
+            try:
+                await agen.aclose()
+            finally:
+                if ticket is not None:
+                    ticket.release()
+
+    async def _astream_chat(self, messages: List[Dict], *, model: str, max_tokens: int):
+        """在共享连接池上直接读取 OpenAI 兼容的 SSE 响应，逐块产出增量文本。
+        不经 SDK 为每个数据块构造响应模型——数千并发流时那是主要的 CPU 开销。
+        """
+        url = f"{self.base_url.rstrip('/')}/chat/completions"
+        headers = {"Authorization": f"Bearer {self.api_key}", "Accept": "text/event-stream"}
+        payload = {"model": model, "messages": messages, "stream": True, "max_tokens": max_tokens}
+        # 熔断时在这里抛出 CircuitOpen，不发请求；慢调用按首字延迟判断
+        call = self.breakers.get(model).begin()
+        first_token = None
+        tokens = 0
+        try:
+            # 退出上下文（含客户端断开导致的生成器关闭）时归还上游连接
+            async with self.http.stream("POST", url, json=payload, headers=headers, timeout=self.timeout) as response:
+                if response.status_code >= 400:
+                    body = await response.aread()
+                    raise RuntimeError(f"模型流式调用失败: HTTP {response.status_code} {body[:200].decode('utf-8', 'replace')}")
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    data = line[5:].strip()
+                    if data == "[DONE]":
+                        break
+                    try:
+                        chunk = json.loads(data)
+                    except ValueError:
+                        continue
+                    if isinstance(chunk, dict) and chunk.get("error"):
+                        raise RuntimeError(f"模型流式调用失败: {chunk['error']}")
+                    delta = _chunk_delta(chunk)
+                    if delta:
+                        tokens += 1
+                        if first_token is None:
+                            first_token = call.elapsed()
+                            LLM_TTFT_SECONDS.observe(first_token, model)
+                        yield delta
+        except Exception:
+            call.failure()
+            raise
+        except BaseException:
+            # 被取消或被关闭：已有输出算成功，否则视为放弃
+            if first_token is None:
+                call.abandon()
+            else:
+                call.success(first_token)
+            raise
+        if first_token is None:
+            call.failure()
+        else:
+            call.success(first_token)
+            observe_stream(model, first_token, call.elapsed(), tokens)
     
     # 提示词构建已移至 prompts 模块
     
     async def _call_bailian_model(self, prompt: str, *, model: Optional[str] = None, system_prompt: Optional[str] = None) -> str:
-        """调用阿里云百炼模型（OpenAI兼容）。默认不发送 system 消息。"""
+        """调用阿里云百炼模型（OpenAI兼容）。默认不发送 system 消息。
+        同一模型与提示词的并发调用共享一次上游请求，所有等待者得到相同的结果或异常。
+        """
+        model = model or self.model
+        return await self._coalesced(
+            (model, system_prompt, prompt),
+            lambda: self._admitted_request(prompt, model=model, system_prompt=system_prompt),
+        )
+
+    async def _coalesced(self, key, factory):
+        """相同 key 的并发调用共享 `factory()` 产生的一次上游任务。"""
+        task = self._inflight.get(key)
+        with _coalescing_lock:
+            _coalescing_stats["calls"] += 1
+            if task is not None:
+                _coalescing_stats["collapsed"] += 1
+            else:
+                _coalescing_stats["upstream"] += 1
+        if task is None:
+            # 上游调用独立成任务：发起者被取消（如客户端断开）时不影响其他等待者
+            task = asyncio.ensure_future(factory())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t, key=key: self._finish_inflight(key, t))
+        return await asyncio.shield(task)
+
+    def _finish_inflight(self, key, task: asyncio.Future) -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            # 标记异常已读取：所有等待者都已取消时避免 "exception was never retrieved"
+            task.exception()
+
+    def _admission_pool(self, model: str):
+        return self.admission.fast if model == self.fast_model and model != self.model else self.admission.main
+
+    async def _admitted_request(self, prompt: str, *, model: str, system_prompt: Optional[str] = None) -> str:
+        breaker = self.breakers.get(model)
+        # 已熔断时不排队等名额：此前发出的调用可能一直占着名额直到超时，排队只会拖到 429
+        breaker.check()
+        # 合并后的一次上游调用只占一个名额
+        async with self._admission_pool(model).slot():
+            # 取得名额后再放行（排队期间可能已熔断），排队时长不计入调用延迟
+            call = breaker.begin()
+            try:
+                response = await self._request_model(prompt, model=model, system_prompt=system_prompt)
+            except Exception:
+                call.failure()
+                raise
+            except BaseException:
+                call.abandon()
+                raise
+            call.success()
+            return response
+
+    async def _request_model(self, prompt: str, *, model: str, system_prompt: Optional[str] = None) -> str:
         try:
             messages = []
             if system_prompt:
                 messages.append({"role": "system", "content": system_prompt})
             messages.append({"role": "user", "content": prompt})
-            response = self.client.chat.completions.create(
-                model=(model or self.model),
-                messages=messages,
-                max_tokens=3000,  # 增加最大输出令牌数，允许更长的神谕解读
-            )
+            try:
+                response = await asyncio.wait_for(
+                    self.async_client.chat.completions.create(
+                        model=model,
+                        messages=messages,
+                        max_tokens=3000,  # 增加最大输出令牌数，允许更长的神谕解读
+                    ),
+                    timeout=self.total_timeout,
+                )
+            except asyncio.TimeoutError:
+                raise TimeoutError(f"模型调用超时（>{self.total_timeout}s）")
             # 兼容响应格式：对象、dict、pydantic/base-model-like
             content = None
             try:
@@ -203,13 +753,8 @@ class LLMService:
             else:
                 raise Exception("模型调用失败: 无有效响应内容")
         except Exception as e:
-            print(f"百炼模型调用失败: {e}")
-            # 打印更多上下文信息，帮助排查
-            try:
-                import traceback
-                traceback.print_exc()
-            except Exception:
-                pass
+            # 附带异常栈，帮助排查
+            log.error("[llm] 百炼模型调用失败: %s", e, exc_info=True)
             raise
     
     def _parse_starship_selection(self, response: str) -> Optional[str]:
@@ -248,6 +793,63 @@ class LLMService:
         else:
             return "星辰暂时沉默，请稍后再试或重新思考你的问题。宇宙的奥秘需要耐心和真诚才能揭示。"
 
-# 全局LLM服务实例
-def get_llm_service():
-    return LLMService()
+# 全局LLM服务实例：进程内单例，配置变化（或事件循环更换）时重建
+_service: Optional[LLMService] = None
+_service_lock = threading.Lock()
+_warmup_task: Optional[asyncio.Task] = None
+
+
+def _service_is_current(service: Optional[LLMService]) -> bool:
+    if service is None or service.fingerprint != _config_fingerprint():
+        return False
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return True
+    return service.loop is loop and not service.http.is_closed
+
+
+def get_llm_service() -> LLMService:
+    global _service
+    service = _service
+    if _service_is_current(service):
+        return service
+    with _service_lock:
+        service = _service
+        if _service_is_current(service):
+            return service
+        if service is not None:
+            log.info("[llm] configuration changed, rebuilding service")
+            _retire_http_clients(grace=service.total_timeout)
+        service = LLMService()
+        _service = service
+        return service
+
+
+async def start_llm_service() -> Optional[LLMService]:
+    """服务启动时创建全局实例，并按 `LLM_WARMUP_CONNECTIONS` 在后台预建连接（不阻塞启动）。"""
+    global _warmup_task
+    try:
+        service = get_llm_service()
+    except ValueError as e:
+        log.warning("[llm] service not started: %s", e)
+        return None
+    connections = int(os.getenv("LLM_WARMUP_CONNECTIONS", "2"))
+    if connections > 0:
+        _warmup_task = asyncio.create_task(service.warm_up(connections))
+    return service
+
+
+async def close_llm_service() -> None:
+    """服务关闭时释放全局实例与共享连接池。"""
+    global _service, _warmup_task
+    task, _warmup_task = _warmup_task, None
+    if task is not None and not task.done():
+        task.cancel()
+        try:
+            await task
+        except asyncio.CancelledError:
+            pass
+    with _service_lock:
+        _service = None
+    await close_http_clients()
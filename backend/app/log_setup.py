@@ -0,0 +1,144 @@
+"""
+异步结构化日志
+`app.*` 日志记录只放入有界队列（`put_nowait`，满则丢弃并计数），由后台 `QueueListener` 线程格式化并写出，
+事件循环不再因 stdout/stderr 写入而阻塞。默认每条输出一行 JSON（`LOG_FORMAT=text` 恢复纯文本），
+`extra=` 传入的字段原样成为 JSON 字段。
+
+逐请求日志按 `LOG_REQUEST_SAMPLE_RATE` 抽样，错误（>=400）与慢请求始终记录；
+请求体、提示词与模型原始返回只在 `LOG_DEBUG_PAYLOADS=1` 时写入 `app.payload`。
+"""
+
+import atexit
+import json
+import logging
+import os
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Dict, Optional
+
+# LogRecord 自带属性；其余属性均来自 `extra=`
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "taskName"}
+_TEXT_FORMAT = "%(levelname)s:%(name)s:%(message)s"
+
+payload_log = logging.getLogger("app.payload")
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        out = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS:
+                out[key] = value
+        if record.exc_info:
+            out["exc"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            out["exc"] = record.exc_text
+        return json.dumps(out, ensure_ascii=False, default=str)
+
+
+class _NonBlockingQueueHandler(QueueHandler):
+    """入队不等待：队列已满时丢弃记录，不阻塞调用方。"""
+
+    def __init__(self, q: "queue.Queue"):
+        super().__init__(q)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # 先在调用方合并参数并渲染异常栈（参数可能随后被修改、异常对象不宜跨线程持有），
+        # 但保留 extra 字段与独立的 exc_text，交给后台线程的格式化器
+        record = logging.makeLogRecord(record.__dict__)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class RequestLogSampler:
+    """逐请求日志抽样：错误与慢请求全部保留，其余按比例抽取。"""
+
+    def __init__(self, rate: float, slow_ms: float):
+        self.rate = max(0.0, min(1.0, rate))
+        self.slow_ms = slow_ms
+
+    def __call__(self, status: int, dur_ms: float) -> bool:
+        if status >= 400 or dur_ms >= self.slow_ms or self.rate >= 1.0:
+            return True
+        return self.rate > 0.0 and random.random() < self.rate
+
+
+_handler: Optional[_NonBlockingQueueHandler] = None
+_listener: Optional[QueueListener] = None
+
+
+def setup_logging() -> None:
+    """为 `app` 日志器接入队列；重复调用无副作用。"""
+    global _handler, _listener
+    level = os.getenv("LOG_LEVEL", "INFO").upper()
+    logging.basicConfig(level=getattr(logging, level, logging.INFO))
+    # Important: do NOT attach uvicorn.access handlers to our app/root loggers,
+    # otherwise AccessFormatter will try to parse arbitrary app logs and crash.
+    app_logger = logging.getLogger("app")
+    app_logger.propagate = False
+    payload_log.setLevel(logging.DEBUG if _env_flag("LOG_DEBUG_PAYLOADS") else logging.INFO)
+    if _listener is not None:
+        return
+    output = logging.StreamHandler()
+    if os.getenv("LOG_FORMAT", "json").lower() == "text":
+        output.setFormatter(logging.Formatter(_TEXT_FORMAT))
+    else:
+        output.setFormatter(JsonFormatter())
+    _handler = _NonBlockingQueueHandler(queue.Queue(maxsize=max(1, int(os.getenv("LOG_QUEUE_SIZE", "10000")))))
+    _listener = QueueListener(_handler.queue, output)
+    _listener.start()
+    atexit.register(stop_logging)
+    app_logger.handlers = [_handler]
+
+
+def stop_logging() -> None:
+    """写出队列中剩余的记录并停止后台线程。"""
+    global _listener
+    if _listener is not None:
+        listener, _listener = _listener, None
+        listener.stop()
+        # 之后（进程退出阶段）的日志改为同步写出，不再丢失
+        fallback = logging.StreamHandler(sys.stderr)
+        fallback.setFormatter(logging.Formatter(_TEXT_FORMAT))
+        logging.getLogger("app").handlers = [fallback]
+
+
+def request_log_sampler() -> RequestLogSampler:
+    return RequestLogSampler(
+        float(os.getenv("LOG_REQUEST_SAMPLE_RATE", "1")),
+        float(os.getenv("LOG_SLOW_REQUEST_MS", "1000")),
+    )
+
+
+def logging_stats() -> Dict:
+    if _handler is None:
+        return {"queued": 0, "dropped": 0, "debug_payloads": payload_log.isEnabledFor(logging.DEBUG)}
+    return {
+        "queued": _handler.queue.qsize(),
+        "capacity": _handler.queue.maxsize,
+        "dropped": _handler.dropped,
+        "debug_payloads": payload_log.isEnabledFor(logging.DEBUG),
+    }
+
+
+def _env_flag(name: str) -> bool:
+    return os.getenv(name, "0").lower() in ("1", "true", "yes")
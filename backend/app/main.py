@@ -1,5 +1,6 @@
 from fastapi import FastAPI, HTTPException, Request
-from fastapi.responses import StreamingResponse
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from starlette.background import BackgroundTask
 from fastapi.staticfiles import StaticFiles
 import asyncio
 from fastapi.middleware.cors import CORSMiddleware
@@ -7,9 +8,8 @@ from pydantic import BaseModel
 from typing import Optional, Dict, Any, List
 import os
 from dotenv import load_dotenv
-import json
 from pathlib import Path
-from datetime import datetime
+from datetime import datetime, timedelta
 import logging
 import time
 import traceback
@@ -52,7 +52,7 @@ def _cors_config() -> dict:
         try:
             stripped = [o for o in raw if o.endswith('/')]
             if stripped:
-                print("[CORS] normalized origins (removed trailing '/'):", stripped)
+                log.info("[CORS] normalized origins (removed trailing '/'): %s", stripped)
         except Exception:
             pass
     else:
@@ -83,19 +83,14 @@ app = FastAPI(
 )
 
 # ---- Logging setup ----
+try:
+    from app.log_setup import logging_stats, payload_log, request_log_sampler, setup_logging  # type: ignore
+except ModuleNotFoundError:
+    from log_setup import logging_stats, payload_log, request_log_sampler, setup_logging  # type: ignore
+
 def _setup_logging():
-    level = os.getenv("LOG_LEVEL", "INFO").upper()
-    logging.basicConfig(level=getattr(logging, level, logging.INFO))
-    # Important: do NOT attach uvicorn.access handlers to our app/root loggers,
-    # otherwise AccessFormatter will try to parse arbitrary app logs and crash.
-    # Keep app logger isolated with a simple StreamHandler.
-    app_logger = logging.getLogger("app")
-    app_logger.propagate = False
-    if not app_logger.handlers:
-        h = logging.StreamHandler()
-        fmt = logging.Formatter("%(levelname)s:%(name)s:%(message)s")
-        h.setFormatter(fmt)
-        app_logger.addHandler(h)
+    # app.* 日志经队列由后台线程写出（见 log_setup），不阻塞事件循环
+    setup_logging()
     logging.getLogger("httpx").setLevel(logging.WARNING)
     logging.getLogger("openai").setLevel(logging.WARNING)
 
@@ -119,27 +114,56 @@ def _import_llm_module() -> ModuleType:
         import llm_service as m  # type: ignore
         return m
 
+try:
+    from app.rate_limit import RateLimiter, RateLimitMiddleware  # type: ignore
+except ModuleNotFoundError:
+    from rate_limit import RateLimiter, RateLimitMiddleware  # type: ignore
+
+# 模型相关端点按设备/IP 令牌桶限流；先于请求日志与 CORS 注册，位于二者之内，429 也会被记录并带上 CORS 头
+_rate_limiter = RateLimiter.from_env()
+app.add_middleware(RateLimitMiddleware, limiter=_rate_limiter)
+
+try:
+    import app.metrics as _metrics  # type: ignore
+except ModuleNotFoundError:
+    import metrics as _metrics  # type: ignore
+
+# 请求耗时直方图：位于限流之外，被拒绝的 429 也计入
+app.add_middleware(_metrics.MetricsMiddleware)
+
 # Simple HTTP middleware for request tracing
+# 每个请求一条记录（完成时写出），按 LOG_REQUEST_SAMPLE_RATE 抽样；错误与慢请求始终记录
+_sample_request = request_log_sampler()
+
 @app.middleware("http")
 async def _req_logger(request: Request, call_next):
     start = time.perf_counter()
-    rid = request.headers.get("x-request-id") or os.urandom(4).hex()
     try:
-        origin = request.headers.get("origin")
-        ua = request.headers.get("user-agent", "-")
-        log.info("[req] id=%s %s %s origin=%s ua=%s", rid, request.method, request.url.path, origin, ua)
-        if request.method == 'OPTIONS':
-            acrm = request.headers.get('access-control-request-method')
-            acrh = request.headers.get('access-control-request-headers')
-            log.info("[preflight] id=%s ACRM=%s ACRH=%s", rid, acrm, acrh)
         response = await call_next(request)
-        dur_ms = int((time.perf_counter() - start) * 1000)
-        log.info(f"[res] id=%s %s %s status=%s dur=%sms", rid, request.method, request.url.path, getattr(response, 'status_code', '-'), dur_ms)
-        return response
     except Exception as e:
         dur_ms = int((time.perf_counter() - start) * 1000)
-        log.error(f"[err] id=%s %s %s dur=%sms exc=%s\n%s", rid, request.method, request.url.path, dur_ms, e, traceback.format_exc())
+        rid = request.headers.get("x-request-id") or os.urandom(4).hex()
+        log.error("[err] id=%s %s %s dur=%sms exc=%s", rid, request.method, request.url.path, dur_ms, e, exc_info=True,
+                  extra={"rid": rid, "method": request.method, "path": request.url.path, "dur_ms": dur_ms})
         raise
+    dur_ms = int((time.perf_counter() - start) * 1000)
+    status = response.status_code
+    if _sample_request(status, dur_ms):
+        headers = request.headers
+        fields = {
+            "rid": headers.get("x-request-id") or os.urandom(4).hex(),
+            "method": request.method,
+            "path": request.url.path,
+            "status": status,
+            "dur_ms": dur_ms,
+            "origin": headers.get("origin"),
+            "ua": headers.get("user-agent", "-"),
+        }
+        if request.method == 'OPTIONS':
+            fields["acrm"] = headers.get('access-control-request-method')
+            fields["acrh"] = headers.get('access-control-request-headers')
+        log.info("[req] id=%s %s %s status=%s dur=%sms", fields["rid"], request.method, request.url.path, status, dur_ms, extra=fields)
+    return response
 
 # Global exception logging (keeps default behavior while ensuring stacktrace is logged)
 @app.exception_handler(Exception)
@@ -158,9 +182,9 @@ _cfg = _cors_config()
 
 # 打印 CORS 相关环境变量与最终生效配置，便于线上排查
 try:
-    print("[CORS] ENVIRONMENT:", os.getenv("ENVIRONMENT"))
-    print("[CORS] CORS_ALLOW_ORIGINS:", os.getenv("CORS_ALLOW_ORIGINS"))
-    print("[CORS] CORS_ALLOW_ORIGIN_REGEX:", os.getenv("CORS_ALLOW_ORIGIN_REGEX"))
+    log.info("[CORS] ENVIRONMENT: %s", os.getenv("ENVIRONMENT"))
+    log.info("[CORS] CORS_ALLOW_ORIGINS: %s", os.getenv("CORS_ALLOW_ORIGINS"))
+    log.info("[CORS] CORS_ALLOW_ORIGIN_REGEX: %s", os.getenv("CORS_ALLOW_ORIGIN_REGEX"))
     _eff = {
         "allow_origins": _cfg.get("allow_origins"),
         "allow_origin_regex": _cfg.get("allow_origin_regex"),
@@ -168,9 +192,9 @@ try:
         "allow_methods": ["*"],
         "allow_headers": ["*"],
     }
-    print("[CORS] effective:", _eff)
+    log.info("[CORS] effective: %s", _eff)
 except Exception as _e:
-    print("[CORS] print failed:", _e)
+    log.warning("[CORS] print failed: %s", _e)
 
 # 在开发环境并使用通配放行时，关闭 credentials 以允许 `*` 响应头，避免浏览器拒绝。
 _allow_credentials = True
@@ -199,74 +223,102 @@ try:
     ]
     media_dir = next((p for p in candidates if p.exists()), None)
     if media_dir:
-        print(f"[media] mounting static directory: {media_dir}")
+        log.info("[media] mounting static directory: %s", media_dir)
         app.mount("/media", StaticFiles(directory=str(media_dir), html=False), name="media")
     else:
-        print("[media] no data directory found; /media will not be available")
+        log.info("[media] no data directory found; /media will not be available")
 except Exception as _e:
     # Non-fatal; app continues without media mount
-    print("[media] mount failed:", _e)
+    log.warning("[media] mount failed: %s", _e)
+
+def _import_catalog_module() -> ModuleType:
+    try:
+        import app.catalog as m  # type: ignore
+        return m
+    except ModuleNotFoundError:
+        import catalog as m  # type: ignore
+        return m
 
-def _resolve_starships_path() -> Path:
-    """解析 starships.json 的实际路径。
 
-    解析顺序（存在即返回）：
-    1) 显式环境变量 `STARSHIPS_JSON`
-    2) 与后端根（backend）同级的 `data/starships.json`
-    3) 仓库根的 `data/starships.json`（当容器外本地运行且能访问到上一层目录时）
-    4) 当前工作目录下的 `data/starships.json`（兜底）
-    """
-    # 1) 显式环境变量
-    env_path = os.getenv("STARSHIPS_JSON")
-    if env_path:
-        p = Path(env_path)
-        if p.exists():
-            return p
-
-    # 基于文件位置定位 backend 根目录
-    backend_root = Path(__file__).resolve().parent.parent  # backend/
-
-    # 2) backend/data/starships.json（容器内常见路径）
-    candidate = backend_root / "data" / "starships.json"
-    if candidate.exists():
-        return candidate
-
-    # 3) 仓库根 data/starships.json（本地运行、Zeabur 非 Docker 情况）
-    repo_root_candidate = backend_root.parent / "data" / "starships.json"
-    if repo_root_candidate.exists():
-        return repo_root_candidate
-
-    # 4) 工作目录相对路径兜底
-    cwd_candidate = Path("data/starships.json").resolve()
-    if cwd_candidate.exists():
-        return cwd_candidate
-
-    # 均未找到
-    raise FileNotFoundError(
-        "未能定位到 starships.json。请确保以下任一路径存在:\n"
-        f"- 后端目录: {backend_root / 'data' / 'starships.json'}\n"
-        f"- 仓库根目录: {backend_root.parent / 'data' / 'starships.json'}\n"
-        f"- 或设置环境变量 STARSHIPS_JSON 指向有效文件路径"
+# 航天器数据：进程内共享目录，文件变更时自动热更新；启动时加载一次以尽早暴露数据问题
+_catalog = _import_catalog_module().get_catalog()
+log.info("[startup] loaded starships from: %s", _catalog.snapshot().path)
+
+
+try:
+    from app.prerender import VersionedRenderCache, catalog_max_age, prerendered_response  # type: ignore
+except ModuleNotFoundError:
+    from prerender import VersionedRenderCache, catalog_max_age, prerendered_response  # type: ignore
+
+try:
+    from app.sse import SSE_HEADERS, StreamLimiter, max_streams, sse_event  # type: ignore
+except ModuleNotFoundError:
+    from sse import SSE_HEADERS, StreamLimiter, max_streams, sse_event  # type: ignore
+
+try:
+    from app.admission import AdmissionRejected  # type: ignore
+except ModuleNotFoundError:
+    from admission import AdmissionRejected  # type: ignore
+
+try:
+    from app.activation_store import get_activation_store  # type: ignore
+    from app.cache import LRUTTLCache  # type: ignore
+except ModuleNotFoundError:
+    from activation_store import get_activation_store  # type: ignore
+    from cache import LRUTTLCache  # type: ignore
+
+
+@app.exception_handler(AdmissionRejected)
+async def _admission_rejected_handler(request: Request, exc: AdmissionRejected):
+    # 模型调用排队已满或超时：快速返回 429，由客户端按 Retry-After 重试
+    log.warning("[admission] rejected %s %s pool=%s reason=%s", request.method, request.url.path, exc.pool, exc.reason)
+    from fastapi.responses import JSONResponse
+    return JSONResponse(
+        status_code=429,
+        content={"detail": {"code": "MODEL_BUSY", "message": str(exc)}},
+        headers={"Retry-After": str(exc.retry_after_seconds)},
     )
 
 
-# 加载航天器数据
-def load_starships_data():
-    data_path = _resolve_starships_path()
+def _import_celestial_cache_module() -> ModuleType:
     try:
-        print(f"[startup] loading starships from: {data_path}")
-    except Exception:
-        pass
-    with open(data_path, 'r', encoding='utf-8') as f:
-        return json.load(f)
+        import app.celestial_cache as m  # type: ignore
+        return m
+    except ModuleNotFoundError:
+        import celestial_cache as m  # type: ignore
+        return m
+
+
+_celestial_cache = _import_celestial_cache_module().get_celestial_cache()
+
+
+@app.on_event("startup")
+async def _startup_celestial_cache():
+    # 预计算当天天时星舟，并在配置时区的零点自动刷新
+    _celestial_cache.start()
+
 
+@app.on_event("shutdown")
+async def _shutdown_celestial_cache():
+    await _celestial_cache.stop()
 
-starships_data = load_starships_data()
+
+@app.on_event("startup")
+async def _startup_llm_service():
+    # 创建全局 LLM 服务实例并预建到模型服务的连接
+    await _import_llm_module().start_llm_service()
+
+
+@app.on_event("shutdown")
+async def _shutdown_llm_service():
+    # 释放 LLM 服务实例与共享连接池
+    await _import_llm_module().close_llm_service()
 
 class CalculationRequest(BaseModel):
     birth_date: str  # YYYY-MM-DD格式
     name: Optional[str] = None
     question: Optional[str] = None
+    debug: bool = False  # 为真时在结果中附带各阶段耗时（timings）
 
 class DivineOriginRequest(BaseModel):
     birth_date: str
@@ -275,6 +327,12 @@ class DivineOriginRequest(BaseModel):
 class DivineCelestialRequest(BaseModel):
     inquiry_date: Optional[str] = None  # 缺省为当前日期
 
+class DivineOriginBatchRequest(BaseModel):
+    birth_dates: List[str]
+
+class DivineCelestialBatchRequest(BaseModel):
+    inquiry_dates: List[str]
+
 class DivineInquiryRequest(BaseModel):
     question: str
     name: Optional[str] = None
@@ -305,7 +363,7 @@ async def root():
     return {
         "message": "星航预言家 API 服务正常运行",
         "version": "1.0.0",
-        "starships_count": len(starships_data.get('starships', []))
+        "starships_count": _catalog.snapshot().count
     }
 
 
@@ -323,9 +381,65 @@ async def api_v1_root():
         "timestamp": datetime.now().isoformat(),
     }
 
+def _cache_stats() -> Dict[str, Dict]:
+    return {
+        "inquiry": _import_oracle_module().inquiry_cache_stats(),
+        "interpretation": _import_llm_module().interpretation_cache_stats(),
+        "activation_verify": _act_verified.stats(),
+    }
+
 @app.get("/api/v1/health")
 async def api_v1_health():
-    return {"success": True, "status": "ok", "timestamp": datetime.now().isoformat()}
+    _oracle = _import_oracle_module()
+    return {
+        "success": True,
+        "status": "ok",
+        "caches": _cache_stats(),
+        "inquiry_shortlist": _oracle.shortlist_stats(),
+        "llm_coalescing": _import_llm_module().coalescing_stats(),
+        "llm_admission": _import_llm_module().admission_stats(),
+        "llm_hedging": _import_llm_module().hedge_stats(),
+        "llm_breakers": _import_llm_module().breaker_stats(),
+        "streams": _stream_limiter.stats(),
+        "rate_limit": _rate_limiter.stats(),
+        "logging": logging_stats(),
+        "timestamp": datetime.now().isoformat(),
+    }
+
+# 抓取时求值的仪表：与 /api/v1/health 同源
+_metrics.REGISTRY.gauge(
+    "astrolife_streams_in_flight", "Interpretation streams currently open",
+    lambda: _stream_limiter.stats()["active"],
+)
+_metrics.REGISTRY.gauge(
+    "astrolife_cache_hit_ratio", "Cache hit ratio since start",
+    lambda: {(name,): s["hit_rate"] for name, s in _cache_stats().items()}, ("cache",),
+)
+_metrics.REGISTRY.gauge(
+    "astrolife_cache_entries", "Entries currently cached",
+    lambda: {(name,): s["size"] for name, s in _cache_stats().items()}, ("cache",),
+)
+_metrics.REGISTRY.counter(
+    "astrolife_cache_hits_total", "Cache hits since start",
+    lambda: {(name,): s["hits"] for name, s in _cache_stats().items()}, ("cache",),
+)
+_metrics.REGISTRY.counter(
+    "astrolife_cache_misses_total", "Cache misses since start",
+    lambda: {(name,): s["misses"] for name, s in _cache_stats().items()}, ("cache",),
+)
+_metrics.REGISTRY.counter(
+    "astrolife_log_dropped_total", "Log records dropped because the log queue was full",
+    lambda: logging_stats()["dropped"],
+)
+_metrics.REGISTRY.counter(
+    "astrolife_rate_limited_total", "Requests rejected by the rate limiter",
+    lambda: {(name,): s["limited"] for name, s in _rate_limiter.stats().items()}, ("endpoint",),
+)
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus 文本格式指标（按进程）"""
+    return PlainTextResponse(_metrics.REGISTRY.render(), media_type=_metrics.CONTENT_TYPE)
 
 @app.get('/api/v1/activation/status')
 async def activation_status():
@@ -338,23 +452,7 @@ async def activation_status():
     }
 
 # ---- Activation: verify and record one-time codes ----
-_ACT_DATA_DIR = Path(__file__).resolve().parent / 'data'
-_ACT_DATA_DIR.mkdir(parents=True, exist_ok=True)
-_ACT_FILE = _ACT_DATA_DIR / 'activations.json'
-
-def _act_load() -> dict:
-    try:
-        if _ACT_FILE.exists():
-            return json.loads(_ACT_FILE.read_text(encoding='utf-8'))
-    except Exception as e:
-        log.error('[activation] load failed: %s', e)
-    return {}
-
-def _act_save(d: dict) -> None:
-    try:
-        _ACT_FILE.write_text(json.dumps(d, ensure_ascii=False, indent=2), encoding='utf-8')
-    except Exception as e:
-        log.error('[activation] save failed: %s', e)
+# 使用记录存于 SQLite（app/activation_store.py），按码原子累加；旧版 activations.json 首次打开时导入
 
 def _act_checksum(payload: str, secret: str) -> int:
     """Compute a single check digit (0-9) for a numeric payload using secret.
@@ -366,17 +464,29 @@ def _act_checksum(payload: str, secret: str) -> int:
     num = int.from_bytes(mac[:4], 'big')
     return num % 10
 
+# 已验证通过的激活码：(密钥, 码) -> True。只缓存有效码，无效码不会挤占缓存
+_act_verified = LRUTTLCache(
+    maxsize=int(os.getenv("ACTIVATION_VERIFY_CACHE_SIZE", "4096")),
+    ttl=float(os.getenv("ACTIVATION_VERIFY_CACHE_TTL", "86400")),
+)
+
 def _act_verify(code: str, secret: str) -> bool:
     """Verify a short numeric activation code with trailing check digit.
 
     Accepts 4-6 digits. The last digit is the check digit of the preceding digits.
+    Valid codes are memoized, so repeat activations skip the HMAC.
     """
     if not code or not code.isdigit():
         return False
     if len(code) < 4 or len(code) > 6:
         return False
+    if _act_verified.get((secret, code)):
+        return True
     base, check = code[:-1], code[-1]
-    return str(_act_checksum(base, secret)) == check
+    valid = str(_act_checksum(base, secret)) == check
+    if valid:
+        _act_verified.set((secret, code), True)
+    return valid
 
 class ActivationRequest(BaseModel):
     code: str
@@ -392,62 +502,97 @@ async def api_activate(payload: ActivationRequest, request: Request):
     if not _act_verify(code, secret):
         raise HTTPException(status_code=400, detail={"code": "INVALID_CODE", "message": "激活码无效"})
     device_id = (payload.device_id or '').strip() or request.headers.get('x-device-id') or ''
-    store = _act_load()
-    rec = store.get(code)
-    if rec:
-        # 放开唯一性限制：同一码可多设备使用。做次数累计记录。
-        rec.setdefault('uses', 1)
-        rec['uses'] = int(rec['uses']) + 1
-        last = rec.get('last_used_at')
-        rec['last_used_at'] = datetime.now().isoformat()
-        # 可选：记录最近一次 device/ip（会覆盖）
-        rec['device_id'] = device_id or rec.get('device_id') or None
-        rec['ip'] = request.client.host if request.client else (rec.get('ip') or None)
-        store[code] = rec
-        _act_save(store)
-        return {"success": True, "message": "activated", "timestamp": rec['last_used_at']}
-    store[code] = {
-        'device_id': device_id or None,
-        'used_at': datetime.now().isoformat(),
-        'uses': 1,
-        'ip': request.client.host if request.client else None,
+    # 放开唯一性限制：同一码可多设备使用。做次数累计记录，并覆盖最近一次 device/ip。
+    try:
+        rec = await asyncio.to_thread(
+            get_activation_store().record_use, code, device_id, request.client.host if request.client else None
+        )
+    except Exception as e:
+        # 与旧版一致：记录失败只记日志，不影响激活结果
+        log.error('[activation] record failed: %s', e)
+        return {"success": True, "message": "activated", "timestamp": datetime.now().isoformat()}
+    return {"success": True, "message": "activated", "timestamp": rec['last_used_at'] or rec['used_at']}
+
+# ---- Admin: catalog hot reload ----
+def _require_admin(request: Request) -> None:
+    """校验管理令牌（`ADMIN_TOKEN`）；未配置时管理接口整体关闭。"""
+    token = os.getenv('ADMIN_TOKEN')
+    if not token:
+        raise HTTPException(status_code=403, detail={"code": "ADMIN_DISABLED", "message": "管理接口未启用"})
+    given = request.headers.get('x-admin-token') or ''
+    if not hmac.compare_digest(given.encode('utf-8'), token.encode('utf-8')):
+        raise HTTPException(status_code=401, detail={"code": "UNAUTHORIZED", "message": "管理令牌无效"})
+
+@app.post('/api/v1/admin/catalog/reload')
+async def admin_catalog_reload(request: Request):
+    """立即重新加载 starships.json 并原子切换快照。"""
+    _require_admin(request)
+    previous = _catalog.snapshot().version
+    try:
+        snap = await asyncio.to_thread(_catalog.reload)
+    except Exception as e:
+        log.error("[catalog] reload failed: %s\n%s", e, traceback.format_exc())
+        raise HTTPException(status_code=500, detail={"code": "CATALOG_RELOAD_FAILED", "message": str(e)})
+    return {
+        "success": True,
+        "data": {
+            "version": snap.version,
+            "previous_version": previous,
+            "changed": snap.version != previous,
+            "starships_count": snap.count,
+            "loaded_at": snap.loaded_at.isoformat(),
+        },
+        "message": "OK",
+        "timestamp": datetime.now().isoformat(),
     }
-    _act_save(store)
-    return {"success": True, "message": "activated", "timestamp": datetime.now().isoformat()}
 
-@app.get("/starships")
-async def get_starships():
-    """获取所有航天器数据"""
-    return starships_data
+# 航天器目录按版本预渲染为 JSON 字节（含 gzip/br 变体与强 ETag），命中 If-None-Match 时直接 304
+_catalog_renders = VersionedRenderCache()
 
-@app.get("/api/v1/starships")
-async def get_starships_v1():
+def _starships_envelope(snap, data) -> dict:
+    # 包裹响应的 timestamp 固定为该版本的加载时间，保证同一版本的响应字节稳定、可缓存
     return {
         "success": True,
-        "data": starships_data,
+        "data": data,
         "message": "OK",
-        "timestamp": datetime.now().isoformat(),
+        "timestamp": snap.loaded_at.isoformat(),
     }
 
+@app.get("/starships")
+async def get_starships(request: Request):
+    """获取所有航天器数据"""
+    snap = _catalog.snapshot()
+    body = _catalog_renders.get(snap.version, ("catalog", None), snap.as_dict)
+    return prerendered_response(request, body, catalog_max_age())
+
+@app.get("/api/v1/starships")
+async def get_starships_v1(request: Request):
+    snap = _catalog.snapshot()
+    body = _catalog_renders.get(
+        snap.version, ("catalog.v1", None), lambda: _starships_envelope(snap, snap.as_dict())
+    )
+    return prerendered_response(request, body, catalog_max_age())
+
 @app.get("/starships/{archive_id}")
-async def get_starship(archive_id: str):
+async def get_starship(archive_id: str, request: Request):
     """根据ID获取特定航天器"""
-    starship = next((s for s in starships_data['starships'] if s['archive_id'] == archive_id), None)
-    if not starship:
+    snap = _catalog.snapshot()
+    starship = snap.starships.get_by_id(archive_id)
+    if starship is None:
         raise HTTPException(status_code=404, detail="航天器未找到")
-    return starship
+    body = _catalog_renders.get(snap.version, ("starship", archive_id), starship.to_dict)
+    return prerendered_response(request, body, catalog_max_age())
 
 @app.get("/api/v1/starships/{archive_id}")
-async def get_starship_v1(archive_id: str):
-    starship = next((s for s in starships_data['starships'] if s['archive_id'] == archive_id), None)
-    if not starship:
+async def get_starship_v1(archive_id: str, request: Request):
+    snap = _catalog.snapshot()
+    starship = snap.starships.get_by_id(archive_id)
+    if starship is None:
         raise HTTPException(status_code=404, detail="航天器未找到")
-    return {
-        "success": True,
-        "data": starship,
-        "message": "OK",
-        "timestamp": datetime.now().isoformat(),
-    }
+    body = _catalog_renders.get(
+        snap.version, ("starship.v1", archive_id), lambda: _starships_envelope(snap, starship.to_dict())
+    )
+    return prerendered_response(request, body, catalog_max_age())
 
 @app.post("/calculate")
 async def calculate_oracle(request: CalculationRequest):
@@ -455,7 +600,7 @@ async def calculate_oracle(request: CalculationRequest):
     try:
         # 兼容导入算法模块并调用（异步）
         _oracle = _import_oracle_module()
-        result = await _oracle.calculate_oracle(request.birth_date, request.question)
+        result = await _oracle.calculate_oracle(request.birth_date, request.question, debug=request.debug)
         
         return {
             "success": True,
@@ -466,6 +611,8 @@ async def calculate_oracle(request: CalculationRequest):
         
     except ValueError as e:
         raise HTTPException(status_code=400, detail=str(e))
+    except AdmissionRejected:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"计算错误: {str(e)}")
 
@@ -474,8 +621,10 @@ async def calculate_oracle_v1(request: CalculationRequest):
     # 纠正参数传递：oracle_algorithm.calculate_oracle(birth_date_str, question)
     try:
         _oracle = _import_oracle_module()
-        result = await _oracle.calculate_oracle(request.birth_date, request.question)
+        result = await _oracle.calculate_oracle(request.birth_date, request.question, debug=request.debug)
         return {"success": True, "data": result, "message": "OK", "timestamp": datetime.now().isoformat()}
+    except AdmissionRejected:
+        raise
     except Exception as e:
         log.error("[calculate] failed: %s\n%s", e, traceback.format_exc())
         raise HTTPException(status_code=500, detail={"code": "CALCULATION_ERROR", "message": str(e)})
@@ -484,10 +633,13 @@ async def calculate_oracle_v1(request: CalculationRequest):
 @app.post("/api/v1/divine/origin")
 async def divine_origin(payload: DivineOriginRequest):
     try:
-        print('[API] /divine/origin payload:', payload.model_dump())
+        payload_log.debug("[API] /divine/origin payload: %s", payload)
         _oracle = _import_oracle_module()
         birth_date = _oracle.parse_date(payload.birth_date)
-        starship, score = _oracle.calculate_origin_starship(birth_date, starships_data.get("starships", []))
+        # 前端分步调用各 divine 端点：与 /calculate 相同的阶段标签计入阶段耗时直方图
+        started = time.perf_counter()
+        starship, score = _oracle.calculate_origin_starship(birth_date, _catalog.snapshot().starships)
+        _metrics.CALCULATE_STAGE_SECONDS.observe(time.perf_counter() - started, "origin")
         log.info("[divine.origin] birth=%s result=%s score=%.3f", payload.birth_date, starship and starship.get('archive_id'), score)
         return {
             "success": True,
@@ -510,10 +662,16 @@ async def divine_origin(payload: DivineOriginRequest):
 @app.post("/api/v1/divine/celestial")
 async def divine_celestial(payload: DivineCelestialRequest):
     try:
-        print('[API] /divine/celestial payload:', payload.model_dump())
+        payload_log.debug("[API] /divine/celestial payload: %s", payload)
         _oracle = _import_oracle_module()
-        current_date = _oracle.parse_date(payload.inquiry_date) if payload.inquiry_date else datetime.now()
-        starship, score = _oracle.calculate_celestial_starship(current_date, starships_data.get("starships", []))
+        # 天时星舟只取决于日期：走按日缓存
+        inquiry_day = _oracle.parse_date(payload.inquiry_date).date() if payload.inquiry_date else None
+        started = time.perf_counter()
+        if inquiry_day is not None:
+            starship, score = _celestial_cache.get(inquiry_day)
+        else:
+            starship, score = _celestial_cache.get_today()
+        _metrics.CALCULATE_STAGE_SECONDS.observe(time.perf_counter() - started, "celestial")
         log.info("[divine.celestial] date=%s result=%s score=%.3f", payload.inquiry_date or 'now', starship and starship.get('archive_id'), score)
         return {
             "success": True,
@@ -533,26 +691,153 @@ async def divine_celestial(payload: DivineCelestialRequest):
         raise HTTPException(status_code=500, detail={"code": "CALCULATION_ERROR", "message": str(e)})
 
 
+@app.get("/api/v1/divine/celestial/calendar")
+async def divine_celestial_calendar(start: Optional[str] = None, end: Optional[str] = None):
+    """预生成并返回一段日期内每天的天时星舟（缺省为今天起 30 天）。"""
+    try:
+        _oracle = _import_oracle_module()
+        start_day = _oracle.parse_date(start).date() if start else _celestial_cache.today()
+        end_day = _oracle.parse_date(end).date() if end else start_day + timedelta(days=29)
+        rows = _celestial_cache.calendar(start_day, end_day)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail={"code": "INVALID_DATE_RANGE", "message": str(e)})
+    matched: Dict[str, Any] = {}
+    table = []
+    for day, starship, score in rows:
+        archive_id = starship.get("archive_id") if starship else None
+        if starship is not None:
+            matched.setdefault(archive_id, starship)
+        table.append({"date": day.isoformat(), "archive_id": archive_id, "match_score": round(score, 3)})
+    return {
+        "success": True,
+        "data": {
+            "type": "celestial",
+            "start": start_day.isoformat(),
+            "end": end_day.isoformat(),
+            "calendar": table,
+            "starships": matched,
+        },
+        "message": "OK",
+        "timestamp": datetime.now().isoformat(),
+    }
+
+
+# ---- Divine batch endpoints (v1) ----
+_DIVINE_BATCH_MAX_DATES = int(os.getenv("DIVINE_BATCH_MAX_DATES", "10000"))
+
+def _divine_batch(kind: str, date_strs: List[str], calculate_batch) -> dict:
+    """批量占卜：逐个解析日期，合法日期一次性向量化匹配。
+
+    结果按输入顺序返回，只携带 archive_id；命中的航天器在 `starships` 中去重给出。
+    """
+    if len(date_strs) > _DIVINE_BATCH_MAX_DATES:
+        raise HTTPException(status_code=400, detail={
+            "code": "BATCH_TOO_LARGE",
+            "message": f"单次最多 {_DIVINE_BATCH_MAX_DATES} 个日期",
+        })
+    _oracle = _import_oracle_module()
+    parsed: Dict[str, Any] = {}
+    valid_dates: List[datetime] = []
+    valid_slots: List[int] = []
+    results: List[dict] = []
+    for raw in date_strs:
+        if raw not in parsed:
+            try:
+                parsed[raw] = _oracle.parse_date(raw)
+            except (ValueError, TypeError) as e:
+                parsed[raw] = e
+        value = parsed[raw]
+        if isinstance(value, Exception):
+            results.append({"date": raw, "error": {"code": "INVALID_DATE_FORMAT", "message": str(value)}})
+            continue
+        valid_slots.append(len(results))
+        valid_dates.append(value)
+        results.append({"date": raw})
+
+    matched: Dict[str, Any] = {}
+    for slot, (starship, score) in zip(valid_slots, calculate_batch(valid_dates, _catalog.snapshot().starships)):
+        archive_id = starship.get("archive_id") if starship else None
+        if starship is not None:
+            matched.setdefault(archive_id, starship)
+        results[slot].update({"archive_id": archive_id, "match_score": round(score, 3)})
+    return {
+        "success": True,
+        "data": {
+            "type": kind,
+            "count": len(results),
+            "results": results,
+            "starships": matched,
+        },
+        "message": "OK",
+        "timestamp": datetime.now().isoformat(),
+    }
+
+
+@app.post("/api/v1/divine/origin/batch")
+async def divine_origin_batch(payload: DivineOriginBatchRequest):
+    try:
+        _oracle = _import_oracle_module()
+        response = _divine_batch("origin", payload.birth_dates, _oracle.calculate_origin_starships_batch)
+        log.info("[divine.origin.batch] n=%s", len(payload.birth_dates))
+        return response
+    except HTTPException:
+        raise
+    except Exception as e:
+        log.error("[divine.origin.batch] failed: %s\n%s", e, traceback.format_exc())
+        raise HTTPException(status_code=500, detail={"code": "CALCULATION_ERROR", "message": str(e)})
+
+
+@app.post("/api/v1/divine/celestial/batch")
+async def divine_celestial_batch(payload: DivineCelestialBatchRequest):
+    try:
+        _oracle = _import_oracle_module()
+        response = _divine_batch("celestial", payload.inquiry_dates, _oracle.calculate_celestial_starships_batch)
+        log.info("[divine.celestial.batch] n=%s", len(payload.inquiry_dates))
+        return response
+    except HTTPException:
+        raise
+    except Exception as e:
+        log.error("[divine.celestial.batch] failed: %s\n%s", e, traceback.format_exc())
+        raise HTTPException(status_code=500, detail={"code": "CALCULATION_ERROR", "message": str(e)})
+
+
+_INQUIRY_TOP_K = int(os.getenv("INQUIRY_TOP_K", "5"))
+
 @app.post("/api/v1/divine/inquiry")
 async def divine_inquiry(payload: DivineInquiryRequest):
     try:
-        print('[API] /divine/inquiry payload:', payload.model_dump())
+        payload_log.debug("[API] /divine/inquiry payload: %s", payload)
         _oracle = _import_oracle_module()
-        starship, score = await _oracle.calculate_inquiry_starship(payload.question, starships_data.get("starships", []))
+        snapshot = _catalog.snapshot()
+        data: Dict[str, Any] = {"type": "inquiry"}
+        started = time.perf_counter()
+        if _oracle.inquiry_matcher_mode() == "semantic":
+            # 本地语义索引：同时返回前 k 个候选及其真实相似度
+            candidates = _oracle.calculate_inquiry_candidates(
+                payload.question, snapshot.starships, _INQUIRY_TOP_K, snapshot.version
+            )
+            starship, score = candidates[0] if candidates else (None, 0.0)
+            data["candidates"] = [
+                {"archive_id": s.get("archive_id"), "name_cn": s.get("name_cn"), "score": round(sc, 4)}
+                for s, sc in candidates
+            ]
+            basis = "semantic index"
+        else:
+            starship, score = await _oracle.calculate_inquiry_starship(payload.question, snapshot.starships, snapshot.version)
+            basis = "LLM only"
+        _metrics.CALCULATE_STAGE_SECONDS.observe(time.perf_counter() - started, "inquiry")
         log.info("[divine.inquiry] q.len=%s result=%s score=%.3f", len(payload.question or ''), starship and starship.get('archive_id'), score)
+        data.update({"starship": starship, "match_score": round(score, 3), "basis": basis})
         return {
             "success": True,
-            "data": {
-                "type": "inquiry",
-                "starship": starship,
-                "match_score": round(score, 3),
-                "basis": "LLM only"
-            },
+            "data": data,
             "message": "OK",
             "timestamp": datetime.now().isoformat()
         }
     except ValueError as e:
         raise HTTPException(status_code=400, detail={"code": "MISSING_REQUIRED_FIELD", "message": str(e)})
+    except AdmissionRejected:
+        raise
     except Exception as e:
         log.error("[divine.inquiry] failed: %s\n%s", e, traceback.format_exc())
         raise HTTPException(status_code=500, detail={"code": "CALCULATION_ERROR", "message": str(e)})
@@ -564,72 +849,76 @@ async def divine_inquiry(payload: DivineInquiryRequest):
 # Streaming interpretation (SSE): 仅 GET（适配原生 EventSource）
 
 
+_stream_limiter = StreamLimiter(max_streams())
+
+
 @app.get("/api/v1/oracle/stream")
 async def oracle_stream(origin_id: str, celestial_id: str, inquiry_id: str, question: str = "", name: str = ""):
-    """使用前端已计算出的三艘飞船与问题，流式生成最终解读（SSE）。"""
+    """使用前端已计算出的三艘飞船与问题，流式生成最终解读（SSE）。
+    全程为异步生成器：不占用线程池，单个 worker 的并发流数由 `SSE_MAX_STREAMS` 限制。
+    """
+    slot = _stream_limiter.try_acquire()
+    if slot is None:
+        async def _busy():
+            yield sse_event("error", {"message": "STREAM_BUSY: 当前解读请求过多，请稍后重试"})
+        return StreamingResponse(_busy(), status_code=503, media_type="text/event-stream; charset=utf-8", headers={
+            **SSE_HEADERS,
+            "Retry-After": "1",
+        })
     try:
-        _oracle = _import_oracle_module()
         _llm = _import_llm_module()
 
-        print('[SSE] /api/v1/oracle/stream params:', {
-            'origin_id': origin_id, 'celestial_id': celestial_id, 'inquiry_id': inquiry_id, 'question': question, 'name': name
-        })
-        data = _oracle.load_starships_data()
-        starships = data.get("starships", [])
-
-        def _by_id(sid: str):
-            return next((s for s in starships if s.get("archive_id") == sid), None)
-
-        origin = _by_id(origin_id)
-        celestial = _by_id(celestial_id)
-        inquiry = _by_id(inquiry_id)
-        print('[SSE] resolved starships:', {
-            'origin': origin and {'id': origin.get('archive_id'), 'name': origin.get('name_cn')},
-            'celestial': celestial and {'id': celestial.get('archive_id'), 'name': celestial.get('name_cn')},
-            'inquiry': inquiry and {'id': inquiry.get('archive_id'), 'name': inquiry.get('name_cn')},
-        })
+        payload_log.debug(
+            "[SSE] /api/v1/oracle/stream params: origin_id=%s celestial_id=%s inquiry_id=%s question=%s name=%s",
+            origin_id, celestial_id, inquiry_id, question, name,
+        )
+        starships = _catalog.snapshot().starships
+
+        origin = starships.get_by_id(origin_id)
+        celestial = starships.get_by_id(celestial_id)
+        inquiry = starships.get_by_id(inquiry_id)
+        log.info(
+            "[SSE] resolved starships: origin=%s celestial=%s inquiry=%s",
+            origin and origin.get('archive_id'), celestial and celestial.get('archive_id'), inquiry and inquiry.get('archive_id'),
+        )
         if not origin or not celestial or not inquiry:
             raise ValueError("缺少必要的飞船: origin/celestial/inquiry")
 
-        def _sse(event: str, obj: dict):
-            import json as _json
-            return f"event: {event}\ndata: {_json.dumps(obj, ensure_ascii=False)}\n\n"
+        # 在发送响应头之前完成缓存查找与主模型准入：排队已满时直接返回 429
+        llm = _llm.get_llm_service()
+        stream = await llm.open_interpretation_stream(origin, celestial, inquiry, question, name)
 
-        def _stream():
+        async def _stream():
             try:
-                llm = _llm.get_llm_service()
-                # 打印发送给模型的提示词（仅用于调试）
-                try:
-                    # 统一从 prompts 构建提示
-                    try:
-                        from app.prompts import build_interpretation_user_prompt as _build_prompt  # type: ignore
-                    except ModuleNotFoundError:
-                        from prompts import build_interpretation_user_prompt as _build_prompt  # type: ignore
-                    prompt = _build_prompt(origin, celestial, inquiry, question, name)
-                    print('[SSE] prompt to LLM (first 800):\n' + (prompt[:800] + ('...' if len(prompt) > 800 else '')))
-                except Exception as _e:
-                    print('[SSE] prompt build log failed:', _e)
-                for delta in llm.stream_final_interpretation(origin, celestial, inquiry, question, name):
+                async for delta in stream:
                     if delta:
-                        yield _sse("result", {"output_text": delta})
-                yield _sse("completed", {"ok": True})
+                        yield sse_event("result", {"output_text": delta})
+                yield sse_event("completed", {"ok": True})
             except Exception as e:
-                yield _sse("error", {"message": str(e)})
-
-        return StreamingResponse(_stream(), media_type="text/event-stream; charset=utf-8", headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-            "X-Accel-Buffering": "no",
-        })
+                yield sse_event("error", {"message": str(e)})
+            finally:
+                slot.release()
+
+        def _release():
+            # 客户端在首个事件前断开时生成器不会执行，由响应结束回调兜底释放名额
+            slot.release()
+            stream.release()
+
+        return StreamingResponse(
+            _stream(),
+            media_type="text/event-stream; charset=utf-8",
+            headers=SSE_HEADERS,
+            background=BackgroundTask(_release),
+        )
+    except AdmissionRejected:
+        slot.release()
+        raise
     except Exception as e:
-        def _err(error_obj):
-            import json as _json
-            yield f"event: error\ndata: {_json.dumps({'message': f'STREAM_ERROR: {error_obj}'}, ensure_ascii=False)}\n\n"
-        return StreamingResponse(_err(e), media_type="text/event-stream; charset=utf-8", headers={
-            "Cache-Control": "no-cache",
-            "Connection": "keep-alive",
-            "X-Accel-Buffering": "no",
-        })
+        slot.release()
+
+        async def _err(error_obj):
+            yield sse_event("error", {"message": f"STREAM_ERROR: {error_obj}"})
+        return StreamingResponse(_err(e), media_type="text/event-stream; charset=utf-8", headers=SSE_HEADERS)
 
 @app.get("/health")
 async def health_check():
@@ -0,0 +1,217 @@
+"""
+Prometheus 文本格式指标
+进程内直方图与抓取时求值的仪表，由 `/metrics` 以 text exposition format（0.0.4）输出。
+
+热路径只做一次字典查找、一次二分与两次加法：直方图按标签值缓存子项，仅首次出现新标签组合时加锁；
+观测都发生在事件循环线程，计数无需加锁。仪表（进行中的流、缓存命中率等）在抓取时才调用回调读取，平时零开销。
+指标按进程统计；多 worker 部署时每个 worker 各自一份。
+"""
+
+import math
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+# 请求与阶段耗时（秒）
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# 本地计算阶段（秒）：微秒到几十毫秒
+COMPUTE_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.1)
+# 生成速率（token/秒）
+RATE_BUCKETS = (1, 2, 5, 10, 20, 30, 50, 75, 100, 150, 200, 500)
+
+GaugeValue = Union[float, int, None, Dict[Tuple[str, ...], Optional[float]]]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _number(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if value == int(value) and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+
+def _labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(str(v))}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _HistogramChild:
+    __slots__ = ("counts", "sum")
+
+    def __init__(self, size: int):
+        self.counts = [0] * size
+        self.sum = 0.0
+
+
+class Histogram:
+    """按标签区分的直方图；桶计数不累积存储，输出时再累加。"""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._children: Dict[Tuple[str, ...], _HistogramChild] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str) -> None:
+        child = self._children.get(labels)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(labels, _HistogramChild(len(self.buckets) + 1))
+        # bisect_left：恰好等于上界的值计入该桶（le 语义）
+        child.counts[bisect_left(self.buckets, value)] += 1
+        child.sum += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for labels, child in sorted(self._children.items()):
+            counts, total = list(child.counts), child.sum
+            cumulative = 0
+            for bound, n in zip(self.buckets + (math.inf,), counts):
+                cumulative += n
+                le = 'le="%s"' % _number(bound)
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {cumulative}")
+        return lines
+
+
+class CallbackMetric:
+    """抓取时调用 `fn` 取值的 gauge/counter；`fn` 返回单个数值，或 {标签值元组: 数值}。"""
+
+    def __init__(self, name: str, help: str, fn: Callable[[], GaugeValue], labelnames: Sequence[str] = (), kind: str = "gauge"):
+        self.name = name
+        self.help = help
+        self.fn = fn
+        self.labelnames = tuple(labelnames)
+        self.kind = kind
+
+    def render(self) -> List[str]:
+        value = self.fn()
+        samples = value.items() if isinstance(value, dict) else [((), value)]
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        for labels, v in samples:
+            if v is not None:
+                lines.append(f"{self.name}{_labels(self.labelnames, labels)} {_number(v)}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, Union[Histogram, CallbackMetric]] = {}
+
+    def register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"metric {metric.name} already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def gauge(self, name: str, help: str, fn: Callable[[], GaugeValue], labelnames: Sequence[str] = ()) -> CallbackMetric:
+        return self.register(CallbackMetric(name, help, fn, labelnames))
+
+    def counter(self, name: str, help: str, fn: Callable[[], GaugeValue], labelnames: Sequence[str] = ()) -> CallbackMetric:
+        return self.register(CallbackMetric(name, help, fn, labelnames, kind="counter"))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            try:
+                lines.extend(metric.render())
+            except Exception as e:
+                # 单个回调出错不影响其余指标
+                lines.append(f"# {metric.name} unavailable: {_escape(repr(e))}")
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    "astrolife_http_request_duration_seconds",
+    "HTTP request latency by route template and status (streams: until the last byte)",
+    ("method", "route", "status"),
+)
+CALCULATE_STAGE_SECONDS = REGISTRY.histogram(
+    "astrolife_calculate_stage_duration_seconds",
+    "Duration of each divination stage (origin, celestial, inquiry, prompt, interpretation) in /calculate and the /divine endpoints",
+    ("stage",),
+    sorted(set(COMPUTE_BUCKETS + LATENCY_BUCKETS)),
+)
+LLM_SELECT_SECONDS = REGISTRY.histogram(
+    "astrolife_llm_select_duration_seconds",
+    "Fast-model starship selection call latency",
+    ("model",),
+)
+LLM_TTFT_SECONDS = REGISTRY.histogram(
+    "astrolife_llm_time_to_first_token_seconds",
+    "Streaming model time to first token, from the upstream request",
+    ("model",),
+)
+LLM_STREAM_SECONDS = REGISTRY.histogram(
+    "astrolife_llm_stream_duration_seconds",
+    "Total streaming model call duration",
+    ("model",),
+)
+LLM_STREAM_TOKENS_PER_SECOND = REGISTRY.histogram(
+    "astrolife_llm_stream_tokens_per_second",
+    "Streaming generation rate after the first token (stream deltas counted as tokens)",
+    ("model",),
+    RATE_BUCKETS,
+)
+
+
+def observe_stream(model: str, first_token: float, total: float, tokens: int) -> None:
+    """流式调用结束时记录总耗时与首字之后的生成速率。"""
+    LLM_STREAM_SECONDS.observe(total, model)
+    if tokens > 1 and total > first_token:
+        LLM_STREAM_TOKENS_PER_SECOND.observe((tokens - 1) / (total - first_token), model)
+
+
+class MetricsMiddleware:
+    """ASGI 中间件：按路由模板（而非原始路径，避免标签基数膨胀）与状态码记录请求耗时。"""
+
+    def __init__(self, app):
+        self.app = app
+        self._routes: Optional[Dict[object, str]] = None
+        self._static: frozenset = frozenset()
+
+    def _route(self, scope) -> str:
+        if self._routes is None:
+            routes = scope["app"].routes
+            self._routes = {getattr(r, "endpoint", None) or getattr(r, "app", None): r.path for r in routes}
+            self._static = frozenset(r.path for r in routes if "{" not in r.path)
+        endpoint = scope.get("endpoint")
+        if endpoint is not None:
+            return self._routes.get(endpoint, "other")
+        # 未进入路由（如被限流拒绝）：只接受已知的静态路径
+        path = scope["path"]
+        return path if path in self._static else "unmatched"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status = 500
+
+        async def _send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, _send)
+        finally:
+            HTTP_REQUEST_SECONDS.observe(time.perf_counter() - start, scope["method"], self._route(scope), str(status))
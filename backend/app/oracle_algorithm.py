@@ -3,56 +3,44 @@
 基于航天器神谕的智能匹配算法
 """
 
-import json
+import logging
+import os
+from bisect import bisect_right
 from datetime import datetime, timedelta
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, List, Optional, Sequence, Tuple
 import random
-import re
-from pathlib import Path
+import time
 import asyncio
 
+import numpy as np
+
 # 导入LLM服务（兼容包内/顶层两种运行方式）
 try:
     from app.llm_service import get_llm_service  # type: ignore
+    from app.catalog import get_catalog  # type: ignore
+    from app.semantic_index import get_semantic_index  # type: ignore
+    from app.cache import LRUTTLCache  # type: ignore
+    from app.text_utils import STOP_WORDS, normalize_question, tokenize  # type: ignore
+    from app.shortlist import get_shortlist_index, record_shortlist_pick, shortlist_stats  # type: ignore
+    from app.prompts import build_interpretation_user_prompt  # type: ignore
+    from app.admission import AdmissionRejected  # type: ignore
+    from app.metrics import CALCULATE_STAGE_SECONDS  # type: ignore
 except ModuleNotFoundError:
     from llm_service import get_llm_service  # type: ignore
+    from catalog import get_catalog  # type: ignore
+    from semantic_index import get_semantic_index  # type: ignore
+    from cache import LRUTTLCache  # type: ignore
+    from text_utils import STOP_WORDS, normalize_question, tokenize  # type: ignore
+    from shortlist import get_shortlist_index, record_shortlist_pick, shortlist_stats  # type: ignore
+    from prompts import build_interpretation_user_prompt  # type: ignore
+    from admission import AdmissionRejected  # type: ignore
+    from metrics import CALCULATE_STAGE_SECONDS  # type: ignore
 
-# 加载航天器数据
-def _resolve_starships_path() -> Path:
-    """解析 starships.json 的路径，与 app.main 中策略保持一致。"""
-    import os
-    # 1) 环境变量优先
-    env_path = os.getenv("STARSHIPS_JSON")
-    if env_path:
-        p = Path(env_path)
-        if p.exists():
-            return p
-
-    backend_root = Path(__file__).resolve().parent.parent
-
-    # 2) backend/data/starships.json
-    candidate = backend_root / "data" / "starships.json"
-    if candidate.exists():
-        return candidate
-
-    # 3) 仓库根 data/starships.json
-    repo_root_candidate = backend_root.parent / "data" / "starships.json"
-    if repo_root_candidate.exists():
-        return repo_root_candidate
-
-    # 4) 工作目录兜底
-    cwd_candidate = Path("data/starships.json").resolve()
-    if cwd_candidate.exists():
-        return cwd_candidate
-
-    raise FileNotFoundError("未能定位到 starships.json，请检查部署数据或设置 STARSHIPS_JSON。")
-
+log = logging.getLogger("app.oracle")
 
 def load_starships_data() -> Dict:
-    """加载航天器数据"""
-    data_path = _resolve_starships_path()
-    with open(data_path, 'r', encoding='utf-8') as f:
-        return json.load(f)
+    """加载航天器数据（来自进程内共享目录的当前快照）"""
+    return get_catalog().snapshot().as_dict()
 
 # 日期处理函数
 def parse_date(date_str: str) -> datetime:
@@ -68,14 +56,8 @@ def calculate_date_difference(date1: datetime, date2: datetime) -> int:
 
 # 关键词匹配算法
 def preprocess_text(text: str) -> List[str]:
-    """预处理文本，提取关键词"""
-    # 移除标点符号
-    text = re.sub(r'[^\w\s]', '', text)
-    # 转换为小写并分词
-    words = text.lower().split()
-    # 过滤停用词（简单版本）
-    stop_words = {'的', '了', '在', '是', '我', '你', '他', '她', '它', '我们', '你们', '他们', '什么', '怎么', '为什么', '如何'}
-    return [word for word in words if word not in stop_words and len(word) > 1]
+    """预处理文本，提取关键词（中文按字符二元组切分，英文按单词切分）"""
+    return [word for word in tokenize(text) if word not in STOP_WORDS and len(word) > 1]
 
 def calculate_keyword_similarity(question_words: List[str], spacecraft_keywords: List[str]) -> float:
     """计算问题关键词与航天器关键词的相似度"""
@@ -88,67 +70,248 @@ def calculate_keyword_similarity(question_words: List[str], spacecraft_keywords:
     
     return min(match_score, 1.0)
 
+# 发射日期索引：按发射日序数排序，二分查找最近发射
+class LaunchIndex:
+    """航天器发射日期索引。
+
+    每次加载航天器数据后构建一次：把合法的 `launch_date` 解析为日序数（ordinal）
+    并排序，查询时用 bisect 定位最近的发射，单次查询 O(log n)。
+    同一天发射的多艘航天器只保留数据中最靠前的一艘，与逐个扫描时“分数严格更大才替换”的
+    取舍一致；缺失或格式错误的 `launch_date` 会被跳过。
+    """
+
+    __slots__ = ("starships", "ordinals", "positions", "_arrays")
+
+    def __init__(self, starships_data: Sequence[Dict]):
+        self.starships = starships_data
+        first_by_ordinal: Dict[int, int] = {}
+        for pos, starship in enumerate(starships_data):
+            try:
+                ordinal = parse_date(starship["launch_date"]).toordinal()
+            except (ValueError, KeyError):
+                continue
+            first_by_ordinal.setdefault(ordinal, pos)
+        self.ordinals: List[int] = sorted(first_by_ordinal)
+        self.positions: List[int] = [first_by_ordinal[o] for o in self.ordinals]
+        self._arrays: Optional[Tuple[np.ndarray, np.ndarray]] = None
+
+    def __len__(self) -> int:
+        return len(self.ordinals)
+
+    def nearest(self, moment: datetime) -> Optional[Tuple[Dict, int]]:
+        """返回距 `moment` 最近的航天器及天数差；索引为空时返回 None。
+
+        发射日均为当天零点，`moment` 的日内时刻不影响天数差，
+        结果与 `calculate_date_difference` 一致。
+        """
+        if not self.ordinals:
+            return None
+        day = moment.toordinal()
+        i = bisect_right(self.ordinals, day)
+
+        best: Optional[Tuple[int, int]] = None  # (diff, position)
+        if i > 0:
+            best = (day - self.ordinals[i - 1], self.positions[i - 1])
+        if i < len(self.ordinals):
+            candidate = (self.ordinals[i] - day, self.positions[i])
+            # 天数差相同则取数据中更靠前的一艘
+            if best is None or candidate < best:
+                best = candidate
+        diff, pos = best
+        return self.starships[pos], diff
+
+    def nearest_many(self, days: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """`nearest` 的向量化版本：输入日序数数组，返回（数据位置, 天数差）两个数组。
+
+        索引为空时位置全部为 -1。取舍规则与 `nearest` 完全一致。
+        """
+        days = np.asarray(days, dtype=np.int64)
+        if not self.ordinals:
+            return np.full(days.shape, -1, dtype=np.int64), np.zeros(days.shape, dtype=np.int64)
+        if self._arrays is None:
+            self._arrays = (
+                np.asarray(self.ordinals, dtype=np.int64),
+                np.asarray(self.positions, dtype=np.int64),
+            )
+        ordinals, positions = self._arrays
+        last = len(ordinals) - 1
+        i = np.searchsorted(ordinals, days, side="right")
+        left = np.clip(i - 1, 0, last)
+        right = np.clip(i, 0, last)
+        # 越界一侧用一个不可能胜出的天数差占位
+        never = np.iinfo(np.int64).max
+        left_diff = np.where(i > 0, days - ordinals[left], never)
+        right_diff = np.where(i <= last, ordinals[right] - days, never)
+        left_pos = positions[left]
+        right_pos = positions[right]
+        take_right = (right_diff < left_diff) | ((right_diff == left_diff) & (right_pos < left_pos))
+        return np.where(take_right, right_pos, left_pos), np.where(take_right, right_diff, left_diff)
+
+
+_launch_index_cache: Optional[LaunchIndex] = None
+
+
+def get_launch_index(starships_data: Sequence[Dict]) -> LaunchIndex:
+    """获取数据对应的发射日期索引：同一份数据只构建一次。"""
+    global _launch_index_cache
+    cached = _launch_index_cache
+    if cached is not None and cached.starships is starships_data:
+        return cached
+    index = LaunchIndex(starships_data)
+    _launch_index_cache = index
+    return index
+
+
 # 核心占卜算法（统一命名：origin/celestial/inquiry）
-def calculate_origin_starship(birth_date: datetime, starships_data: List[Dict]) -> Tuple[Optional[Dict], float]:
+def calculate_origin_starship(
+    birth_date: datetime,
+    starships_data: Sequence[Dict],
+    index: Optional[LaunchIndex] = None,
+) -> Tuple[Optional[Dict], float]:
     """
     计算命运航天器（基于出生日期）
     返回匹配的航天器和匹配分数
     """
-    best_match = None
-    best_score = 0.0
-    
-    for starship in starships_data:
-        try:
-            launch_date = parse_date(starship["launch_date"])
-            date_diff = calculate_date_difference(birth_date, launch_date)
-            
-            # 计算匹配分数（天数差越小，分数越高）
-            score = 1.0 / (1 + date_diff / 365)  # 归一化到0-1之间
-            
-            if score > best_score:
-                best_score = score
-                best_match = starship
-        except (ValueError, KeyError):
-            continue
-    
-    return best_match, best_score
+    found = (index or get_launch_index(starships_data)).nearest(birth_date)
+    if found is None:
+        return None, 0.0
+    starship, date_diff = found
+    # 计算匹配分数（天数差越小，分数越高）
+    score = 1.0 / (1 + date_diff / 365)  # 归一化到0-1之间
+    return starship, score
 
-def calculate_celestial_starship(current_date: datetime, starships_data: List[Dict]) -> Tuple[Optional[Dict], float]:
+def calculate_celestial_starship(
+    current_date: datetime,
+    starships_data: Sequence[Dict],
+    index: Optional[LaunchIndex] = None,
+) -> Tuple[Optional[Dict], float]:
     """
     计算时运航天器（基于当前日期）
     """
-    best_match = None
-    best_score = 0.0
-    
-    for starship in starships_data:
-        try:
-            launch_date = parse_date(starship["launch_date"])
-            date_diff = calculate_date_difference(current_date, launch_date)
-            
-            # 计算匹配分数
-            score = 1.0 / (1 + date_diff / 30)  # 更关注近期的匹配
-            
-            if score > best_score:
-                best_score = score
-                best_match = starship
-        except (ValueError, KeyError):
-            continue
-    
-    return best_match, best_score
+    found = (index or get_launch_index(starships_data)).nearest(current_date)
+    if found is None:
+        return None, 0.0
+    starship, date_diff = found
+    # 计算匹配分数
+    score = 1.0 / (1 + date_diff / 30)  # 更关注近期的匹配
+    return starship, score
+
+def _calculate_nearest_batch(
+    dates: Sequence[datetime],
+    starships_data: Sequence[Dict],
+    index: Optional[LaunchIndex],
+    scale: int,
+) -> List[Tuple[Optional[Dict], float]]:
+    """批量最近发射匹配：一次向量化计算所有日期的位置与分数。"""
+    index = index or get_launch_index(starships_data)
+    days = np.fromiter((d.toordinal() for d in dates), dtype=np.int64, count=len(dates))
+    positions, diffs = index.nearest_many(days)
+    # 与标量版本逐位一致：int / int 与 float64 数组除法同为 IEEE 正确舍入
+    scores = 1.0 / (1 + diffs / scale)
+    starships = index.starships
+    return [
+        (starships[pos], score) if pos >= 0 else (None, 0.0)
+        for pos, score in zip(positions.tolist(), scores.tolist())
+    ]
 
-async def calculate_inquiry_starship(question: str, starships_data: List[Dict]) -> Tuple[Optional[Dict], float]:
-    """计算问题航天器：仅允许使用 LLM，不进行关键词回退"""
+def calculate_origin_starships_batch(
+    birth_dates: Sequence[datetime],
+    starships_data: Sequence[Dict],
+    index: Optional[LaunchIndex] = None,
+) -> List[Tuple[Optional[Dict], float]]:
+    """批量计算命运航天器，结果与逐个调用 `calculate_origin_starship` 相同"""
+    return _calculate_nearest_batch(birth_dates, starships_data, index, 365)
+
+def calculate_celestial_starships_batch(
+    current_dates: Sequence[datetime],
+    starships_data: Sequence[Dict],
+    index: Optional[LaunchIndex] = None,
+) -> List[Tuple[Optional[Dict], float]]:
+    """批量计算时运航天器，结果与逐个调用 `calculate_celestial_starship` 相同"""
+    return _calculate_nearest_batch(current_dates, starships_data, index, 30)
+
+# 问道星舟匹配方式：llm（默认，快速模型选择）/ semantic（本地 n-gram TF-IDF 语义索引）
+INQUIRY_MATCHERS = ("llm", "semantic")
+
+def inquiry_matcher_mode() -> str:
+    """读取 `INQUIRY_MATCHER`，非法取值按 llm 处理。
+    `semantic` 是部署方显式选择的本地匹配模式，不是 LLM 失败后的回退：llm 模式下失败仍返回空结果。
+    """
+    mode = os.getenv("INQUIRY_MATCHER", "llm").strip().lower()
+    return mode if mode in INQUIRY_MATCHERS else "llm"
+
+def calculate_inquiry_candidates(
+    question: str,
+    starships_data: Sequence[Dict],
+    k: int = 5,
+    catalog_version: str = "",
+) -> List[Tuple[Dict, float]]:
+    """用本地语义索引给出问题的前 k 个候选航天器及真实相似度（不访问网络）"""
+    if not question:
+        return []
+    index = get_semantic_index(starships_data, catalog_version)
+    return [(starships_data[pos], score) for pos, score in index.search(question, k)]
+
+# 问道结果缓存：键为（目录版本, 匹配方式, 归一化问题），目录热更新后旧条目自然失效
+_inquiry_cache = LRUTTLCache(
+    maxsize=int(os.getenv("INQUIRY_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("INQUIRY_CACHE_TTL", "3600")),
+)
+
+def inquiry_cache_stats() -> Dict:
+    """问道结果缓存的命中统计"""
+    return _inquiry_cache.stats()
+
+async def calculate_inquiry_starship(
+    question: str,
+    starships_data: Sequence[Dict],
+    catalog_version: str = "",
+) -> Tuple[Optional[Dict], float]:
+    """计算问题航天器：默认仅允许使用 LLM，不进行关键词回退；可切换为本地语义索引
+
+    给出 `catalog_version` 时，结果按归一化问题缓存（只缓存成功匹配）。
+    """
     if not question:
         return None, 0.0
+    mode = inquiry_matcher_mode()
+    key = None
+    if catalog_version:
+        normalized = normalize_question(question)
+        if normalized:
+            key = (catalog_version, mode, normalized)
+            cached = _inquiry_cache.get(key)
+            if cached is not None:
+                return cached
+    result = await _select_inquiry_starship(question, starships_data, catalog_version, mode)
+    if key is not None and result[0] is not None:
+        _inquiry_cache.set(key, result)
+    return result
+
+async def _select_inquiry_starship(
+    question: str,
+    starships_data: Sequence[Dict],
+    catalog_version: str,
+    mode: str,
+) -> Tuple[Optional[Dict], float]:
+    if mode == "semantic":
+        candidates = calculate_inquiry_candidates(question, starships_data, 1, catalog_version)
+        return candidates[0] if candidates else (None, 0.0)
     try:
         llm_service = get_llm_service()
-        selected_starship = await llm_service.select_question_starship(question, starships_data)
+        # 先用关键词倒排索引筛出前 K 个候选，只把候选放进快速模型的提示词
+        shortlist = get_shortlist_index(starships_data).shortlist(question)
+        selected_starship = await llm_service.select_question_starship(
+            question, starships_data, candidates=shortlist
+        )
         if selected_starship:
+            record_shortlist_pick(selected_starship, shortlist, len(starships_data))
             return selected_starship, 0.9
         # LLM未能选择返回空
         return None, 0.0
+    except AdmissionRejected:
+        raise
     except Exception as e:
-        print(f"LLM选择问题航天器失败: {e}")
+        log.warning("[oracle] LLM选择问题航天器失败: %s", e)
         # 不允许关键词回退，直接返回空
         return None, 0.0
 
@@ -175,9 +338,10 @@ async def generate_interpretation(
     origin_starship: Optional[Dict], 
     celestial_starship: Optional[Dict], 
     inquiry_starship: Optional[Dict],
-    question: Optional[str]
+    question: Optional[str],
+    prompt: Optional[str] = None,
 ) -> str:
-    """生成神谕解读文本（使用LLM大模型智能生成）"""
+    """生成神谕解读文本（使用LLM大模型智能生成）；`prompt` 为已构建好的解读提示词（可选）"""
     if not origin_starship or not celestial_starship or not inquiry_starship:
         return "无法生成完整的神谕解读，请确保所有航天器都已正确匹配。"
     
@@ -186,7 +350,7 @@ async def generate_interpretation(
         llm_service = get_llm_service()
         # 参数顺序：origin, celestial, inquiry, question
         final_interpretation = await llm_service.generate_final_interpretation(
-            origin_starship, celestial_starship, inquiry_starship, question
+            origin_starship, celestial_starship, inquiry_starship, question, prompt=prompt
         )
         
         if final_interpretation:
@@ -195,8 +359,10 @@ async def generate_interpretation(
             # LLM生成失败，回退到预定义文本组合
             return _fallback_interpretation(origin_starship, celestial_starship, inquiry_starship)
             
+    except AdmissionRejected:
+        raise
     except Exception as e:
-        print(f"LLM生成神谕解读失败: {e}")
+        log.warning("[oracle] LLM生成神谕解读失败: %s", e)
         # 失败时回退到预定义文本组合
         return _fallback_interpretation(origin_starship, celestial_starship, inquiry_starship)
 
@@ -223,60 +389,98 @@ def _fallback_interpretation(origin_starship: Dict, celestial_starship: Dict, in
     else:
         return "暂时无法为您提供神谕解读，请稍后再试。"
 
-def stream_oracle_interpretation(
-    origin_starship: Dict,
-    celestial_starship: Dict,
-    inquiry_starship: Dict,
-    question: Optional[str]
-):
-    """流式生成最终神谕解读（生成器）。
+def _get_celestial_cache():
+    # 延迟导入：celestial_cache 依赖本模块
+    try:
+        from app.celestial_cache import get_celestial_cache  # type: ignore
+    except ModuleNotFoundError:
+        from celestial_cache import get_celestial_cache  # type: ignore
+    return get_celestial_cache()
 
-    直接把三艘飞船与问题交给 LLM 的 streaming 接口，逐块 yield 文本。
-    前端通过 SSE 接口消费本生成器的增量片段。
-    """
-    if not origin_starship or not celestial_starship or not inquiry_starship:
-        def _gen():
-            yield "缺少必要的飞船，无法生成完整解读。"
-        return _gen()
+class _StageTimings:
+    """记录占卜流水线各阶段相对请求开始的起止时间（毫秒），并计入阶段耗时直方图。"""
+
+    def __init__(self):
+        self._t0 = time.perf_counter()
+        self.stages: Dict[str, Dict[str, float]] = {}
+
+    def _record(self, name: str, start: float) -> None:
+        end = time.perf_counter()
+        CALCULATE_STAGE_SECONDS.observe(end - start, name)
+        self.stages[name] = {
+            "start_ms": round((start - self._t0) * 1000, 3),
+            "end_ms": round((end - self._t0) * 1000, 3),
+            "duration_ms": round((end - start) * 1000, 3),
+        }
+
+    def run(self, name: str, fn, *args):
+        start = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            self._record(name, start)
+
+    async def run_async(self, name: str, coro):
+        start = time.perf_counter()
+        try:
+            return await coro
+        finally:
+            self._record(name, start)
+
+    def as_dict(self) -> Dict:
+        total_ms = round((time.perf_counter() - self._t0) * 1000, 3)
+        return {"total_ms": total_ms, "stages": self.stages}
 
-    try:
-        llm_service = get_llm_service()
-        return llm_service.stream_final_interpretation(
-            origin_starship, celestial_starship, inquiry_starship, question
-        )
-    except Exception:
-        # 回退为一次性组合文本
-        def _gen2():
-            yield _fallback_interpretation(origin_starship, celestial_starship, inquiry_starship)
-        return _gen2()
 
 async def calculate_oracle(
     birth_date_str: str, 
-    question: Optional[str] = None
+    question: Optional[str] = None,
+    debug: bool = False,
 ) -> Dict:
     """
     主占卜函数（异步版本，支持LLM集成）
-    返回完整的占卜结果
+    返回完整的占卜结果；`debug` 为真时附带各阶段耗时 `timings`
+
+    各阶段按依赖关系执行：问道（LLM 调用）先行发起，本命与天时在其等待网络期间计算；
+    三艘航天器齐备后立即构建解读提示词，再调用模型生成解读。
     """
-    # 加载数据
-    data = load_starships_data()
-    starships = data.get("starships", [])
+    timings = _StageTimings()
+    # 读取共享目录的当前快照（不再逐请求读盘）
+    snapshot = get_catalog().snapshot()
+    starships = snapshot.starships
     
     # 解析日期
     birth_date = parse_date(birth_date_str)
     current_date = datetime.now()
     
-    # 计算三个航天器
-    origin_starship, origin_score = calculate_origin_starship(birth_date, starships)
-    celestial_starship, celestial_score = calculate_celestial_starship(current_date, starships)
-    inquiry_starship, inquiry_score = await calculate_inquiry_starship(question, starships)
+    # 问道星舟可能需要调用模型：先发起，让出一次事件循环使请求真正发出
+    inquiry_task = asyncio.ensure_future(timings.run_async(
+        "inquiry", calculate_inquiry_starship(question, starships, snapshot.version)
+    ))
+    await asyncio.sleep(0)
+    try:
+        # 本命与天时均为本地计算（天时星舟按日缓存，命中即字典查询），与问道重叠
+        origin_starship, origin_score = timings.run("origin", calculate_origin_starship, birth_date, starships)
+        celestial_starship, celestial_score = timings.run("celestial", _get_celestial_cache().get_today)
+        inquiry_starship, inquiry_score = await inquiry_task
+    finally:
+        if not inquiry_task.done():
+            inquiry_task.cancel()
     
+    # 三艘航天器齐备后立即构建提示词
+    prompt = None
+    if origin_starship and celestial_starship and inquiry_starship:
+        prompt = timings.run(
+            "prompt", build_interpretation_user_prompt,
+            origin_starship, celestial_starship, inquiry_starship, question,
+        )
+
     # 生成解读（异步调用LLM）
-    interpretation = await generate_interpretation(
-        origin_starship, celestial_starship, inquiry_starship, question
-    )
+    interpretation = await timings.run_async("interpretation", generate_interpretation(
+        origin_starship, celestial_starship, inquiry_starship, question, prompt=prompt
+    ))
     
-    return {
+    result = {
         "birth_date": birth_date_str,
         "question": question,
         "starships": {
@@ -293,3 +497,6 @@ async def calculate_oracle(
         "calculation_time": current_date.isoformat(),
         "starships_count": len(starships)
     }
+    if debug:
+        result["timings"] = timings.as_dict()
+    return result
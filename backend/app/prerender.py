@@ -0,0 +1,138 @@
+"""
+预渲染响应
+航天器目录按版本只序列化一次：JSON 字节、gzip 与 brotli 压缩变体、强 ETag 全部预先生成；
+请求时按 Accept-Encoding 选择变体，`If-None-Match` 命中直接返回 304，不做任何序列化。
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import threading
+from collections.abc import Mapping
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from fastapi import Request
+from fastapi.responses import Response
+
+try:
+    import brotli  # type: ignore
+except ImportError:  # 可选依赖：未安装时只提供 gzip 变体
+    brotli = None
+
+_MIN_COMPRESS_BYTES = 512
+
+
+def _json_default(obj: Any) -> Any:
+    if isinstance(obj, Mapping):
+        return dict(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def render_json(obj: Any) -> bytes:
+    """与 FastAPI JSONResponse 相同的序列化参数。"""
+    return json.dumps(
+        obj, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":"), default=_json_default
+    ).encode("utf-8")
+
+
+class PrerenderedBody:
+    """一份 JSON 响应体及其压缩变体。"""
+
+    __slots__ = ("variants", "etags")
+
+    def __init__(self, obj: Any):
+        raw = render_json(obj)
+        digest = hashlib.sha256(raw).hexdigest()[:20]
+        variants: Dict[Optional[str], bytes] = {None: raw}
+        if len(raw) >= _MIN_COMPRESS_BYTES:
+            variants["gzip"] = gzip.compress(raw, compresslevel=9, mtime=0)
+            if brotli is not None:
+                variants["br"] = brotli.compress(raw, quality=11)
+        self.variants = variants
+        # 不同内容编码是不同表示，各自使用独立的强 ETag
+        self.etags: Dict[Optional[str], str] = {
+            enc: f'"{digest}{"-" + enc if enc else ""}"' for enc in variants
+        }
+
+
+def _parse_accept_encoding(header: str) -> Dict[str, float]:
+    accepted: Dict[str, float] = {}
+    for part in header.split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[token] = q
+    return accepted
+
+
+def choose_encoding(header: Optional[str], available) -> Optional[str]:
+    """按 Accept-Encoding 的 q 值选出可用的编码；q 相同时 br 优先于 gzip，都不可用则不压缩。"""
+    if not header:
+        return None
+    accepted = _parse_accept_encoding(header)
+    wildcard = accepted.get("*", 0.0)
+    best, best_q = None, 0.0
+    for enc in ("br", "gzip"):
+        q = accepted.get(enc, wildcard)
+        if enc in available and q > best_q:
+            best, best_q = enc, q
+    return best
+
+
+def _etag_matches(if_none_match: Optional[str], etags) -> bool:
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # If-None-Match 使用弱比较：忽略 W/ 前缀
+    candidates = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    return any(tag in candidates for tag in etags)
+
+
+def prerendered_response(request: Request, body: PrerenderedBody, max_age: int) -> Response:
+    encoding = choose_encoding(request.headers.get("accept-encoding"), body.variants)
+    headers = {
+        "ETag": body.etags[encoding],
+        "Cache-Control": f"public, max-age={max_age}",
+        "Vary": "Accept-Encoding",
+    }
+    if _etag_matches(request.headers.get("if-none-match"), body.etags.values()):
+        return Response(status_code=304, headers=headers)
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body.variants[encoding], media_type="application/json", headers=headers)
+
+
+class VersionedRenderCache:
+    """按目录版本缓存预渲染结果；版本变化时整体丢弃旧版本。"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._version: Optional[str] = None
+        self._bodies: Dict[Tuple[str, Any], PrerenderedBody] = {}
+
+    def get(self, version: str, key: Tuple[str, Any], build: Callable[[], Any]) -> PrerenderedBody:
+        if self._version == version:
+            body = self._bodies.get(key)
+            if body is not None:
+                return body
+        body = PrerenderedBody(build())
+        with self._lock:
+            if self._version != version:
+                self._bodies = {}
+                self._version = version
+            self._bodies[key] = body
+        return body
+
+
+def catalog_max_age() -> int:
+    return int(os.getenv("CATALOG_CACHE_MAX_AGE", "60"))
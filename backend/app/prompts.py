@@ -7,7 +7,7 @@ LLM 提示词模块
 - 神谕解读（最终输出，高质量模型与流式）
 """
 
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Sequence
 
 
 # ===== 航天器匹配（选择器） =====
@@ -20,7 +20,7 @@ def selection_system_prompt() -> str:
     )
 
 
-def build_selection_user_prompt(question: str, starships_data: List[Dict]) -> str:
+def build_selection_user_prompt(question: str, starships_data: Sequence[Dict]) -> str:
     """构建用于航天器匹配的用户提示。"""
 
     def _one(s: Dict) -> str:
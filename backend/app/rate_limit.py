@@ -0,0 +1,206 @@
+"""
+按设备与 IP 的令牌桶限流
+挡在会触发模型调用的端点（计算、问道、解读流）之前，防止单个脚本化客户端耗尽上游配额。
+
+每个端点一条规则，设备（`x-device-id` 请求头，或 `device_id` 查询参数）与客户端 IP 各一组令牌桶，
+两者都有令牌才放行，否则直接返回 429 + `Retry-After`，不进入路由。
+桶按最近访问排序：空闲满一个周期的桶必然已回满，与不存在等价，顺手淘汰，内存随活跃客户端数有界。
+
+以纯 ASGI 中间件接入：未命中规则的请求只多一次字典查找；全部状态只在事件循环线程内读写，无需加锁。
+"""
+
+import json
+import logging
+import math
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs
+
+log = logging.getLogger("app.ratelimit")
+
+# 端点规则：名称 -> 匹配的 (方法, 路径)
+ENDPOINTS: Dict[str, Tuple[Tuple[str, str], ...]] = {
+    "calculate": (("POST", "/api/v1/calculate"), ("POST", "/calculate")),
+    "inquiry": (("POST", "/api/v1/divine/inquiry"),),
+    "stream": (("GET", "/api/v1/oracle/stream"),),
+}
+_DEFAULT_DEVICE = "20/60"
+_DEFAULT_IP = "60/60"
+# 设备 ID 由客户端提供，截断后再作为键，避免超长值占用内存
+_MAX_DEVICE_ID = 128
+
+
+def _parse_limit(value: str) -> Optional[Tuple[float, float]]:
+    """`"容量/秒数"`：容量个令牌，空桶经过该秒数回满；`0` 或空表示不限制。"""
+    value = (value or "").strip()
+    if not value or value == "0":
+        return None
+    capacity, _, period = value.partition("/")
+    capacity_f, period_f = float(capacity), float(period or 1)
+    if capacity_f <= 0 or period_f <= 0:
+        return None
+    return capacity_f, period_f
+
+
+class TokenBuckets:
+    """一组按键区分的令牌桶；`max_keys` 为空闲淘汰之外的硬上限。"""
+
+    __slots__ = ("capacity", "period", "rate", "max_keys", "_buckets")
+
+    def __init__(self, capacity: float, period: float, max_keys: int):
+        self.capacity = capacity
+        self.period = period
+        self.rate = capacity / period
+        self.max_keys = max(max_keys, 1)
+        # 键 -> [令牌数, 上次更新时间]，按最近访问排序
+        self._buckets: "OrderedDict[str, List[float]]" = OrderedDict()
+
+    def _bucket(self, key: str, now: float) -> List[float]:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = [self.capacity, now]
+            self._buckets[key] = bucket
+        else:
+            tokens = bucket[0] + (now - bucket[1]) * self.rate
+            bucket[0] = tokens if tokens < self.capacity else self.capacity
+            bucket[1] = now
+            self._buckets.move_to_end(key)
+        return bucket
+
+    def _evict(self, now: float) -> None:
+        buckets = self._buckets
+        while buckets:
+            oldest = next(iter(buckets.values()))
+            if now - oldest[1] < self.period and len(buckets) <= self.max_keys:
+                break
+            buckets.popitem(last=False)
+
+    def wait_time(self, bucket: List[float]) -> float:
+        return 0.0 if bucket[0] >= 1.0 else (1.0 - bucket[0]) / self.rate
+
+    def stats(self) -> Dict[str, float]:
+        return {"capacity": self.capacity, "period": self.period, "keys": len(self._buckets)}
+
+
+class Rule:
+    __slots__ = ("name", "device", "ip", "allowed", "limited")
+
+    def __init__(self, name: str, device: Optional[TokenBuckets], ip: Optional[TokenBuckets]):
+        self.name = name
+        self.device = device
+        self.ip = ip
+        self.allowed = 0
+        self.limited = 0
+
+
+class RateLimiter:
+    def __init__(self, rules: Dict[Tuple[str, str], Rule], trust_forwarded: bool = False):
+        self.rules = rules
+        self.trust_forwarded = trust_forwarded
+
+    @classmethod
+    def from_env(cls) -> "RateLimiter":
+        """每个端点读取 `RATE_LIMIT_<端点>`（按设备）与 `RATE_LIMIT_<端点>_IP`（按 IP），格式 `容量/秒数`。"""
+        if os.getenv("RATE_LIMIT_ENABLED", "1").lower() in ("0", "false", "no"):
+            return cls({})
+        max_keys = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+        rules: Dict[Tuple[str, str], Rule] = {}
+        for name, routes in ENDPOINTS.items():
+            env = f"RATE_LIMIT_{name.upper()}"
+            device = _parse_limit(os.getenv(env, _DEFAULT_DEVICE))
+            ip = _parse_limit(os.getenv(f"{env}_IP", _DEFAULT_IP))
+            if device is None and ip is None:
+                continue
+            rule = Rule(
+                name,
+                TokenBuckets(*device, max_keys) if device else None,
+                TokenBuckets(*ip, max_keys) if ip else None,
+            )
+            for route in routes:
+                rules[route] = rule
+        return cls(rules, trust_forwarded=os.getenv("RATE_LIMIT_TRUST_FORWARDED", "0").lower() in ("1", "true", "yes"))
+
+    def _keys(self, scope) -> Tuple[Optional[str], Optional[str]]:
+        device = forwarded = None
+        for name, value in scope.get("headers") or ():
+            if name == b"x-device-id":
+                device = value.decode("latin-1")
+            elif name == b"x-forwarded-for" and self.trust_forwarded:
+                forwarded = value.decode("latin-1").split(",", 1)[0].strip()
+        if not device and scope.get("query_string"):
+            values = parse_qs(scope["query_string"].decode("latin-1")).get("device_id")
+            device = values[0] if values else None
+        client = scope.get("client")
+        ip = forwarded or (client[0] if client else None)
+        return (device.strip()[:_MAX_DEVICE_ID] or None) if device else None, ip
+
+    def check(self, scope) -> Tuple[Optional[Rule], float]:
+        """返回（命中的规则, 需等待秒数）；等待为 0 表示放行并已扣除令牌。"""
+        rule = self.rules.get((scope["method"], scope["path"]))
+        if rule is None:
+            return None, 0.0
+        device, ip = self._keys(scope)
+        now = time.monotonic()
+        taken = []
+        wait = 0.0
+        for table, key in ((rule.device, device), (rule.ip, ip)):
+            if table is None or key is None:
+                continue
+            bucket = table._bucket(key, now)
+            table._evict(now)
+            wait = max(wait, table.wait_time(bucket))
+            taken.append(bucket)
+        if wait > 0:
+            rule.limited += 1
+            return rule, wait
+        # 两组桶都有令牌时才一起扣除，被拒的请求不消耗另一组的令牌
+        for bucket in taken:
+            bucket[0] -= 1.0
+        rule.allowed += 1
+        return rule, 0.0
+
+    def stats(self) -> Dict:
+        out: Dict = {}
+        for rule in self.rules.values():
+            if rule.name in out:
+                continue
+            out[rule.name] = {
+                "device": rule.device.stats() if rule.device is not None else None,
+                "ip": rule.ip.stats() if rule.ip is not None else None,
+                "allowed": rule.allowed,
+                "limited": rule.limited,
+            }
+        return out
+
+
+class RateLimitMiddleware:
+    """ASGI 中间件：命中规则且令牌不足时直接返回 429。"""
+
+    def __init__(self, app, limiter: RateLimiter):
+        self.app = app
+        self.limiter = limiter
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and self.limiter.rules:
+            rule, wait = self.limiter.check(scope)
+            if wait > 0:
+                retry_after = max(1, math.ceil(wait))
+                log.warning("[ratelimit] limited %s %s rule=%s retry_after=%ss", scope["method"], scope["path"], rule.name, retry_after)
+                body = json.dumps(
+                    {"detail": {"code": "RATE_LIMITED", "message": f"请求过于频繁，请 {retry_after} 秒后重试"}},
+                    ensure_ascii=False,
+                ).encode("utf-8")
+                await send({
+                    "type": "http.response.start",
+                    "status": 429,
+                    "headers": [
+                        (b"content-type", b"application/json"),
+                        (b"content-length", str(len(body)).encode()),
+                        (b"retry-after", str(retry_after).encode()),
+                    ],
+                })
+                await send({"type": "http.response.body", "body": body})
+                return
+        await self.app(scope, receive, send)
@@ -0,0 +1,219 @@
+"""
+问道星舟本地语义索引
+对每艘航天器的 `oracle_keywords`、`oracle_text`、`mission_description` 做字符 n-gram TF-IDF，
+以倒排表（CSR 结构的 NumPy 数组）存储，查询时只累加问题中出现的 n-gram，毫秒级以内完成打分。
+
+索引可离线构建（scripts/build_semantic_index.py 写出 .npz），运行时若文件与当前目录版本一致则直接加载，
+否则在内存中现建。
+"""
+
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+try:
+    from app.text_utils import char_ngrams  # type: ignore
+except ModuleNotFoundError:
+    from text_utils import char_ngrams  # type: ignore
+
+log = logging.getLogger("app.semantic")
+
+# 字段权重：关键词最能代表航天器的“神谕主题”
+FIELD_WEIGHTS: Tuple[Tuple[str, float], ...] = (
+    ("oracle_keywords", 3.0),
+    ("oracle_text", 1.0),
+    ("mission_description", 0.5),
+)
+NGRAM_SIZES: Tuple[int, ...] = (1, 2, 3)
+
+
+def default_index_path() -> Path:
+    env_path = os.getenv("SEMANTIC_INDEX_PATH")
+    if env_path:
+        return Path(env_path)
+    return Path(__file__).resolve().parent.parent / "data" / "semantic_index.npz"
+
+
+def _term_counts(texts: Sequence[str], weight: float, counts: Dict[str, float]) -> None:
+    for text in texts:
+        for gram in char_ngrams(text, NGRAM_SIZES):
+            counts[gram] = counts.get(gram, 0.0) + weight
+
+
+def _document_terms(starship: Dict) -> Dict[str, float]:
+    counts: Dict[str, float] = {}
+    for field, weight in FIELD_WEIGHTS:
+        value = starship.get(field)
+        texts = [str(v) for v in value] if isinstance(value, (list, tuple)) else [str(value or "")]
+        _term_counts(texts, weight, counts)
+    return counts
+
+
+def _sublinear(tf: np.ndarray) -> np.ndarray:
+    return 1.0 + np.log(tf)
+
+
+class SemanticIndex:
+    """字符 n-gram TF-IDF 倒排索引（行已做 L2 归一化，打分即余弦相似度）。"""
+
+    def __init__(
+        self,
+        vocabulary: Sequence[str],
+        idf: np.ndarray,
+        indptr: np.ndarray,
+        doc_ids: np.ndarray,
+        weights: np.ndarray,
+        archive_ids: Sequence[str],
+        version: str = "",
+    ):
+        self.vocabulary = list(vocabulary)
+        self.term_ids: Dict[str, int] = {t: i for i, t in enumerate(self.vocabulary)}
+        self.idf = idf
+        self.indptr = indptr
+        self.doc_ids = doc_ids
+        self.weights = weights
+        self.archive_ids = list(archive_ids)
+        self.version = version
+
+    @property
+    def n_docs(self) -> int:
+        return len(self.archive_ids)
+
+    @classmethod
+    def build(cls, starships_data: Sequence[Dict], version: str = "") -> "SemanticIndex":
+        docs = [_document_terms(s) for s in starships_data]
+        vocabulary = sorted({t for d in docs for t in d})
+        term_ids = {t: i for i, t in enumerate(vocabulary)}
+        n_docs = len(docs)
+
+        rows: List[int] = []
+        cols: List[int] = []
+        tfs: List[float] = []
+        for doc, counts in enumerate(docs):
+            for term, tf in counts.items():
+                rows.append(doc)
+                cols.append(term_ids[term])
+                tfs.append(tf)
+        rows_a = np.asarray(rows, dtype=np.int32)
+        cols_a = np.asarray(cols, dtype=np.int32)
+        tf_a = np.asarray(tfs, dtype=np.float64)
+
+        df = np.bincount(cols_a, minlength=len(vocabulary))
+        idf = np.log((1.0 + n_docs) / (1.0 + df)) + 1.0
+        values = _sublinear(tf_a) * idf[cols_a]
+        norms = np.sqrt(np.bincount(rows_a, weights=values * values, minlength=n_docs))
+        values = values / np.where(norms > 0, norms, 1.0)[rows_a]
+
+        # 按词项排序得到倒排表（CSR）：indptr[t]:indptr[t+1] 为词项 t 的文档与权重
+        order = np.argsort(cols_a, kind="stable")
+        indptr = np.zeros(len(vocabulary) + 1, dtype=np.int64)
+        np.cumsum(df, out=indptr[1:])
+        return cls(
+            vocabulary=vocabulary,
+            idf=idf.astype(np.float32),
+            indptr=indptr,
+            doc_ids=rows_a[order],
+            weights=values[order].astype(np.float32),
+            archive_ids=[str(s.get("archive_id")) for s in starships_data],
+            version=version,
+        )
+
+    def save(self, path: Path) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        np.savez_compressed(
+            path,
+            vocabulary=np.asarray(self.vocabulary, dtype=str),
+            idf=self.idf,
+            indptr=self.indptr,
+            doc_ids=self.doc_ids,
+            weights=self.weights,
+            archive_ids=np.asarray(self.archive_ids, dtype=str),
+            version=np.asarray(self.version),
+        )
+
+    @classmethod
+    def load(cls, path: Path) -> "SemanticIndex":
+        with np.load(path, allow_pickle=False) as f:
+            return cls(
+                vocabulary=f["vocabulary"].tolist(),
+                idf=f["idf"],
+                indptr=f["indptr"],
+                doc_ids=f["doc_ids"],
+                weights=f["weights"],
+                archive_ids=f["archive_ids"].tolist(),
+                version=str(f["version"]),
+            )
+
+    def search(self, question: str, k: int = 5) -> List[Tuple[int, float]]:
+        """返回与问题最相似的前 k 个（数据位置, 余弦相似度），只包含相似度大于 0 的结果。"""
+        counts: Dict[int, float] = {}
+        for gram in char_ngrams(question, NGRAM_SIZES):
+            tid = self.term_ids.get(gram)
+            if tid is not None:
+                counts[tid] = counts.get(tid, 0.0) + 1.0
+        if not counts or self.n_docs == 0:
+            return []
+        terms = np.fromiter(counts.keys(), dtype=np.int64, count=len(counts))
+        q = _sublinear(np.fromiter(counts.values(), dtype=np.float64, count=len(counts))) * self.idf[terms]
+        q /= np.sqrt(np.dot(q, q))
+
+        # 一次性展开所有命中词项的倒排段，用 bincount 累加得分
+        starts = self.indptr[terms]
+        lengths = self.indptr[terms + 1] - starts
+        total = int(lengths.sum())
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(total)
+        scores = np.bincount(
+            self.doc_ids[offsets],
+            weights=self.weights[offsets] * np.repeat(q, lengths),
+            minlength=self.n_docs,
+        )
+
+        k = max(1, min(k, self.n_docs))
+        top = np.argpartition(-scores, k - 1)[:k] if k < self.n_docs else np.arange(self.n_docs)
+        # 分数相同按数据顺序，保证结果稳定
+        top = sorted(top.tolist(), key=lambda i: (-scores[i], i))
+        return [(i, float(scores[i])) for i in top if scores[i] > 0]
+
+
+_index_lock = threading.Lock()
+_index_cache: Optional[Tuple[Sequence[Dict], SemanticIndex]] = None
+
+
+def _matches(index: SemanticIndex, starships_data: Sequence[Dict]) -> bool:
+    return index.archive_ids == [str(s.get("archive_id")) for s in starships_data]
+
+
+def get_semantic_index(starships_data: Sequence[Dict], version: str = "") -> SemanticIndex:
+    """获取数据对应的语义索引：同一份数据只构建/加载一次。
+
+    给出 `version` 时优先加载离线构建的索引文件（版本与航天器顺序一致才使用）。
+    """
+    global _index_cache
+    cached = _index_cache
+    if cached is not None and cached[0] is starships_data:
+        return cached[1]
+    with _index_lock:
+        cached = _index_cache
+        if cached is not None and cached[0] is starships_data:
+            return cached[1]
+        index: Optional[SemanticIndex] = None
+        path = default_index_path()
+        if version and path.exists():
+            try:
+                loaded = SemanticIndex.load(path)
+                if loaded.version == version and _matches(loaded, starships_data):
+                    index = loaded
+                    log.info("[semantic] loaded index from %s version=%s", path, version)
+                else:
+                    log.info("[semantic] index file %s is stale (version=%s), rebuilding", path, loaded.version)
+            except Exception as e:
+                log.error("[semantic] load %s failed: %s", path, e)
+        if index is None:
+            index = SemanticIndex.build(starships_data, version=version)
+            log.info("[semantic] built index docs=%s terms=%s", index.n_docs, len(index.vocabulary))
+        _index_cache = (starships_data, index)
+        return index
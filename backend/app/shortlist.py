@@ -0,0 +1,125 @@
+"""
+问道星舟候选筛选
+在调用快速模型之前，用 `oracle_keywords` 的倒排索引为问题筛出前 K 个候选航天器，
+使选择提示词的长度与目录规模脱钩。K 由 `INQUIRY_SHORTLIST_K` 配置（0 表示不筛选）。
+
+同时统计模型选中的航天器落在候选之外的比例，用于评估 K 是否足够。
+"""
+
+import logging
+import math
+import os
+import threading
+from typing import Dict, List, Optional, Sequence, Tuple
+
+try:
+    from app.text_utils import STOP_WORDS, tokenize  # type: ignore
+except ModuleNotFoundError:
+    from text_utils import STOP_WORDS, tokenize  # type: ignore
+
+log = logging.getLogger("app.shortlist")
+
+
+def shortlist_size() -> int:
+    try:
+        return int(os.getenv("INQUIRY_SHORTLIST_K", "8"))
+    except ValueError:
+        return 8
+
+
+class ShortlistIndex:
+    """`oracle_keywords` 的倒排索引：词元 -> 包含该词元的航天器位置。"""
+
+    def __init__(self, starships_data: Sequence[Dict]):
+        self.starships = starships_data
+        postings: Dict[str, List[int]] = {}
+        for pos, starship in enumerate(starships_data):
+            terms = set()
+            for keyword in starship.get("oracle_keywords", []) or []:
+                terms.update(t for t in tokenize(str(keyword)) if t not in STOP_WORDS)
+            for term in terms:
+                postings.setdefault(term, []).append(pos)
+        n = max(len(starships_data), 1)
+        # 词元权重取 idf：越少见的关键词越有区分度
+        self.postings: Dict[str, Tuple[float, List[int]]] = {
+            term: (math.log((1 + n) / (1 + len(docs))) + 1.0, docs) for term, docs in postings.items()
+        }
+
+    def rank(self, question: str) -> List[Tuple[int, float]]:
+        """返回命中任一关键词词元的（位置, 得分），按得分降序、位置升序。"""
+        scores: Dict[int, float] = {}
+        for term in set(t for t in tokenize(question) if t not in STOP_WORDS):
+            entry = self.postings.get(term)
+            if entry is None:
+                continue
+            weight, docs = entry
+            for pos in docs:
+                scores[pos] = scores.get(pos, 0.0) + weight
+        return sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+
+    def shortlist(self, question: str, k: Optional[int] = None) -> Sequence[Dict]:
+        """筛出命中关键词得分最高的 k 个候选。
+        命中不足 k 个时返回全部目录：不按目录顺序补齐（模型会偏向靠前的条目），也不只给寥寥几个弱命中；
+        目录不超过 k 时原样返回。
+        """
+        if k is None:
+            k = shortlist_size()
+        if k <= 0 or len(self.starships) <= k:
+            return self.starships
+        picked = [pos for pos, _ in self.rank(question)[:k]]
+        if len(picked) < k:
+            return self.starships
+        return [self.starships[pos] for pos in picked]
+
+
+_index_lock = threading.Lock()
+_index_cache: Optional[ShortlistIndex] = None
+
+
+def get_shortlist_index(starships_data: Sequence[Dict]) -> ShortlistIndex:
+    """获取数据对应的候选筛选索引：同一份数据只构建一次。"""
+    global _index_cache
+    cached = _index_cache
+    if cached is not None and cached.starships is starships_data:
+        return cached
+    with _index_lock:
+        cached = _index_cache
+        if cached is None or cached.starships is not starships_data:
+            cached = ShortlistIndex(starships_data)
+            _index_cache = cached
+        return cached
+
+
+# ---- 候选外选中率 ----
+_stats_lock = threading.Lock()
+_stats = {"picks": 0, "outside": 0, "shortlisted": 0}
+
+
+def record_shortlist_pick(selected: Dict, shortlist: Sequence[Dict], catalog_size: int) -> bool:
+    """记录一次模型选择；返回选中项是否在候选内。"""
+    in_shortlist = any(s.get("archive_id") == selected.get("archive_id") for s in shortlist)
+    with _stats_lock:
+        _stats["picks"] += 1
+        if len(shortlist) < catalog_size:
+            _stats["shortlisted"] += 1
+        if not in_shortlist:
+            _stats["outside"] += 1
+        picks, outside = _stats["picks"], _stats["outside"]
+    if not in_shortlist:
+        log.warning(
+            "[shortlist] pick outside shortlist id=%s k=%s outside=%s/%s rate=%.4f",
+            selected.get("archive_id"), len(shortlist), outside, picks, outside / picks,
+        )
+    return in_shortlist
+
+
+def shortlist_stats() -> Dict:
+    with _stats_lock:
+        picks, outside, shortlisted = _stats["picks"], _stats["outside"], _stats["shortlisted"]
+    return {
+        "k": shortlist_size(),
+        "picks": picks,
+        "shortlisted": shortlisted,
+        "outside": outside,
+        "outside_rate": round(outside / picks, 4) if picks else 0.0,
+    }
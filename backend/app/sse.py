@@ -0,0 +1,77 @@
+"""
+SSE 流工具
+事件帧格式化，以及每个 worker 的并发流上限（`SSE_MAX_STREAMS`）。
+流全程是异步生成器，不占用线程池；上限用于约束单个进程同时挂起的上游连接与内存。
+"""
+
+import json
+import os
+import threading
+from typing import Any, Dict, Optional
+
+
+def sse_event(event: str, obj: Dict[str, Any]) -> str:
+    return f"event: {event}\ndata: {json.dumps(obj, ensure_ascii=False)}\n\n"
+
+
+SSE_HEADERS = {
+    "Cache-Control": "no-cache",
+    "Connection": "keep-alive",
+    "X-Accel-Buffering": "no",
+}
+
+
+def max_streams() -> int:
+    return int(os.getenv("SSE_MAX_STREAMS", "1000"))
+
+
+class StreamSlot:
+    """一个已占用的流名额；`release()` 幂等，可在生成器 finally 与响应结束回调中各调一次。"""
+
+    __slots__ = ("_limiter", "_released")
+
+    def __init__(self, limiter: "StreamLimiter"):
+        self._limiter = limiter
+        self._released = False
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self._limiter._release()
+
+
+class StreamLimiter:
+    """进程内并发流计数；`limit <= 0` 表示不限制。"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self._lock = threading.Lock()
+        self.active = 0
+        self.peak = 0
+        self.total = 0
+        self.rejected = 0
+
+    def try_acquire(self) -> Optional[StreamSlot]:
+        with self._lock:
+            if self.limit > 0 and self.active >= self.limit:
+                self.rejected += 1
+                return None
+            self.active += 1
+            self.total += 1
+            if self.active > self.peak:
+                self.peak = self.active
+        return StreamSlot(self)
+
+    def _release(self) -> None:
+        with self._lock:
+            self.active -= 1
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "limit": self.limit,
+                "active": self.active,
+                "peak": self.peak,
+                "total": self.total,
+                "rejected": self.rejected,
+            }
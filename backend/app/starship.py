@@ -0,0 +1,144 @@
+"""
+航天器记录类型
+目录加载时把 starships.json 的每条数据转为紧凑的只读记录（__slots__），并按 archive_id 建立哈希索引。
+
+记录实现了只读 Mapping 接口，现有的 `s["name_cn"]` / `s.get(...)` 写法无需改动；
+JSON 只在响应边界渲染（FastAPI 对 Mapping 会按键值展开，亦可显式调用 `to_dict()`）。
+"""
+
+import sys
+from collections.abc import Mapping, Sequence
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+# 记录的已知字段，顺序即渲染顺序（与 starships.json 一致）
+FIELDS: Tuple[str, ...] = (
+    "archive_id",
+    "name_cn",
+    "name_official",
+    "launch_date",
+    "operator",
+    "mission_description",
+    "status",
+    "oracle_keywords",
+    "oracle_text",
+)
+# 取值高度重复的短字段，驻留后多条记录共享同一字符串对象
+_INTERNED = frozenset({"operator", "status", "launch_date"})
+
+
+class _Missing:
+    __slots__ = ()
+
+    def __repr__(self) -> str:
+        return "<missing>"
+
+
+_MISSING: Any = _Missing()
+
+
+def _intern(value: Any) -> Any:
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class StarshipRecord(Mapping):
+    """单艘航天器的只读记录。缺失字段不会出现在键中，未知字段保存在 `extra`。"""
+
+    __slots__ = FIELDS + ("extra",)
+
+    def __init__(self, **fields: Any):
+        extra = []
+        for key, value in fields.items():
+            if key not in FIELDS:
+                extra.append((key, value))
+        for key in FIELDS:
+            value = fields.get(key, _MISSING)
+            if key == "oracle_keywords" and isinstance(value, list):
+                value = tuple(sys.intern(v) if isinstance(v, str) else v for v in value)
+            elif key in _INTERNED:
+                value = _intern(value)
+            object.__setattr__(self, key, value)
+        object.__setattr__(self, "extra", tuple(extra))
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "StarshipRecord":
+        return cls(**data)
+
+    def __setattr__(self, key: str, value: Any) -> None:
+        raise AttributeError("StarshipRecord is read-only")
+
+    def __delattr__(self, key: str) -> None:
+        raise AttributeError("StarshipRecord is read-only")
+
+    # ---- Mapping 接口 ----
+    def __getitem__(self, key: str) -> Any:
+        if key in FIELDS:
+            value = getattr(self, key)
+            if value is _MISSING:
+                raise KeyError(key)
+            return value
+        for k, v in self.extra:
+            if k == key:
+                return v
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        for key in FIELDS:
+            if getattr(self, key) is not _MISSING:
+                yield key
+        for key, _ in self.extra:
+            yield key
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __hash__(self) -> int:
+        return hash((type(self), self.archive_id))
+
+    def __repr__(self) -> str:
+        return f"StarshipRecord(archive_id={self.archive_id!r}, name_cn={self.name_cn!r})"
+
+    def to_dict(self) -> Dict[str, Any]:
+        """渲染为普通字典（关键词还原为列表），仅在响应边界调用。"""
+        data: Dict[str, Any] = {}
+        for key in self:
+            value = self[key]
+            data[key] = list(value) if key == "oracle_keywords" and isinstance(value, tuple) else value
+        return data
+
+
+class StarshipTable(Sequence):
+    """按目录顺序保存的航天器记录，附带 archive_id -> 记录 的 O(1) 索引。"""
+
+    __slots__ = ("_items", "_by_id")
+
+    def __init__(self, records: Iterable[StarshipRecord]):
+        self._items: Tuple[StarshipRecord, ...] = tuple(records)
+        by_id: Dict[Any, StarshipRecord] = {}
+        for record in self._items:
+            # 重复 ID 保留目录中最靠前的一条，与线性查找的结果一致
+            by_id.setdefault(record.get("archive_id"), record)
+        self._by_id = by_id
+
+    @classmethod
+    def from_dicts(cls, items: Iterable[Dict[str, Any]]) -> "StarshipTable":
+        return cls(StarshipRecord.from_dict(d) for d in items)
+
+    def __getitem__(self, index):
+        return self._items[index]
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def __iter__(self) -> Iterator[StarshipRecord]:
+        return iter(self._items)
+
+    def get_by_id(self, archive_id: Any) -> Optional[StarshipRecord]:
+        return self._by_id.get(archive_id)
+
+
+def find_starship(starships_data: Iterable[Any], archive_id: Any) -> Optional[Any]:
+    """按 archive_id 查找航天器：StarshipTable 走哈希索引，其它序列回退为线性查找。"""
+    getter = getattr(starships_data, "get_by_id", None)
+    if getter is not None:
+        return getter(archive_id)
+    return next((s for s in starships_data if s.get("archive_id") == archive_id), None)
@@ -0,0 +1,58 @@
+"""
+文本处理工具
+供问道星舟的本地匹配使用：统一的文本规范化与字符 n-gram 切分（适用于中文）。
+"""
+
+import re
+import unicodedata
+from typing import List, Tuple
+
+# 连续的“词字符”片段；标点与空白作为 n-gram 的天然边界
+_RUN_RE = re.compile(r"\w+")
+# 中日韩统一表意文字（含扩展 A 与兼容区）
+_CJK_RE = re.compile(r"[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+")
+
+STOP_WORDS = frozenset({'的', '了', '在', '是', '我', '你', '他', '她', '它', '我们', '你们', '他们', '什么', '怎么', '为什么', '如何'})
+
+
+def normalize_text(text: str) -> str:
+    """NFKC 规范化（折叠全角字符）并转小写。"""
+    return unicodedata.normalize("NFKC", text or "").lower()
+
+
+def normalize_question(text: str) -> str:
+    """问题归一化（用作缓存键）：NFKC 折叠全角、转小写，去掉空白、标点与符号。"""
+    folded = normalize_text(text)
+    return "".join(ch for ch in folded if not ch.isspace() and unicodedata.category(ch)[0] not in ("P", "S"))
+
+
+def char_ngrams(text: str, ns: Tuple[int, ...] = (1, 2, 3)) -> List[str]:
+    """把文本切成字符 n-gram；n-gram 不跨越标点与空白。"""
+    grams: List[str] = []
+    for run in _RUN_RE.findall(normalize_text(text)):
+        size = len(run)
+        for n in ns:
+            if n > size:
+                continue
+            grams.extend(run[i:i + n] for i in range(size - n + 1))
+    return grams
+
+
+
+def tokenize(text: str) -> List[str]:
+    """中英文混合分词：中文连续片段切为字符二元组（单字片段保留单字），其余按单词切分。"""
+    tokens: List[str] = []
+    for run in _RUN_RE.findall(normalize_text(text)):
+        pos = 0
+        for m in _CJK_RE.finditer(run):
+            if m.start() > pos:
+                tokens.append(run[pos:m.start()])
+            cjk = m.group()
+            if len(cjk) == 1:
+                tokens.append(cjk)
+            else:
+                tokens.extend(cjk[i:i + 2] for i in range(len(cjk) - 1))
+            pos = m.end()
+        if pos < len(run):
+            tokens.append(run[pos:])
+    return tokens
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+End-to-end load benchmark for the API against a local stub model.
+
+Starts the stub model server (scripts/stub_llm_server.py) and one API worker
+pointed at it via ALIYUN_BAILIAN_BASE_URL, then drives each scenario with a
+closed loop of C concurrent clients for a fixed duration. For every
+(scenario, concurrency) pair it reports latency p50/p95/p99, time to first
+body byte (for the SSE stream: first event byte) and throughput.
+
+Scenarios:
+  calculate  POST /api/v1/calculate
+  origin     POST /api/v1/divine/origin
+  celestial  POST /api/v1/divine/celestial
+  inquiry    POST /api/v1/divine/inquiry
+  stream     GET  /api/v1/oracle/stream
+
+Usage:
+  python backend/scripts/bench_load.py
+  python backend/scripts/bench_load.py --scenarios calculate,stream --concurrency 50,200 --duration 20
+  python backend/scripts/bench_load.py --stub-error-rate 0.05 --json results.json
+  python backend/scripts/bench_load.py --target http://127.0.0.1:8000   # existing server, no subprocesses
+"""
+import argparse, asyncio, json, os, random, subprocess, sys, time
+from datetime import date, timedelta
+from pathlib import Path
+
+import httpx
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+SCRIPTS_DIR = Path(__file__).resolve().parent
+
+SCENARIOS = ('calculate', 'origin', 'celestial', 'inquiry', 'stream')
+QUESTIONS = ('我该换工作吗', '这段感情会有结果吗', '明年适合出国读书吗', '创业的时机到了吗', '如何面对眼前的困难')
+
+
+async def wait_ready(url: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                await client.get(url)
+                return
+            except httpx.HTTPError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError(f'server not ready: {url}')
+
+
+def pct(values, p):
+    if not values:
+        return float('nan')
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+class Payloads:
+    """按序号生成请求：`distinct` 控制不同参数组合的数量（命中缓存与合并的比例）。"""
+
+    def __init__(self, ids, distinct: int, seed: int):
+        rng = random.Random(seed)
+        base = date(1970, 1, 1)
+        self.items = []
+        for i in range(max(distinct, 1)):
+            birth = base + timedelta(days=rng.randrange(0, 365 * 50))
+            question = f'{rng.choice(QUESTIONS)}（{i}）'
+            trio = [rng.choice(ids) for _ in range(3)] if ids else ['001', '002', '003']
+            self.items.append((birth.isoformat(), question, trio))
+
+    def request(self, scenario: str, n: int):
+        birth, question, (origin, celestial, inquiry) = self.items[n % len(self.items)]
+        if scenario == 'calculate':
+            return 'POST', '/api/v1/calculate', {'birth_date': birth, 'question': question}
+        if scenario == 'origin':
+            return 'POST', '/api/v1/divine/origin', {'birth_date': birth}
+        if scenario == 'celestial':
+            return 'POST', '/api/v1/divine/celestial', {'inquiry_date': birth}
+        if scenario == 'inquiry':
+            return 'POST', '/api/v1/divine/inquiry', {'question': question}
+        params = httpx.QueryParams(origin_id=origin, celestial_id=celestial, inquiry_id=inquiry, question=question)
+        return 'GET', f'/api/v1/oracle/stream?{params}', None
+
+
+async def one_request(client: httpx.AsyncClient, method: str, path: str, body, stream: bool):
+    """返回 (状态, 首字节秒数, 总秒数)；流式请求以收到 completed 事件为成功。"""
+    t0 = time.perf_counter()
+    ttfb = None
+    status = None
+    try:
+        async with client.stream(method, path, json=body) as resp:
+            status = resp.status_code
+            tail = b''
+            async for chunk in resp.aiter_bytes():
+                if ttfb is None:
+                    ttfb = time.perf_counter() - t0
+                tail = (tail + chunk)[-256:]
+            if stream and status == 200 and b'event: completed' not in tail:
+                status = 'incomplete'
+    except httpx.HTTPError as e:
+        status = type(e).__name__
+    return status, ttfb, time.perf_counter() - t0
+
+
+async def run_level(base_url: str, scenario: str, concurrency: int, duration: float, payloads: Payloads, counter):
+    limits = httpx.Limits(max_connections=1, max_keepalive_connections=1)
+    timeout = httpx.Timeout(120.0, connect=60.0, pool=None)
+    results = []
+    stop_at = time.perf_counter() + duration
+
+    async def worker():
+        # 每个并发客户端独占一个连接：共享连接池在高并发下的调度开销会让压测端先成为瓶颈
+        async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=timeout) as client:
+            while time.perf_counter() < stop_at:
+                n = next(counter)
+                method, path, body = payloads.request(scenario, n)
+                results.append(await one_request(client, method, path, body, scenario == 'stream'))
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - t0
+
+    ok = [r for r in results if r[0] == 200]
+    latencies = [r[2] for r in ok]
+    ttfbs = [r[1] for r in ok if r[1] is not None]
+    errors = {}
+    for r in results:
+        if r[0] != 200:
+            errors[str(r[0])] = errors.get(str(r[0]), 0) + 1
+    return {
+        'scenario': scenario,
+        'concurrency': concurrency,
+        'requests': len(results),
+        'ok': len(ok),
+        'errors': errors,
+        'wall_s': round(wall, 3),
+        'throughput_rps': round(len(ok) / wall, 2) if wall else 0.0,
+        'latency_ms': {p: round(pct(latencies, q) * 1000, 1) for p, q in (('p50', 50), ('p95', 95), ('p99', 99))},
+        'ttfb_ms': {p: round(pct(ttfbs, q) * 1000, 1) for p, q in (('p50', 50), ('p95', 95), ('p99', 99))},
+    }
+
+
+def print_row(r):
+    lat, ttfb = r['latency_ms'], r['ttfb_ms']
+    print(f"{r['scenario']:<10} c={r['concurrency']:<5} n={r['requests']:<6} ok={r['ok']:<6} "
+          f"rps={r['throughput_rps']:<8} "
+          f"lat p50/p95/p99={lat['p50']:.0f}/{lat['p95']:.0f}/{lat['p99']:.0f}ms "
+          f"ttfb p50/p95/p99={ttfb['p50']:.0f}/{ttfb['p95']:.0f}/{ttfb['p99']:.0f}ms"
+          + (f" errors={r['errors']}" if r['errors'] else ''), flush=True)
+
+
+async def run(args, base_url: str):
+    await wait_ready(f'{base_url}/api/v1/health')
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        resp = await client.get('/api/v1/starships')
+        ids = [s['archive_id'] for s in resp.json()['data']['starships']]
+    payloads = Payloads(ids, args.distinct, args.seed)
+    counter = iter(range(1 << 62))
+    results = []
+    for scenario in args.scenarios:
+        for concurrency in args.concurrency:
+            if args.warmup > 0:
+                await run_level(base_url, scenario, concurrency, args.warmup, payloads, counter)
+            result = await run_level(base_url, scenario, concurrency, args.duration, payloads, counter)
+            print_row(result)
+            results.append(result)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump({'args': {k: v for k, v in vars(args).items() if k != 'json'}, 'results': results},
+                      f, ensure_ascii=False, indent=2)
+        print(f'wrote {args.json}')
+
+
+def csv_list(value: str):
+    return [v.strip() for v in value.split(',') if v.strip()]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--scenarios', type=csv_list, default=list(SCENARIOS), help=f'comma separated: {",".join(SCENARIOS)}')
+    ap.add_argument('--concurrency', type=lambda v: [int(x) for x in csv_list(v)], default=[10, 50, 100])
+    ap.add_argument('--duration', type=float, default=10.0, help='seconds per (scenario, concurrency)')
+    ap.add_argument('--warmup', type=float, default=1.0, help='unmeasured seconds before each level')
+    ap.add_argument('--distinct', type=int, default=100, help='number of distinct request payloads')
+    ap.add_argument('--seed', type=int, default=1)
+    ap.add_argument('--json', help='write results to this file')
+    ap.add_argument('--target', help='benchmark an already running API instead of starting one')
+    ap.add_argument('--port', type=int, default=18000, help='API worker port')
+    ap.add_argument('--stub-port', type=int, default=18001)
+    ap.add_argument('--stub-latency', type=float, default=0.3)
+    ap.add_argument('--stub-tokens-per-sec', type=float, default=50.0)
+    ap.add_argument('--stub-chunks', type=int, default=20)
+    ap.add_argument('--stub-error-rate', type=float, default=0.0)
+    args = ap.parse_args()
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        ap.error(f'unknown scenarios: {",".join(sorted(unknown))}')
+
+    if args.target:
+        asyncio.run(run(args, args.target.rstrip('/')))
+        return
+
+    env = dict(os.environ)
+    env.setdefault('ALIYUN_BAILIAN_API_KEY', 'bench')
+    # 三个进程共用本机 CPU，建连排队可能超过默认的 5s 连接超时
+    env.setdefault('LLM_CONNECT_TIMEOUT', '30')
+    env.setdefault('RATE_LIMIT_ENABLED', '0')  # 压测客户端都来自同一 IP
+    env['ALIYUN_BAILIAN_BASE_URL'] = f'http://127.0.0.1:{args.stub_port}/v1'
+    stub = subprocess.Popen([
+        sys.executable, str(SCRIPTS_DIR / 'stub_llm_server.py'), '--port', str(args.stub_port),
+        '--latency', str(args.stub_latency), '--tokens-per-sec', str(args.stub_tokens_per_sec),
+        '--chunks', str(args.stub_chunks), '--error-rate', str(args.stub_error_rate), '--seed', str(args.seed),
+    ], env=env)
+    server = subprocess.Popen([
+        sys.executable, '-m', 'uvicorn', 'app.main:app', '--host', '127.0.0.1', '--port', str(args.port),
+        '--log-level', 'warning', '--backlog', '4096',
+    ], cwd=str(BACKEND_DIR), env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        asyncio.run(run(args, f'http://127.0.0.1:{args.port}'))
+    finally:
+        for proc in (server, stub):
+            proc.terminate()
+        for proc in (server, stub):
+            proc.wait(timeout=10)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+Microbenchmarks for the pure-Python hot paths of the oracle algorithm and
+prompt builders, run against synthetic catalogs (scripts/gen_synthetic_catalog.py).
+
+Each case is timed with timeit's autorange (at least 0.2s per sample) and
+reported as the best and median time per call over --repeat samples.
+--save writes the results as a baseline. --compare checks them against a
+stored baseline and exits non-zero when a case is more than --threshold
+times slower.
+
+Usage:
+  python backend/scripts/bench_oracle.py
+  python backend/scripts/bench_oracle.py --sizes 24,1000 --compare scripts/baselines/bench_oracle.json
+  python backend/scripts/bench_oracle.py --save scripts/baselines/bench_oracle.json
+"""
+import argparse, json, platform, statistics, sys, timeit
+from datetime import datetime
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from app.oracle_algorithm import (  # noqa: E402
+    LaunchIndex,
+    _fallback_keyword_matching,
+    calculate_celestial_starship,
+    calculate_origin_starship,
+    preprocess_text,
+)
+from app.prompts import build_interpretation_user_prompt, build_selection_user_prompt  # noqa: E402
+from app.starship import StarshipTable  # noqa: E402
+from gen_synthetic_catalog import generate_catalog  # noqa: E402
+
+SIZES = (24, 1000, 10000, 100000)
+QUESTION = '我明年适合换一份需要勇气和突破的新工作吗？'
+BIRTH = datetime(1990, 5, 17)
+NOW = datetime(2025, 9, 13)
+
+
+def cases(starships):
+    """（名称, 无参可调用对象）；依赖目录规模的用例在每个规模下各跑一次。"""
+    index = LaunchIndex(starships)
+    trio = (starships[0], starships[len(starships) // 2], starships[-1])
+    return [
+        ('LaunchIndex', lambda: LaunchIndex(starships)),
+        ('calculate_origin_starship', lambda: calculate_origin_starship(BIRTH, starships, index)),
+        ('calculate_celestial_starship', lambda: calculate_celestial_starship(NOW, starships, index)),
+        ('_fallback_keyword_matching', lambda: _fallback_keyword_matching(QUESTION, starships)),
+        ('preprocess_text', lambda: preprocess_text(QUESTION)),
+        ('build_selection_user_prompt', lambda: build_selection_user_prompt(QUESTION, starships)),
+        ('build_interpretation_user_prompt', lambda: build_interpretation_user_prompt(*trio, QUESTION, '测试')),
+    ]
+
+
+def measure(fn, repeat: int):
+    timer = timeit.Timer(fn)
+    # autorange 选出单次采样不少于 0.2s 的循环次数，极快的用例也不会被计时精度淹没
+    number, _ = timer.autorange()
+    samples = [t / number for t in timer.repeat(repeat=repeat, number=number)]
+    return {'best_us': round(min(samples) * 1e6, 3), 'median_us': round(statistics.median(samples) * 1e6, 3), 'loops': number}
+
+
+def run(sizes, repeat: int, only):
+    results = {}
+    for size in sizes:
+        starships = StarshipTable.from_dicts(generate_catalog(size, seed=size)['starships'])
+        for name, fn in cases(starships):
+            if only and name not in only:
+                continue
+            key = f'{name}[{size}]'
+            results[key] = measure(fn, repeat)
+            r = results[key]
+            print(f'{key:<44} best={r["best_us"]:>14.3f}us median={r["median_us"]:>14.3f}us loops={r["loops"]}', flush=True)
+    return results
+
+
+def compare(results, baseline_path: str, threshold: float) -> int:
+    with open(baseline_path, encoding='utf-8') as f:
+        baseline = json.load(f)['results']
+    regressions = 0
+    print(f'\ncompared with {baseline_path} (threshold {threshold:.2f}x, by best time)')
+    for key, r in results.items():
+        base = baseline.get(key)
+        if base is None:
+            print(f'{key:<44} (no baseline)')
+            continue
+        ratio = r['best_us'] / base['best_us'] if base['best_us'] else float('inf')
+        flag = 'REGRESSION' if ratio > threshold else ''
+        regressions += bool(flag)
+        print(f'{key:<44} {base["best_us"]:>14.3f}us -> {r["best_us"]:>14.3f}us  {ratio:6.2f}x {flag}')
+    return regressions
+
+
+def csv_list(value: str):
+    return [v.strip() for v in value.split(',') if v.strip()]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--sizes', type=lambda v: [int(x) for x in csv_list(v)], default=list(SIZES))
+    ap.add_argument('--repeat', type=int, default=5)
+    ap.add_argument('--only', type=csv_list, default=[], help='comma separated case names')
+    ap.add_argument('--save', help='write results as a baseline file')
+    ap.add_argument('--compare', help='baseline file to compare against')
+    ap.add_argument('--threshold', type=float, default=1.5, help='slowdown ratio reported as a regression')
+    args = ap.parse_args()
+
+    results = run(args.sizes, args.repeat, set(args.only))
+    if args.save:
+        meta = {
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'platform': platform.platform(),
+            'date': datetime.now().date().isoformat(),
+        }
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump({'meta': meta, 'results': results}, f, ensure_ascii=False, indent=2)
+            f.write('\n')
+        print(f'wrote {args.save}')
+    if args.compare and compare(results, args.compare, args.threshold):
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
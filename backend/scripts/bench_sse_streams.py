@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Benchmark concurrent /api/v1/oracle/stream SSE streams against a local stub model.
+
+Starts the stub model server and one API worker as subprocesses, opens N
+concurrent streams, and reports time-to-first-event, stream durations,
+throughput and the worker's peak RSS.
+
+Usage:
+  python backend/scripts/bench_sse_streams.py --streams 1000
+  python backend/scripts/bench_sse_streams.py --streams 2000 --chunks 40 --latency 0.5
+"""
+import argparse, asyncio, os, statistics, subprocess, sys, time
+from pathlib import Path
+
+import httpx
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+SCRIPTS_DIR = Path(__file__).resolve().parent
+
+
+
+def rss_kb(pid: int) -> int:
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return 0
+
+
+async def wait_ready(url: str, timeout: float = 30.0):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                await client.get(url)
+                return
+            except httpx.HTTPError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError(f'server not ready: {url}')
+
+
+async def one_stream(client: httpx.AsyncClient, url: str, results: list):
+    t0 = time.perf_counter()
+    ttfb = None
+    events = 0
+    status = None
+    try:
+        async with client.stream('GET', url) as resp:
+            status = resp.status_code
+            async for line in resp.aiter_lines():
+                if line.startswith('event:'):
+                    if ttfb is None:
+                        ttfb = time.perf_counter() - t0
+                    events += 1
+    except httpx.HTTPError as e:
+        status = type(e).__name__
+    results.append((status, ttfb, time.perf_counter() - t0, events))
+
+
+def pct(values, p):
+    if not values:
+        return float('nan')
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+async def run(args):
+    url = f'http://127.0.0.1:{args.port}/api/v1/oracle/stream?origin_id=001&celestial_id=002&inquiry_id=003&question=bench'
+    await wait_ready(f'http://127.0.0.1:{args.port}/api/v1/health')
+
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=None)
+    timeout = httpx.Timeout(120.0, connect=60.0, pool=None)
+    results: list = []
+    peak_rss = 0
+    idle_rss = rss_kb(args.server_pid)
+
+    async def sample():
+        nonlocal peak_rss
+        while True:
+            peak_rss = max(peak_rss, rss_kb(args.server_pid))
+            await asyncio.sleep(0.05)
+
+    sampler = asyncio.create_task(sample())
+    async with httpx.AsyncClient(limits=limits, timeout=timeout) as client:
+        t0 = time.perf_counter()
+        await asyncio.gather(*(one_stream(client, url, results) for _ in range(args.streams)))
+        wall = time.perf_counter() - t0
+    sampler.cancel()
+
+    ok = [r for r in results if r[0] == 200 and r[3] > 1]
+    ttfbs = [r[1] for r in ok if r[1] is not None]
+    durations = [r[2] for r in ok]
+    events = sum(r[3] for r in ok)
+    others = {}
+    for r in results:
+        if r not in ok:
+            others[r[0]] = others.get(r[0], 0) + 1
+
+    print(f'streams={args.streams} ok={len(ok)} other={others or 0} wall={wall:.2f}s')
+    print(f'first event  p50={pct(ttfbs, 50) * 1000:.0f}ms p95={pct(ttfbs, 95) * 1000:.0f}ms p99={pct(ttfbs, 99) * 1000:.0f}ms')
+    print(f'duration     p50={pct(durations, 50):.2f}s p95={pct(durations, 95):.2f}s max={max(durations, default=0):.2f}s'
+          f' mean={statistics.mean(durations) if durations else 0:.2f}s')
+    print(f'throughput   {len(ok) / wall:.1f} streams/s, {events / wall:.0f} events/s')
+    print(f'worker RSS   idle={idle_rss / 1024:.1f}MiB peak={peak_rss / 1024:.1f}MiB '
+          f'(+{(peak_rss - idle_rss) / max(len(ok), 1):.1f}KiB/stream)')
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--streams', type=int, default=1000)
+    ap.add_argument('--port', type=int, default=18000, help='API worker port')
+    ap.add_argument('--stub-port', type=int, default=18001)
+    ap.add_argument('--latency', type=float, default=0.3, help='stub time to first byte (s)')
+    ap.add_argument('--chunks', type=int, default=20)
+    ap.add_argument('--chunk-interval', type=float, default=0.05)
+    args = ap.parse_args()
+
+    env = dict(os.environ)
+    env.setdefault('ALIYUN_BAILIAN_API_KEY', 'bench')
+    env.setdefault('SSE_MAX_STREAMS', str(args.streams))
+    env.setdefault('LLM_MAX_CONNECTIONS', str(args.streams))
+    env.setdefault('LLM_MAX_KEEPALIVE', str(args.streams))
+    env.setdefault('LLM_MAIN_CONCURRENCY', str(args.streams))
+    # 三个进程共用本机 CPU，建连排队可能超过默认的 5s 连接超时
+    env.setdefault('LLM_CONNECT_TIMEOUT', '30')
+    env.setdefault('RATE_LIMIT_ENABLED', '0')  # 压测客户端都来自同一 IP
+    env['ALIYUN_BAILIAN_BASE_URL'] = f'http://127.0.0.1:{args.stub_port}/v1'
+
+    stub = subprocess.Popen([
+        sys.executable, str(SCRIPTS_DIR / 'stub_llm_server.py'), '--port', str(args.stub_port),
+        '--latency', str(args.latency), '--chunks', str(args.chunks), '--chunk-interval', str(args.chunk_interval),
+    ], env=env)
+    server = subprocess.Popen([
+        sys.executable, '-m', 'uvicorn', 'app.main:app', '--host', '127.0.0.1', '--port', str(args.port),
+        '--log-level', 'warning', '--backlog', '4096',
+    ], cwd=str(BACKEND_DIR), env=env)
+    args.server_pid = server.pid
+    try:
+        asyncio.run(run(args))
+    finally:
+        for proc in (server, stub):
+            proc.terminate()
+        for proc in (server, stub):
+            proc.wait(timeout=10)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+Build the local semantic index used by INQUIRY_MATCHER=semantic.
+
+Reads the current starships.json (same resolution rules as the server), builds
+the character n-gram TF-IDF index and writes it as a compressed .npz that the
+server loads at startup when its catalog version matches.
+
+Usage:
+  python backend/scripts/build_semantic_index.py                  # -> backend/data/semantic_index.npz
+  python backend/scripts/build_semantic_index.py --out /tmp/idx.npz
+  python backend/scripts/build_semantic_index.py --query "什么时候加薪"
+"""
+import argparse, sys, time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from app.catalog import get_catalog  # noqa: E402
+from app.semantic_index import SemanticIndex, default_index_path  # noqa: E402
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--out', type=Path, default=None, help='output path (default: SEMANTIC_INDEX_PATH or backend/data/semantic_index.npz)')
+    ap.add_argument('--query', default=None, help='print top candidates for a sample question after building')
+    ap.add_argument('--top-k', type=int, default=5)
+    args = ap.parse_args()
+
+    snap = get_catalog().snapshot()
+    t0 = time.perf_counter()
+    index = SemanticIndex.build(snap.starships, version=snap.version)
+    build_ms = (time.perf_counter() - t0) * 1000
+    out = args.out or default_index_path()
+    index.save(out)
+    print(f'built index: docs={index.n_docs} terms={len(index.vocabulary)} postings={len(index.doc_ids)} '
+          f'version={index.version} in {build_ms:.1f}ms -> {out}')
+
+    if args.query:
+        t0 = time.perf_counter()
+        hits = index.search(args.query, args.top_k)
+        search_us = (time.perf_counter() - t0) * 1e6
+        for pos, score in hits:
+            s = snap.starships[pos]
+            print(f"  {s.get('archive_id')}  {score:.4f}  {s.get('name_cn')}")
+        print(f'search took {search_us:.0f}us')
+
+if __name__ == '__main__':
+    main()
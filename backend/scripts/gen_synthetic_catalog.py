@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""
+Generate synthetic starship catalogs for benchmarks.
+
+Records have the same shape as data/starships.json. Text fields and keywords
+are drawn from the real catalog, launch dates are spread uniformly from
+1957-10-04 to 2030-12-31, and archive_ids are unique. The output is
+deterministic for a given size and seed.
+
+Usage:
+  python backend/scripts/gen_synthetic_catalog.py --size 10000 --out /tmp/starships_10k.json
+  STARSHIPS_JSON=/tmp/starships_10k.json uvicorn app.main:app    # serve a synthetic catalog
+"""
+import argparse, json, random
+from datetime import date, timedelta
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+SOURCE = BACKEND_DIR / 'data' / 'starships.json'
+
+FIRST_LAUNCH = date(1957, 10, 4)
+LAST_LAUNCH = date(2030, 12, 31)
+
+
+def load_templates(path: Path = SOURCE):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)['starships']
+
+
+def generate_catalog(size: int, seed: int = 0, templates=None):
+    """返回 `{"total": size, "starships": [...]}`，结构与 starships.json 相同。"""
+    templates = templates or load_templates()
+    rng = random.Random(seed)
+    vocabulary = sorted({kw for t in templates for kw in t.get('oracle_keywords', [])})
+    span = (LAST_LAUNCH - FIRST_LAUNCH).days
+    width = max(3, len(str(size)))
+    starships = []
+    for i in range(1, size + 1):
+        t = templates[(i - 1) % len(templates)] if i <= len(templates) else rng.choice(templates)
+        suffix = '' if i <= len(templates) else f'-{i}'
+        launch = FIRST_LAUNCH + timedelta(days=rng.randrange(span + 1))
+        starships.append({
+            'archive_id': str(i).zfill(width),
+            'name_cn': f"{t['name_cn']}{suffix}",
+            'name_official': f"{t['name_official']}{suffix}",
+            'launch_date': launch.isoformat(),
+            'operator': t['operator'],
+            'mission_description': t['mission_description'],
+            'status': t['status'],
+            'oracle_keywords': rng.sample(vocabulary, k=min(len(vocabulary), rng.randint(4, 9))),
+            'oracle_text': t['oracle_text'],
+        })
+    return {'total': size, 'starships': starships}
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--size', type=int, required=True)
+    ap.add_argument('--seed', type=int, default=0)
+    ap.add_argument('--out', required=True)
+    args = ap.parse_args()
+    catalog = generate_catalog(args.size, args.seed)
+    with open(args.out, 'w', encoding='utf-8') as f:
+        json.dump(catalog, f, ensure_ascii=False)
+    print(f'wrote {args.size} starships to {args.out}')
+
+if __name__ == '__main__':
+    main()
@@ -7,22 +7,135 @@ Algorithm:
   - Compute check digit = HMAC_SHA256(base, ACTIVATION_SECRET) % 10
   - Final code = base + check
 
+Bulk mode (--bulk) guarantees unique codes: issued bases are tracked in a
+bitmap over the whole base space (10^base_length bits, 12.5 KiB for 5 digits)
+and redrawn on collision. Bases already issued in --exclude files are skipped.
+With --format bitmap the output is that bitmap in a compact binary file:
+
+  magic b'ACB1' | base_length u8 | count u32 BE | secret fingerprint 4 bytes | bitmap
+
+Bit i (LSB first within each byte) set means base i (zero padded) was issued.
+The check digits are not stored; they follow from the secret, and the
+fingerprint catches a file paired with the wrong secret.
+
 Usage examples:
-  - Generate 1000 codes, default length 6: 
+  - Generate 1000 codes, default length 6:
       ACTIVATION_SECRET=... python backend/scripts/generate_activation_code.py --count 1000 > codes.txt
   - Generate 5-digit codes (4 base + 1 check):
       ACTIVATION_SECRET=... python backend/scripts/generate_activation_code.py --count 1000 --base-length 4
+  - Generate 50000 unique codes not overlapping earlier batches, as a bitmap file:
+      ACTIVATION_SECRET=... python backend/scripts/generate_activation_code.py --bulk --count 50000 \\
+          --exclude codes.txt --format bitmap --out batch2.acb
 """
-import os, hmac, hashlib, secrets, argparse
+import os, hmac, hashlib, secrets, argparse, struct, sys
+
+MAGIC = b'ACB1'
+_HEADER = struct.Struct('>4sBI4s')
+
 
 def checksum(base: str, secret: str) -> int:
     mac = hmac.new(secret.encode('utf-8'), base.encode('utf-8'), hashlib.sha256).digest()
     return int.from_bytes(mac[:4], 'big') % 10
 
+
+def secret_fingerprint(secret: str) -> bytes:
+    return hmac.new(secret.encode('utf-8'), b'activation-code-bitmap', hashlib.sha256).digest()[:4]
+
+
+def make_code(base: int, base_length: int, secret: str) -> str:
+    b = str(base).zfill(base_length)
+    return f"{b}{checksum(b, secret)}"
+
+
+class BaseBitmap:
+    """base 空间上的位图：第 i 位表示 base i 已发放。"""
+
+    def __init__(self, base_length: int, bits: bytearray = None):
+        self.base_length = base_length
+        self.space = 10 ** base_length
+        self.bits = bits if bits is not None else bytearray((self.space + 7) // 8)
+
+    def __contains__(self, base: int) -> bool:
+        return bool(self.bits[base >> 3] & (1 << (base & 7)))
+
+    def add(self, base: int) -> None:
+        self.bits[base >> 3] |= 1 << (base & 7)
+
+    def __iter__(self):
+        for i, byte in enumerate(self.bits):
+            if byte:
+                for j in range(8):
+                    if byte & (1 << j):
+                        yield (i << 3) | j
+
+    def __len__(self) -> int:
+        return sum(bin(byte).count('1') for byte in self.bits)
+
+    def dump(self, secret: str) -> bytes:
+        return _HEADER.pack(MAGIC, self.base_length, len(self), secret_fingerprint(secret)) + bytes(self.bits)
+
+
+def read_bitmap(data: bytes, secret: str) -> BaseBitmap:
+    magic, base_length, count, fingerprint = _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError('not an activation code bitmap file')
+    if not 3 <= base_length <= 5:
+        raise ValueError(f'unsupported base length {base_length}')
+    bitmap = BaseBitmap(base_length, bytearray(data[_HEADER.size:]))
+    if len(bitmap.bits) != (bitmap.space + 7) // 8:
+        raise ValueError('bitmap size does not match base length')
+    if fingerprint != secret_fingerprint(secret):
+        raise ValueError('bitmap was generated with a different ACTIVATION_SECRET')
+    if len(bitmap) != count:
+        raise ValueError(f'bitmap holds {len(bitmap)} codes, header says {count}')
+    return bitmap
+
+
+def read_codes(path: str, secret: str):
+    """读取文本（每行一个码）或位图文件，返回码列表。"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if data.startswith(MAGIC):
+        bitmap = read_bitmap(data, secret)
+        return [make_code(base, bitmap.base_length, secret) for base in bitmap]
+    return [line.strip() for line in data.decode('utf-8').splitlines() if line.strip()]
+
+
+def generate_unique(count: int, base_length: int, secret: str, exclude=()) -> BaseBitmap:
+    issued = BaseBitmap(base_length)
+    taken = BaseBitmap(base_length)
+    for code in exclude:
+        if len(code) == base_length + 1 and code.isdigit():
+            taken.add(int(code[:-1]))
+    available = issued.space - len(taken)
+    if count > available:
+        raise SystemExit(f'only {available} unused {base_length}-digit bases left, cannot issue {count}')
+    if count > available // 2:
+        # 接近占满时拒绝采样会反复碰撞：改为对剩余 base 洗牌后取前 count 个
+        rest = [b for b in range(issued.space) if b not in taken]
+        for i in range(count):
+            j = i + secrets.randbelow(len(rest) - i)
+            rest[i], rest[j] = rest[j], rest[i]
+            issued.add(rest[i])
+        return issued
+    n = 0
+    while n < count:
+        base = secrets.randbelow(issued.space)
+        if base in taken or base in issued:
+            continue
+        issued.add(base)
+        n += 1
+    return issued
+
+
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument('--count', type=int, default=1000)
     ap.add_argument('--base-length', type=int, default=5, help='digits before the check digit (range: 3-5)')
+    ap.add_argument('--bulk', action='store_true', help='guarantee unique codes (bitmap over the base space)')
+    ap.add_argument('--exclude', action='append', default=[], help='previously issued codes (text or bitmap) to skip; repeatable')
+    ap.add_argument('--format', choices=('text', 'bitmap'), default='text', help='bulk output format')
+    ap.add_argument('--out', help='output file (default: stdout, text only)')
     args = ap.parse_args()
 
     secret = os.getenv('ACTIVATION_SECRET')
@@ -30,12 +143,33 @@ def main():
         raise SystemExit('Set ACTIVATION_SECRET environment variable')
 
     bl = max(3, min(5, args.base_length))
-    out = []
-    for _ in range(args.count):
-        base = ''.join(str(secrets.randbelow(10)) for _ in range(bl))
-        code = f"{base}{checksum(base, secret)}"
-        out.append(code)
-    print('\n'.join(out))
+    if not args.bulk:
+        if args.format != 'text' or args.exclude:
+            raise SystemExit('--format bitmap and --exclude require --bulk')
+        out = []
+        for _ in range(args.count):
+            base = ''.join(str(secrets.randbelow(10)) for _ in range(bl))
+            code = f"{base}{checksum(base, secret)}"
+            out.append(code)
+        print('\n'.join(out))
+        return
+
+    exclude = [code for path in args.exclude for code in read_codes(path, secret)]
+    issued = generate_unique(args.count, bl, secret, exclude)
+    if args.format == 'bitmap':
+        if not args.out:
+            raise SystemExit('--format bitmap requires --out')
+        with open(args.out, 'wb') as f:
+            f.write(issued.dump(secret))
+    else:
+        text = '\n'.join(make_code(base, bl, secret) for base in issued) + '\n'
+        if args.out:
+            with open(args.out, 'w', encoding='utf-8') as f:
+                f.write(text)
+        else:
+            sys.stdout.write(text)
+    if args.out:
+        print(f'wrote {args.count} unique codes to {args.out}', file=sys.stderr)
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Bulk-verify issued activation codes and preload them into the activation store.
+
+Reads text files (one code per line) or bitmap files written by
+generate_activation_code.py --format bitmap. Every code is checked for format
+(4-6 digits) and check digit against ACTIVATION_SECRET, and duplicates across
+the inputs are reported. Valid codes are then inserted with uses=0, so the
+store knows every issued code before its first activation. Codes already in
+the store are left untouched, which makes the import safe to re-run.
+
+Nothing is imported when any code is invalid, unless --skip-invalid is given.
+
+Usage:
+  ACTIVATION_SECRET=... python backend/scripts/import_activation_codes.py codes.txt batch2.acb
+  ACTIVATION_SECRET=... python backend/scripts/import_activation_codes.py --verify-only codes.txt
+  ACTIVATION_SECRET=... ACTIVATION_DB=/data/activations.db python backend/scripts/import_activation_codes.py codes.txt
+"""
+import argparse, os, sys, time
+from collections import Counter
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from app.activation_store import ActivationStore, activation_db_path  # noqa: E402
+from generate_activation_code import checksum, read_codes  # noqa: E402
+
+
+def is_valid(code: str, secret: str) -> bool:
+    """与 main._act_verify 相同的规则：4-6 位数字，末位为前面各位的校验位。"""
+    if not code.isdigit() or not 4 <= len(code) <= 6:
+        return False
+    return str(checksum(code[:-1], secret)) == code[-1]
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('files', nargs='+', help='text or bitmap code files')
+    ap.add_argument('--verify-only', action='store_true', help='check the codes without importing')
+    ap.add_argument('--skip-invalid', action='store_true', help='import the valid codes even if some are invalid')
+    ap.add_argument('--db', help='activation database (default: ACTIVATION_DB or app/data/activations.db)')
+    args = ap.parse_args()
+
+    secret = os.getenv('ACTIVATION_SECRET')
+    if not secret:
+        raise SystemExit('Set ACTIVATION_SECRET environment variable')
+
+    t0 = time.perf_counter()
+    seen = Counter()
+    invalid = []
+    for path in args.files:
+        try:
+            codes = read_codes(path, secret)
+        except ValueError as e:
+            raise SystemExit(f'{path}: {e}')
+        for code in codes:
+            if is_valid(code, secret):
+                seen[code] += 1
+            else:
+                invalid.append(code)
+    duplicates = sum(n - 1 for n in seen.values() if n > 1)
+    print(f'checked {sum(seen.values()) + len(invalid)} codes in {time.perf_counter() - t0:.2f}s: '
+          f'valid={len(seen)} invalid={len(invalid)} duplicates={duplicates}')
+    if invalid:
+        print(f'invalid codes (first 10): {invalid[:10]}')
+    if args.verify_only:
+        sys.exit(1 if invalid else 0)
+    if invalid and not args.skip_invalid:
+        raise SystemExit('refusing to import: fix the invalid codes or pass --skip-invalid')
+
+    store = ActivationStore(Path(args.db) if args.db else activation_db_path())
+    t0 = time.perf_counter()
+    added = store.preload(sorted(seen))
+    print(f'preloaded {added} new codes into {store.path} in {time.perf_counter() - t0:.2f}s '
+          f'({len(seen) - added} already present); store: {store.stats()}')
+
+if __name__ == '__main__':
+    main()
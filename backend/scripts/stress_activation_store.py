@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Concurrency stress test for the activation store.
+
+Runs P processes x T threads, each recording K activations on codes chosen at
+random from a small pool, against a fresh temporary database. Every worker
+counts its own successful calls. The test passes when the per-code `uses` in
+the store equal those counts exactly, i.e. no increments were lost.
+
+--legacy runs the same workload against the old read-modify-write JSON file
+(whole file parsed and rewritten per activation) for comparison.
+
+Usage:
+  python backend/scripts/stress_activation_store.py
+  python backend/scripts/stress_activation_store.py --processes 8 --threads 16 --ops 500 --codes 10
+  python backend/scripts/stress_activation_store.py --legacy
+"""
+import argparse, json, random, sqlite3, sys, tempfile, threading, time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BACKEND_DIR))
+
+from app.activation_store import ActivationStore  # noqa: E402
+
+
+def legacy_record_use(path: Path, code: str, device_id: str) -> None:
+    """旧版 main.api_activate 的读-改-写流程（读全文件、改一条、整体重写）。"""
+    try:
+        store = json.loads(path.read_text(encoding='utf-8')) if path.exists() else {}
+    except ValueError:
+        store = {}
+    rec = store.get(code)
+    if rec:
+        rec['uses'] = int(rec.get('uses', 1)) + 1
+        rec['device_id'] = device_id
+    else:
+        store[code] = {'device_id': device_id, 'uses': 1}
+    path.write_text(json.dumps(store, ensure_ascii=False, indent=2), encoding='utf-8')
+
+
+def worker(path: str, legacy: bool, threads: int, ops: int, codes, seed: int):
+    counts = Counter()
+    errors = Counter()
+    lock = threading.Lock()
+    store = None if legacy else ActivationStore(Path(path))
+
+    def run(tid: int):
+        rng = random.Random(seed * 1000 + tid)
+        local, failed = Counter(), Counter()
+        for _ in range(ops):
+            code = rng.choice(codes)
+            try:
+                if legacy:
+                    legacy_record_use(Path(path), code, f'dev-{seed}-{tid}')
+                else:
+                    store.record_use(code, f'dev-{seed}-{tid}', '127.0.0.1')
+                local[code] += 1
+            except Exception as e:
+                failed[type(e).__name__] += 1
+        with lock:
+            counts.update(local)
+            errors.update(failed)
+
+    pool = [threading.Thread(target=run, args=(t,)) for t in range(threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    return counts, errors
+
+
+def read_uses(path: Path, legacy: bool):
+    if legacy:
+        try:
+            data = json.loads(path.read_text(encoding='utf-8'))
+        except ValueError:
+            return None
+        return Counter({code: rec.get('uses', 0) for code, rec in data.items()})
+    with sqlite3.connect(path) as conn:
+        return Counter(dict(conn.execute('SELECT code, uses FROM activations')))
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--processes', type=int, default=4)
+    ap.add_argument('--threads', type=int, default=8)
+    ap.add_argument('--ops', type=int, default=250, help='activations per thread')
+    ap.add_argument('--codes', type=int, default=20, help='size of the code pool (smaller = more contention)')
+    ap.add_argument('--legacy', action='store_true', help='stress the old JSON file instead')
+    args = ap.parse_args()
+
+    codes = [f'{100000 + i}' for i in range(args.codes)]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = Path(tmp) / ('activations.json' if args.legacy else 'activations.db')
+        if not args.legacy:
+            ActivationStore(path)  # 先建表，避免各进程同时初始化
+        t0 = time.perf_counter()
+        expected, errors = Counter(), Counter()
+        with ProcessPoolExecutor(max_workers=args.processes) as ex:
+            futures = [
+                ex.submit(worker, str(path), args.legacy, args.threads, args.ops, codes, p)
+                for p in range(args.processes)
+            ]
+            for f in futures:
+                counts, errs = f.result()
+                expected.update(counts)
+                errors.update(errs)
+        wall = time.perf_counter() - t0
+        actual = read_uses(path, args.legacy)
+
+    total = sum(expected.values())
+    print(f'{"legacy json" if args.legacy else "sqlite"}: {args.processes} processes x {args.threads} threads x {args.ops} ops '
+          f'on {args.codes} codes in {wall:.2f}s ({total / wall:.0f} ops/s)')
+    if errors:
+        print(f'failed calls: {dict(errors)}')
+    if actual is None:
+        print('FAIL: store file is corrupt')
+        sys.exit(1)
+    lost = {code: expected[code] - actual.get(code, 0) for code in expected if expected[code] != actual.get(code, 0)}
+    recorded = sum(actual.values())
+    print(f'successful calls={total} recorded uses={recorded} lost={total - recorded}')
+    if lost:
+        print(f'FAIL: {len(lost)} codes with mismatched uses, e.g. {dict(list(lost.items())[:5])}')
+        sys.exit(1)
+    print('OK: no lost uses')
+
+if __name__ == '__main__':
+    main()
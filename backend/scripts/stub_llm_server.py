@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+OpenAI-compatible stub model server for local load tests.
+
+Serves:
+  POST /v1/chat/completions
+    - stream=true  -> SSE chunks of a canned interpretation, then [DONE]
+    - stream=false -> a single completion containing "SELECTED_ID: <id>"
+  GET  /v1/models  -> model list (used by the API's connection warm-up)
+  GET  /stub/stats -> request / error counters
+
+Point the API at it with ALIYUN_BAILIAN_BASE_URL=http://127.0.0.1:18001/v1.
+
+Usage:
+  python backend/scripts/stub_llm_server.py --port 18001 --latency 0.3 --chunks 20 --chunk-interval 0.05
+  python backend/scripts/stub_llm_server.py --tokens-per-sec 40 --error-rate 0.05 --selected-id 003,017,042
+  python backend/scripts/stub_llm_server.py --model-latency qwen-plus=8 --model-latency qwen-flash=0.2
+"""
+import argparse, asyncio, json, random, time
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+CANNED = '星舟回应：你的问题已被记录。'
+
+
+def create_app(
+    latency: float,
+    chunks: int,
+    chunk_interval: float,
+    selected_id: str,
+    model_latency=None,
+    *,
+    jitter: float = 0.0,
+    tokens_per_sec: float = 0.0,
+    error_rate: float = 0.0,
+    error_status: int = 500,
+    stream_error_rate: float = 0.0,
+    seed=None,
+) -> FastAPI:
+    app = FastAPI()
+    model_latency = model_latency or {}
+    selected_ids = [s.strip() for s in selected_id.split(',') if s.strip()] or ['003']
+    rng = random.Random(seed)
+    # 每个 token 一个数据块；给定 token 速率时按速率出块
+    interval = 1.0 / tokens_per_sec if tokens_per_sec > 0 else chunk_interval
+    stats = {'requests': 0, 'streams': 0, 'errors': 0, 'stream_errors': 0, 'inflight': 0}
+
+    def error_response():
+        stats['errors'] += 1
+        return JSONResponse(
+            status_code=error_status,
+            content={'error': {'message': 'stub injected error', 'type': 'stub_error', 'code': str(error_status)}},
+        )
+
+    @app.get('/v1/models')
+    async def models():
+        return {'object': 'list', 'data': [{'id': m, 'object': 'model'} for m in ('qwen-plus', 'qwen-flash', *model_latency)]}
+
+    @app.get('/stub/stats')
+    async def stub_stats():
+        return stats
+
+    @app.post('/v1/chat/completions')
+    async def chat_completions(request: Request):
+        body = await request.json()
+        model = body.get('model', 'stub')
+        stats['requests'] += 1
+        stats['inflight'] += 1
+        try:
+            delay = model_latency.get(model, latency)
+            if jitter:
+                delay = max(0.0, delay + rng.uniform(-jitter, jitter))
+            await asyncio.sleep(delay)
+            if rng.random() < error_rate:
+                return error_response()
+        finally:
+            stats['inflight'] -= 1
+        if body.get('stream'):
+            stats['streams'] += 1
+            fail_at = rng.randrange(1, max(chunks, 2)) if rng.random() < stream_error_rate else None
+
+            async def gen():
+                stats['inflight'] += 1
+                try:
+                    for i in range(chunks):
+                        if i == fail_at:
+                            stats['stream_errors'] += 1
+                            yield f'data: {json.dumps({"error": {"message": "stub injected stream error"}})}\n\n'
+                            return
+                        chunk = {
+                            'id': 'stub', 'object': 'chat.completion.chunk', 'created': int(time.time()), 'model': model,
+                            'choices': [{'index': 0, 'delta': {'content': CANNED[i % len(CANNED)]}, 'finish_reason': None}],
+                        }
+                        yield f'data: {json.dumps(chunk, ensure_ascii=False)}\n\n'
+                        await asyncio.sleep(interval)
+                    yield 'data: [DONE]\n\n'
+                finally:
+                    stats['inflight'] -= 1
+            return StreamingResponse(gen(), media_type='text/event-stream')
+        content = f'SELECTED_ID: {rng.choice(selected_ids)}'
+        if tokens_per_sec > 0:
+            await asyncio.sleep(len(content) / 4 / tokens_per_sec)
+        return {
+            'id': 'stub', 'object': 'chat.completion', 'created': int(time.time()), 'model': model,
+            'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': content}, 'finish_reason': 'stop'}],
+            'usage': {'prompt_tokens': 1, 'completion_tokens': 1, 'total_tokens': 2},
+        }
+
+    return app
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--host', default='127.0.0.1')
+    ap.add_argument('--port', type=int, default=18001)
+    ap.add_argument('--latency', type=float, default=0.3, help='seconds before the first byte')
+    ap.add_argument('--jitter', type=float, default=0.0, help='uniform +/- seconds added to --latency')
+    ap.add_argument('--chunks', type=int, default=20, help='stream chunks (tokens) per response')
+    ap.add_argument('--chunk-interval', type=float, default=0.05, help='seconds between stream chunks')
+    ap.add_argument('--tokens-per-sec', type=float, default=0.0, help='token rate; overrides --chunk-interval when > 0')
+    ap.add_argument('--error-rate', type=float, default=0.0, help='fraction of requests answered with --error-status')
+    ap.add_argument('--error-status', type=int, default=500)
+    ap.add_argument('--stream-error-rate', type=float, default=0.0, help='fraction of streams cut by an error chunk')
+    ap.add_argument('--selected-id', default='003', help='archive_id(s) returned by non-stream calls, comma separated')
+    ap.add_argument('--model-latency', action='append', default=[], metavar='MODEL=SECONDS',
+                    help='per-model time to first byte, overrides --latency (repeatable)')
+    ap.add_argument('--seed', type=int, default=None)
+    args = ap.parse_args()
+    model_latency = {}
+    for item in args.model_latency:
+        name, _, seconds = item.partition('=')
+        model_latency[name] = float(seconds)
+    app = create_app(
+        args.latency, args.chunks, args.chunk_interval, args.selected_id, model_latency,
+        jitter=args.jitter, tokens_per_sec=args.tokens_per_sec, error_rate=args.error_rate,
+        error_status=args.error_status, stream_error_rate=args.stream_error_rate, seed=args.seed,
+    )
+    uvicorn.run(app, host=args.host, port=args.port, log_level='warning', backlog=4096)
+
+if __name__ == '__main__':
+    main()
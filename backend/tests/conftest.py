@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# 与 scripts/ 相同：以 backend 目录为根导入 `app` 包
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
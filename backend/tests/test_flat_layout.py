@@ -0,0 +1,22 @@
+"""Docker 镜像把 app/ 平铺到工作目录并运行 `uvicorn main:app`：各模块须能以顶层模块导入。"""
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+APP_DIR = Path(__file__).resolve().parents[1] / "app"
+
+
+def test_main_imports_with_app_dir_as_cwd():
+    env = {k: v for k, v in os.environ.items() if k != "PYTHONPATH"}
+    env["LLM_WARMUP_CONNECTIONS"] = "0"
+    result = subprocess.run(
+        [sys.executable, "-c", "import main; assert main.app is not None"],
+        cwd=APP_DIR,
+        env=env,
+        capture_output=True,
+        text=True,
+        timeout=60,
+    )
+    assert result.returncode == 0, result.stderr
@@ -0,0 +1,80 @@
+"""熔断与准入：熔断打开时调用应立即失败并回退，而不是排队等待被占满的名额。"""
+
+import asyncio
+
+import pytest
+
+from app.circuit_breaker import CircuitBreaker, CircuitOpen
+from app.llm_service import LLMService, close_http_clients
+
+
+@pytest.fixture
+def llm_env(monkeypatch):
+    monkeypatch.setenv("ALIYUN_BAILIAN_API_KEY", "test")
+    # 不可达地址：任何真正发出的请求都会失败，测试中不应发出
+    monkeypatch.setenv("ALIYUN_BAILIAN_BASE_URL", "http://127.0.0.1:9/v1")
+    monkeypatch.setenv("LLM_FAST_CONCURRENCY", "1")
+    monkeypatch.setenv("LLM_MAIN_CONCURRENCY", "1")
+    monkeypatch.setenv("LLM_ADMISSION_MAX_WAIT", "3")
+    monkeypatch.setenv("LLM_WARMUP_CONNECTIONS", "0")
+
+
+def _trip(breaker: CircuitBreaker) -> None:
+    for _ in range(breaker.min_calls):
+        breaker.begin().failure()
+    assert not breaker.allows()
+
+
+@pytest.mark.asyncio
+async def test_open_breaker_fails_fast_while_slot_is_busy(llm_env):
+    service = LLMService()
+    try:
+        _trip(service.breakers.get(service.fast_model))
+        async with service.admission.fast.slot():
+            with pytest.raises(CircuitOpen):
+                await asyncio.wait_for(service._admitted_request("q", model=service.fast_model), 0.5)
+            assert service.admission.fast.stats()["queued"] == 0
+    finally:
+        await close_http_clients()
+
+
+@pytest.mark.asyncio
+async def test_selection_falls_back_immediately_when_breaker_open(llm_env):
+    service = LLMService()
+    try:
+        _trip(service.breakers.get(service.fast_model))
+        async with service.admission.fast.slot():
+            starships = [{"archive_id": "001", "name_cn": "测试"}]
+            result = await asyncio.wait_for(service.select_question_starship("事业如何", starships), 0.5)
+        assert result is None
+    finally:
+        await close_http_clients()
+
+
+@pytest.mark.asyncio
+async def test_hedged_text_does_not_queue_when_both_models_open(llm_env):
+    service = LLMService()
+    try:
+        _trip(service.breakers.get(service.model))
+        _trip(service.breakers.get(service.fast_model))
+        async with service.admission.main.slot():
+            with pytest.raises(CircuitOpen):
+                await asyncio.wait_for(service._hedged_text("prompt"), 0.5)
+            assert service.admission.main.stats()["queued"] == 0
+    finally:
+        await close_http_clients()
+
+
+def test_check_does_not_take_probe_slot():
+    breaker = CircuitBreaker("m", window=4, min_calls=2, cooldown=0.0, probes=1)
+    _trip_breaker = [breaker.begin() for _ in range(2)]
+    for call in _trip_breaker:
+        call.failure()
+    # 冷却为 0：立即半开，check 不占探测名额，随后的 begin 仍可作为探测放行
+    breaker.check()
+    breaker.check()
+    probe = breaker.begin()
+    with pytest.raises(CircuitOpen):
+        breaker.check()
+    probe.success()
+    assert breaker.stats()["state"] == "closed"
@@ -0,0 +1,39 @@
+"""非流式解读的总超时：上游在首字之后持续慢速吐字时，应按 LLM_TOTAL_TIMEOUT 回退并归还名额。"""
+
+import asyncio
+
+import pytest
+
+from app.llm_service import LLMService, close_http_clients
+
+
+@pytest.mark.asyncio
+async def test_trickling_interpretation_falls_back_after_total_timeout(monkeypatch):
+    monkeypatch.setenv("ALIYUN_BAILIAN_API_KEY", "test")
+    monkeypatch.setenv("ALIYUN_BAILIAN_BASE_URL", "http://127.0.0.1:9/v1")
+    monkeypatch.setenv("LLM_MAIN_CONCURRENCY", "1")
+    monkeypatch.setenv("LLM_TOTAL_TIMEOUT", "0.3")
+    monkeypatch.setenv("LLM_TTFT_BUDGET", "0")
+    monkeypatch.setenv("LLM_WARMUP_CONNECTIONS", "0")
+    service = LLMService()
+    closed = asyncio.Event()
+
+    async def _trickle(messages, *, model, max_tokens):
+        try:
+            while True:
+                yield "。"
+                await asyncio.sleep(0.02)
+        finally:
+            closed.set()
+
+    monkeypatch.setattr(service, "_astream_chat", _trickle)
+    try:
+        text = await asyncio.wait_for(
+            service.generate_final_interpretation(None, None, None, "问题", prompt="trickle"),
+            timeout=3,
+        )
+        assert text == service._fallback_interpretation(None, None, None, "问题")
+        assert closed.is_set()
+        assert service.admission.main.stats()["active"] == 0
+    finally:
+        await close_http_clients()
@@ -0,0 +1,95 @@
+"""令牌桶限流：回满、空闲淘汰、键数上限，以及设备 / IP 两组桶的联合扣除。"""
+
+import pytest
+
+from app.rate_limit import RateLimiter, Rule, TokenBuckets
+
+
+def _take(table: TokenBuckets, key: str, now: float) -> float:
+    """按 `RateLimiter.check` 的顺序取桶、淘汰并在有令牌时扣除；返回需等待秒数。"""
+    bucket = table._bucket(key, now)
+    table._evict(now)
+    wait = table.wait_time(bucket)
+    if wait == 0:
+        bucket[0] -= 1.0
+    return wait
+
+
+def test_bucket_drains_then_refills_over_period():
+    table = TokenBuckets(capacity=3, period=30, max_keys=10)
+    assert [_take(table, "a", 0.0) for _ in range(3)] == [0.0, 0.0, 0.0]
+    # 空桶：每 10 秒回一个令牌
+    assert _take(table, "a", 0.0) == pytest.approx(10.0)
+    assert _take(table, "a", 4.0) == pytest.approx(6.0)
+    assert _take(table, "a", 10.0) == 0.0
+    assert _take(table, "a", 10.0) == pytest.approx(10.0)
+    # 回满后不超过容量
+    assert table._bucket("a", 1000.0)[0] == 3
+
+
+def test_idle_buckets_are_evicted_after_one_period():
+    table = TokenBuckets(capacity=2, period=60, max_keys=10)
+    _take(table, "idle", 0.0)
+    _take(table, "busy", 30.0)
+    assert table.stats()["keys"] == 2
+    # "idle" 空闲满 60 秒，已必然回满，与不存在等价
+    _take(table, "busy", 60.0)
+    assert list(table._buckets) == ["busy"]
+    # 淘汰后重新出现的键从满桶开始
+    assert _take(table, "idle", 61.0) == 0.0
+    assert table._buckets["idle"][0] == 1
+
+
+def test_max_keys_evicts_least_recently_used():
+    table = TokenBuckets(capacity=1, period=60, max_keys=2)
+    for i, key in enumerate(("a", "b", "c")):
+        _take(table, key, float(i))
+    assert list(table._buckets) == ["b", "c"]
+
+
+def _scope(device=None, client="10.0.0.1", forwarded=None, query=b""):
+    headers = []
+    if device is not None:
+        headers.append((b"x-device-id", device.encode()))
+    if forwarded is not None:
+        headers.append((b"x-forwarded-for", forwarded.encode()))
+    return {
+        "type": "http",
+        "method": "POST",
+        "path": "/api/v1/divine/inquiry",
+        "headers": headers,
+        "query_string": query,
+        "client": (client, 12345),
+    }
+
+
+def _limiter(device: int, ip: int, trust_forwarded: bool = False) -> RateLimiter:
+    rule = Rule("inquiry", TokenBuckets(device, 60, 100), TokenBuckets(ip, 60, 100))
+    return RateLimiter({("POST", "/api/v1/divine/inquiry"): rule}, trust_forwarded=trust_forwarded)
+
+
+def test_devices_behind_one_ip_share_only_the_ip_bucket():
+    limiter = _limiter(device=1, ip=3)
+    assert limiter.check(_scope("d1"))[1] == 0
+    assert limiter.check(_scope("d1"))[1] > 0
+    assert limiter.check(_scope("d2"))[1] == 0
+    assert limiter.check(_scope("d3"))[1] == 0
+    # IP 桶已空：新设备同样被拒
+    assert limiter.check(_scope("d4"))[1] > 0
+    rule = limiter.rules[("POST", "/api/v1/divine/inquiry")]
+    assert (rule.allowed, rule.limited) == (3, 2)
+
+
+def test_rejected_request_does_not_consume_the_other_bucket():
+    limiter = _limiter(device=1, ip=2)
+    limiter.check(_scope("d1"))
+    assert limiter.check(_scope("d1"))[1] > 0
+    # 上一请求被设备桶拒绝，IP 桶仍剩一个令牌
+    assert limiter.check(_scope("d2"))[1] == 0
+
+
+def test_device_id_from_query_and_forwarded_ip():
+    limiter = _limiter(device=1, ip=10, trust_forwarded=True)
+    assert limiter._keys(_scope(query=b"device_id=abc&x=1", forwarded="1.2.3.4, 10.0.0.1")) == ("abc", "1.2.3.4")
+    # 未信任代理时忽略 X-Forwarded-For
+    assert _limiter(1, 10)._keys(_scope("dev", forwarded="1.2.3.4")) == ("dev", "10.0.0.1")
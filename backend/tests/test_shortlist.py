@@ -0,0 +1,35 @@
+"""问道候选筛选：命中足够时只放入得分最高的 K 个，否则放入全部目录而不按目录顺序补齐。"""
+
+from app.shortlist import ShortlistIndex, shortlist_size
+
+CATALOG = [
+    {"archive_id": "A", "oracle_keywords": ["事业", "晋升"]},
+    {"archive_id": "B", "oracle_keywords": ["爱情"]},
+    {"archive_id": "C", "oracle_keywords": ["事业", "远行"]},
+    {"archive_id": "D", "oracle_keywords": ["健康"]},
+]
+
+
+def _ids(rows):
+    return [row["archive_id"] for row in rows]
+
+
+def test_shortlist_takes_top_k_keyword_hits():
+    index = ShortlistIndex(CATALOG)
+    assert _ids(index.shortlist("事业能否晋升", k=2)) == ["A", "C"]
+    assert _ids(index.shortlist("事业能否晋升", k=1)) == ["A"]
+
+
+def test_shortlist_without_enough_hits_falls_back_to_full_catalog():
+    index = ShortlistIndex(CATALOG)
+    assert index.shortlist("今天吃什么", k=2) is CATALOG
+    # 只命中两个：不按目录顺序补齐第三个
+    assert index.shortlist("事业能否晋升", k=3) is CATALOG
+    assert index.shortlist("事业", k=0) is CATALOG
+
+
+def test_shortlist_size_tolerates_malformed_env(monkeypatch):
+    monkeypatch.setenv("INQUIRY_SHORTLIST_K", "ten")
+    assert shortlist_size() == 8
+    monkeypatch.setenv("INQUIRY_SHORTLIST_K", "5")
+    assert shortlist_size() == 5
@@ -0,0 +1,24 @@
+"""前端分步调用的 divine 端点同样计入阶段耗时直方图。"""
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.metrics import CALCULATE_STAGE_SECONDS
+
+
+def _count(stage: str) -> int:
+    child = CALCULATE_STAGE_SECONDS._children.get((stage,))
+    return sum(child.counts) if child is not None else 0
+
+
+def test_divine_origin_and_celestial_observe_stage_histogram():
+    client = TestClient(app)
+    before = _count("origin"), _count("celestial")
+    assert client.post("/api/v1/divine/origin", json={"birth_date": "1990-01-01"}).status_code == 200
+    assert client.post("/api/v1/divine/celestial", json={}).status_code == 200
+    assert client.post("/api/v1/divine/celestial", json={"inquiry_date": "2024-05-01"}).status_code == 200
+    assert (_count("origin"), _count("celestial")) == (before[0] + 1, before[1] + 2)
+    # 日期无效时不计入
+    assert client.post("/api/v1/divine/celestial", json={"inquiry_date": "bad"}).status_code == 400
+    assert _count("celestial") == before[1] + 2
+    assert 'stage="origin"' in client.get("/metrics").text
@@ -266,7 +266,7 @@ const CalculatePage: React.FC = () => {
       tasks.push((async () => {
         try {
           const resp = await fetch(api('/api/v1/divine/origin'), {
-            method: 'POST', headers: { 'Content-Type': 'application/json' },
+            method: 'POST', headers: { 'Content-Type': 'application/json', 'x-device-id': getDeviceId() },
             body: JSON.stringify({ birth_date: birthDate, name })
           })
           if (!resp.ok) throw new Error('origin failed')
@@ -283,7 +283,7 @@ const CalculatePage: React.FC = () => {
       tasks.push((async () => {
         try {
           const resp = await fetch(api('/api/v1/divine/celestial'), {
-            method: 'POST', headers: { 'Content-Type': 'application/json' },
+            method: 'POST', headers: { 'Content-Type': 'application/json', 'x-device-id': getDeviceId() },
             body: JSON.stringify({})
           })
           if (!resp.ok) throw new Error('celestial failed')
@@ -300,7 +300,7 @@ const CalculatePage: React.FC = () => {
       tasks.push((async () => {
         try {
           const resp = await fetch(api('/api/v1/divine/inquiry'), {
-            method: 'POST', headers: { 'Content-Type': 'application/json' },
+            method: 'POST', headers: { 'Content-Type': 'application/json', 'x-device-id': getDeviceId() },
             body: JSON.stringify({ question: effectiveQuestion, name: effectiveName })
           })
           if (!resp.ok) throw new Error('inquiry failed')
@@ -511,7 +511,9 @@ const CalculatePage: React.FC = () => {
                   celestial_id: celestialData?.starship?.archive_id,
                   inquiry_id: inquiryData?.starship?.archive_id,
                   question: effectiveQuestion,
-                  name: effectiveName
+                  name: effectiveName,
+                  // 后端按设备限流；EventSource 无法设置请求头，经查询参数传递
+                  device_id: getDeviceId()
                 }}
                 onDone={async (t) => {
                   setInterpretation(t)